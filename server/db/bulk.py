@@ -0,0 +1,82 @@
+"""
+Bulk row writes
+copy_rows streams rows with PostgreSQL COPY FROM STDIN (one round trip for the
+whole batch) and falls back to executemany on other drivers. staged_rows
+copies into a temp table shaped like the target so callers can merge with a
+single set-based INSERT ... SELECT ... ON CONFLICT.
+"""
+import csv
+import io
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Sequence
+from uuid import uuid4
+
+from sqlalchemy import text
+
+from server.db.qmark import qmark_many
+
+
+def _dbapi_cursor(db):
+    """Raw driver cursor on the session's current connection/transaction"""
+    return db.connection().connection.dbapi_connection.cursor()
+
+
+def copy_rows(db, table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> int:
+    """
+    Append rows to a table in one bulk operation
+
+    With psycopg 3 rows may be any iterable (e.g. a generator) and are
+    streamed without being materialized.
+
+    Returns:
+        Number of rows written
+    """
+    column_list = ", ".join(columns)
+
+    if db.get_bind().dialect.name == "postgresql":
+        cursor = _dbapi_cursor(db)
+        try:
+            if hasattr(cursor, "copy"):
+                # psycopg 3 streams rows as they are produced
+                count = 0
+                with cursor.copy(f"COPY {table} ({column_list}) FROM STDIN") as copy:
+                    for row in rows:
+                        copy.write_row(row)
+                        count += 1
+                return count
+            if hasattr(cursor, "copy_expert"):
+                # psycopg2
+                rows = list(rows)
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {table} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+                return len(rows)
+        finally:
+            cursor.close()
+
+    rows = list(rows)
+    if not rows:
+        return 0
+    placeholders = ", ".join("?" for _ in columns)
+    stmt, params = qmark_many(f"INSERT INTO {table} ({column_list}) VALUES ({placeholders})", rows)
+    db.execute(stmt, params)
+    return len(rows)
+
+
+@contextmanager
+def staged_rows(db, like_table: str, columns: Sequence[str], rows: Iterable[Sequence[Any]]) -> Iterator[str]:
+    """
+    Copy rows into a temp table with like_table's column types
+
+    Yields:
+        The temp table name, dropped on exit
+    """
+    name = f"stage_{like_table}_{uuid4().hex[:12]}"
+    column_list = ", ".join(columns)
+    db.execute(text(f"CREATE TEMP TABLE {name} AS SELECT {column_list} FROM {like_table} WHERE 1 = 0"))
+    try:
+        copy_rows(db, name, columns, rows)
+        yield name
+    finally:
+        db.execute(text(f"DROP TABLE IF EXISTS {name}"))
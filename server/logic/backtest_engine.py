@@ -0,0 +1,241 @@
+"""
+Backtest Engine: vectorized walk-forward evaluation of the built-in strategies
+Entry and exit rules are boolean masks over the full bar history; fills, P&L
+and equity are simulated with array operations instead of a per-bar loop.
+"""
+from typing import Dict, Any, Optional, List
+
+import numpy as np
+
+from server.logic import indicator_kernel
+
+PERIODS_PER_YEAR = 252
+
+STRATEGY_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "RSI Rebound": {"rsi_period": 14, "rsi_entry": 30.0, "rsi_exit": 70.0},
+    "Momentum Buy": {"ma_period": 50, "volume_window": 7, "min_volume_ratio": 0.0},
+    "Trend Exit": {"ma_period": 20},
+    "DCA Weekly": {"interval_bars": 7, "amount": 100.0},
+}
+
+
+class BacktestError(ValueError):
+    """Invalid backtest request"""
+    pass
+
+
+def _volume_ratio(volumes: np.ndarray, window: int) -> np.ndarray:
+    avg = indicator_kernel.rolling_mean(volumes, window)[0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(avg > 0, volumes / avg, 0.0)
+
+
+def strategy_masks(
+    strategy: str,
+    closes: np.ndarray,
+    volumes: Optional[np.ndarray] = None,
+    params: Optional[Dict[str, Any]] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Evaluate a strategy's entry and exit rules at every bar
+
+    Returns:
+        Dict with boolean "entry" and "exit" arrays aligned with closes
+    """
+    if strategy not in STRATEGY_DEFAULTS:
+        raise BacktestError(f"Unknown strategy: {strategy}")
+    p = {**STRATEGY_DEFAULTS[strategy], **(params or {})}
+
+    if strategy == "RSI Rebound":
+        rsi = indicator_kernel.rsi_series(closes, int(p["rsi_period"]))[0]
+        return {"entry": rsi < p["rsi_entry"], "exit": rsi > p["rsi_exit"]}
+
+    if strategy == "Momentum Buy":
+        ma = indicator_kernel.rolling_mean(closes, int(p["ma_period"]))[0]
+        entry = closes > ma
+        if volumes is not None and p["min_volume_ratio"] > 0:
+            entry &= _volume_ratio(volumes, int(p["volume_window"])) >= p["min_volume_ratio"]
+        return {"entry": entry, "exit": closes < ma}
+
+    if strategy == "Trend Exit":
+        ma = indicator_kernel.rolling_mean(closes, int(p["ma_period"]))[0]
+        return {"entry": closes > ma, "exit": closes < ma}
+
+    interval = int(p["interval_bars"])
+    entry = np.zeros(len(closes), dtype=bool)
+    entry[::interval] = True
+    return {"entry": entry, "exit": np.zeros(len(closes), dtype=bool)}
+
+
+def positions_from_masks(entry: np.ndarray, exit: np.ndarray) -> np.ndarray:
+    """
+    Turn entry/exit masks into a 0/1 position held from the following bar
+
+    Exits win when both fire on the same bar. The latest signal is carried
+    forward with a running maximum over signal indices.
+    """
+    n_bars = len(entry)
+    signal = np.where(exit, 0.0, np.where(entry, 1.0, np.nan))
+    idx = np.where(np.isnan(signal), 0, np.arange(n_bars))
+    np.maximum.accumulate(idx, out=idx)
+    state = signal[idx]
+    state = np.nan_to_num(state, nan=0.0)
+
+    # Signals are observed on the close, so the position applies to the next bar
+    position = np.zeros(n_bars)
+    position[1:] = state[:-1]
+    return position
+
+
+def _trade_list(
+    position: np.ndarray,
+    closes: np.ndarray,
+    timestamps: Optional[np.ndarray],
+) -> List[Dict[str, Any]]:
+    changes = np.diff(np.concatenate([[0.0], position, [0.0]]))
+    # A position entered at bar i was filled at the close of bar i - 1
+    entries = np.flatnonzero(changes > 0) - 1
+    exits = np.flatnonzero(changes < 0) - 1
+    exits = np.minimum(exits, len(closes) - 1)
+
+    entry_prices = closes[entries]
+    exit_prices = closes[exits]
+    returns = (exit_prices / entry_prices - 1) * 100
+
+    trades = []
+    for i in range(len(entries)):
+        trade = {
+            "entry_index": int(entries[i]),
+            "exit_index": int(exits[i]),
+            "entry_price": float(entry_prices[i]),
+            "exit_price": float(exit_prices[i]),
+            "return_pct": round(float(returns[i]), 4),
+            "bars_held": int(exits[i] - entries[i]),
+            "open": bool(exits[i] == len(closes) - 1 and position[-1] > 0),
+        }
+        if timestamps is not None:
+            trade["entry_time"] = int(timestamps[entries[i]])
+            trade["exit_time"] = int(timestamps[exits[i]])
+        trades.append(trade)
+    return trades
+
+
+def compute_stats(
+    equity: np.ndarray,
+    position: Optional[np.ndarray] = None,
+    trades: Optional[List[Dict[str, Any]]] = None,
+    periods_per_year: int = PERIODS_PER_YEAR,
+) -> Dict[str, Any]:
+    """Summary statistics for an equity curve"""
+    returns = np.diff(equity) / equity[:-1] if len(equity) > 1 else np.zeros(0)
+    total_return = equity[-1] / equity[0] - 1 if len(equity) else 0.0
+    years = len(returns) / periods_per_year
+
+    peaks = np.maximum.accumulate(equity)
+    drawdowns = (peaks - equity) / peaks
+    volatility = float(returns.std() * np.sqrt(periods_per_year)) if len(returns) > 1 else 0.0
+    mean_return = float(returns.mean() * periods_per_year) if len(returns) else 0.0
+
+    stats = {
+        "total_return_pct": round(float(total_return) * 100, 4),
+        "cagr_pct": round(float((1 + total_return) ** (1 / years) - 1) * 100, 4) if years > 0 and total_return > -1 else 0.0,
+        "volatility_pct": round(volatility * 100, 4),
+        "sharpe": round(mean_return / volatility, 4) if volatility > 0 else 0.0,
+        "max_drawdown_pct": round(float(drawdowns.max()) * 100, 4) if len(drawdowns) else 0.0,
+        "bars": int(len(equity)),
+    }
+    if position is not None:
+        stats["exposure_pct"] = round(float(position.mean()) * 100, 4)
+    if trades is not None:
+        wins = sum(1 for t in trades if t["return_pct"] > 0)
+        stats["trade_count"] = len(trades)
+        stats["win_rate_pct"] = round(wins / len(trades) * 100, 4) if trades else 0.0
+    return stats
+
+
+def _run_dca(
+    closes: np.ndarray,
+    entry: np.ndarray,
+    amount: float,
+    timestamps: Optional[np.ndarray],
+) -> Dict[str, Any]:
+    contributions = np.where(entry, amount, 0.0)
+    invested = np.cumsum(contributions)
+    units = np.cumsum(contributions / closes)
+    equity = units * closes
+    # Value per unit of capital invested, so cash inflows don't count as returns
+    growth = np.where(invested > 0, equity / np.where(invested > 0, invested, 1.0), 1.0)
+
+    buys = np.flatnonzero(entry)
+    trades = []
+    for i in buys:
+        trade = {"entry_index": int(i), "entry_price": float(closes[i]), "amount": amount,
+                 "units": float(amount / closes[i])}
+        if timestamps is not None:
+            trade["entry_time"] = int(timestamps[i])
+        trades.append(trade)
+
+    stats = compute_stats(growth)
+    stats["invested"] = round(float(invested[-1]), 2)
+    stats["final_value"] = round(float(equity[-1]), 2)
+    stats["trade_count"] = len(trades)
+    return {"equity_curve": equity, "trades": trades, "stats": stats}
+
+
+def run_backtest(
+    strategy: str,
+    closes,
+    volumes=None,
+    params: Optional[Dict[str, Any]] = None,
+    timestamps=None,
+    initial_capital: float = 10000.0,
+    fee_bps: float = 0.0,
+    include_trades: bool = True,
+) -> Dict[str, Any]:
+    """
+    Backtest a built-in strategy over a single symbol's bar history
+
+    Args:
+        strategy: Strategy name (RSI Rebound, Momentum Buy, Trend Exit, DCA Weekly)
+        closes: 1D close prices, oldest first
+        volumes: Optional 1D volumes aligned with closes
+        params: Overrides for STRATEGY_DEFAULTS[strategy]
+        timestamps: Optional 1D epoch seconds aligned with closes
+        initial_capital: Starting equity for long/flat strategies
+        fee_bps: Cost per unit of turnover, in basis points
+        include_trades: Skip building the trade list (faster for sweeps)
+
+    Returns:
+        Dict with equity_curve (ndarray), trades and stats
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    if closes.ndim != 1 or len(closes) < 2:
+        raise BacktestError("Backtest requires at least two bars of 1D price history")
+    if np.any(closes <= 0):
+        raise BacktestError("Prices must be positive")
+    volumes = np.asarray(volumes, dtype=np.float64) if volumes is not None else None
+    timestamps = np.asarray(timestamps) if timestamps is not None else None
+
+    masks = strategy_masks(strategy, closes, volumes, params)
+
+    if strategy == "DCA Weekly":
+        amount = float({**STRATEGY_DEFAULTS[strategy], **(params or {})}["amount"])
+        result = _run_dca(closes, masks["entry"], amount, timestamps)
+        if not include_trades:
+            result["trades"] = []
+        return result
+
+    position = positions_from_masks(masks["entry"], masks["exit"])
+    bar_returns = np.zeros(len(closes))
+    bar_returns[1:] = closes[1:] / closes[:-1] - 1
+
+    turnover = np.abs(np.diff(np.concatenate([[0.0], position])))
+    strategy_returns = position * bar_returns - turnover * (fee_bps / 10000.0)
+    equity = initial_capital * np.cumprod(1 + strategy_returns)
+
+    trades = _trade_list(position, closes, timestamps) if include_trades else None
+    return {
+        "equity_curve": equity,
+        "trades": trades or [],
+        "stats": compute_stats(equity, position, trades),
+    }
@@ -0,0 +1,210 @@
+"""
+Bar Aggregator: cascading multi-timeframe OHLCV bars from a single tick stream
+Ticks build 1m bars; each completed bar is folded into the next timeframe
+(1m -> 5m -> 1h -> 1d) instead of re-reading raw ticks. Every timeframe keeps
+its own IndicatorState, updated in O(1) as bars complete.
+"""
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, Any, List, Optional, Tuple
+
+from server.logic.indicator_state import IndicatorState
+
+TIMEFRAMES: Tuple[Tuple[str, int], ...] = (
+    ("1m", 60),
+    ("5m", 300),
+    ("1h", 3600),
+    ("1d", 86400),
+)
+
+DEFAULT_BARS_KEPT = 500
+
+
+class Bar:
+    """OHLCV bar covering [start, start + seconds)"""
+
+    __slots__ = ("start", "open", "high", "low", "close", "volume")
+
+    def __init__(self, start: int, open_: float, high: float, low: float, close: float, volume: float):
+        self.start = start
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def merge(self, high: float, low: float, close: float, volume: float) -> None:
+        if high > self.high:
+            self.high = high
+        if low < self.low:
+            self.low = low
+        self.close = close
+        self.volume += volume
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "start": self.start,
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+            "volume": self.volume,
+        }
+
+
+class TimeframeSeries:
+    """Partial bar, recent completed bars and indicator state for one timeframe"""
+
+    def __init__(self, symbol: str, name: str, seconds: int, bars_kept: int):
+        self.name = name
+        self.seconds = seconds
+        self.partial: Optional[Bar] = None
+        self.completed: Deque[Bar] = deque(maxlen=bars_kept)
+        self.state = IndicatorState(symbol)
+        # Inputs dropped because their bucket was already closed or superseded
+        self.late_dropped = 0
+
+    def bucket(self, timestamp: int) -> int:
+        return timestamp - timestamp % self.seconds
+
+    def fold(self, start: int, open_: float, high: float, low: float, close: float, volume: float) -> Optional[Bar]:
+        """
+        Fold a tick or lower-timeframe bar into the partial bar
+
+        Inputs for a bucket older than the partial bar, or already completed,
+        are dropped: completed bars have been published and folded upward,
+        so a late tick must not reopen one or close the current partial.
+
+        Returns:
+            The bar that completed as a result, if the input opened a new bucket
+        """
+        bucket = self.bucket(start)
+        if self.partial is not None:
+            late = bucket < self.partial.start
+        else:
+            late = bool(self.completed) and bucket <= self.completed[-1].start
+        if late:
+            self.late_dropped += 1
+            return None
+        closed = None
+        if self.partial is not None and bucket != self.partial.start:
+            closed = self.close_partial()
+        if self.partial is None:
+            self.partial = Bar(bucket, open_, high, low, close, volume)
+        else:
+            self.partial.merge(high, low, close, volume)
+        return closed
+
+    def close_partial(self) -> Optional[Bar]:
+        bar = self.partial
+        if bar is None:
+            return None
+        self.partial = None
+        self.completed.append(bar)
+        self.state.append(
+            bar.close,
+            bar.volume,
+            datetime.fromtimestamp(bar.start, tz=timezone.utc).isoformat(),
+        )
+        return bar
+
+
+class BarAggregator:
+    """
+    Cascading timeframe aggregation for one symbol
+
+    ingest() is O(number of timeframes) per tick; higher timeframes are only
+    touched when a lower bar completes.
+    """
+
+    def __init__(
+        self,
+        symbol: str,
+        bars_kept: int = DEFAULT_BARS_KEPT,
+        on_bar_close: Optional[Callable[[str, str, Bar], None]] = None,
+    ):
+        self.symbol = symbol
+        self.series: List[TimeframeSeries] = [
+            TimeframeSeries(symbol, name, seconds, bars_kept) for name, seconds in TIMEFRAMES
+        ]
+        self.by_name: Dict[str, TimeframeSeries] = {s.name: s for s in self.series}
+        self.on_bar_close = on_bar_close
+
+    def _cascade(self, level: int, bar: Bar) -> None:
+        """Publish a completed bar and fold it into the next timeframe up"""
+        if self.on_bar_close:
+            self.on_bar_close(self.symbol, self.series[level].name, bar)
+        if level + 1 < len(self.series):
+            closed = self.series[level + 1].fold(bar.start, bar.open, bar.high, bar.low, bar.close, bar.volume)
+            if closed is not None:
+                self._cascade(level + 1, closed)
+
+    def advance(self, timestamp: int) -> None:
+        """Close every partial bar whose period has ended by `timestamp`"""
+        for level, series in enumerate(self.series):
+            partial = series.partial
+            if partial is not None and timestamp >= partial.start + series.seconds:
+                self._cascade(level, series.close_partial())
+
+    def ingest(self, timestamp: int, price: float, size: float = 0.0) -> None:
+        """Fold one tick into the 1m bar, cascading completed bars upward"""
+        timestamp = int(timestamp)
+        self.advance(timestamp)
+        closed = self.series[0].fold(timestamp, price, price, price, price, size)
+        if closed is not None:
+            self._cascade(0, closed)
+
+    def bars(self, timeframe: str, n: Optional[int] = None, include_partial: bool = False) -> List[Dict[str, Any]]:
+        """Most recent completed bars for a timeframe, oldest first"""
+        series = self._series(timeframe)
+        bars = list(series.completed)
+        if n is not None:
+            bars = bars[-n:]
+        if include_partial and series.partial is not None:
+            bars.append(series.partial)
+        return [bar.to_dict() for bar in bars]
+
+    def signal_data(self, timeframe: str) -> Dict[str, Any]:
+        """Indicator payload for a timeframe's completed bars"""
+        series = self._series(timeframe)
+        if series.state.bars == 0:
+            raise ValueError(f"No completed {timeframe} bars for {self.symbol}")
+        data = series.state.signal_data()
+        data["timeframe"] = timeframe
+        return data
+
+    def _series(self, timeframe: str) -> TimeframeSeries:
+        if timeframe not in self.by_name:
+            raise ValueError(f"Unsupported timeframe: {timeframe}")
+        return self.by_name[timeframe]
+
+
+class MultiTimeframeAggregator:
+    """Per-symbol BarAggregators sharing one bar-close callback"""
+
+    def __init__(
+        self,
+        bars_kept: int = DEFAULT_BARS_KEPT,
+        on_bar_close: Optional[Callable[[str, str, Bar], None]] = None,
+    ):
+        self.bars_kept = bars_kept
+        self.on_bar_close = on_bar_close
+        self.aggregators: Dict[str, BarAggregator] = {}
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.aggregators
+
+    def get(self, symbol: str) -> BarAggregator:
+        aggregator = self.aggregators.get(symbol)
+        if aggregator is None:
+            aggregator = BarAggregator(symbol, self.bars_kept, self.on_bar_close)
+            self.aggregators[symbol] = aggregator
+        return aggregator
+
+    def ingest(self, symbol: str, timestamp: int, price: float, size: float = 0.0) -> None:
+        self.get(symbol).ingest(timestamp, price, size)
+
+    def advance(self, timestamp: int) -> None:
+        """Close expired bars for every symbol (e.g. from a periodic timer)"""
+        for aggregator in self.aggregators.values():
+            aggregator.advance(timestamp)
@@ -0,0 +1,153 @@
+"""
+Indicator kernel: batched technical indicators over a (symbols x bars) matrix
+Every function takes 2D float arrays and returns one value per symbol (row),
+so a whole universe is evaluated with a handful of array operations.
+Semantics match the scalar SignalEngine calculations exactly.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+
+
+def _as_matrix(values) -> np.ndarray:
+    """Coerce input to a 2D float64 matrix (a single series becomes one row)"""
+    matrix = np.asarray(values, dtype=np.float64)
+    if matrix.ndim == 1:
+        matrix = matrix[np.newaxis, :]
+    if matrix.ndim != 2:
+        raise ValueError("Expected a (symbols x bars) matrix")
+    return matrix
+
+
+def rsi(closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """Relative Strength Index from the mean gain/loss of the last `period` changes"""
+    closes = _as_matrix(closes)
+    n_symbols, n_bars = closes.shape
+    if n_bars < period + 1:
+        return np.full(n_symbols, 50.0)
+
+    changes = np.diff(closes[:, -(period + 1):], axis=1)
+    avg_gain = np.clip(changes, 0.0, None).mean(axis=1)
+    avg_loss = np.clip(-changes, 0.0, None).mean(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        values = 100.0 - (100.0 / (1.0 + rs))
+    return np.where(avg_loss == 0, 100.0, values)
+
+
+def ema(closes: np.ndarray, period: int) -> np.ndarray:
+    """
+    Exponential Moving Average seeded with the SMA of the first `period` bars
+
+    The recursive update is unrolled into a single weighted dot product:
+    ema = sma * (1 - k)^m + k * sum((1 - k)^(m - 1 - j) * p[period + j])
+    """
+    closes = _as_matrix(closes)
+    n_bars = closes.shape[1]
+    if n_bars < period:
+        return closes.mean(axis=1)
+
+    multiplier = 2.0 / (period + 1)
+    decay = 1.0 - multiplier
+    tail = n_bars - period
+
+    seed = closes[:, :period].mean(axis=1)
+    weights = multiplier * decay ** np.arange(tail - 1, -1, -1, dtype=np.float64)
+    return seed * decay ** tail + closes[:, period:] @ weights
+
+
+def macd(closes: np.ndarray, fast: int = 12, slow: int = 26) -> np.ndarray:
+    """MACD line (fast EMA minus slow EMA)"""
+    closes = _as_matrix(closes)
+    if closes.shape[1] < slow:
+        return np.zeros(closes.shape[0])
+    return ema(closes, fast) - ema(closes, slow)
+
+
+def moving_average(values: np.ndarray, period: int) -> np.ndarray:
+    """Simple Moving Average over the trailing `period` bars"""
+    values = _as_matrix(values)
+    return values[:, -period:].mean(axis=1)
+
+
+def compute_indicators(
+    closes: np.ndarray,
+    volumes: Optional[np.ndarray] = None,
+    volume_window: int = 7,
+) -> Dict[str, np.ndarray]:
+    """
+    Compute every SignalEngine indicator for all symbols in one pass
+
+    Args:
+        closes: (symbols x bars) close price matrix
+        volumes: Optional (symbols x bars) volume matrix
+        volume_window: Trailing window for the average volume
+
+    Returns:
+        Dict of indicator name -> 1D array aligned with the matrix rows
+    """
+    closes = _as_matrix(closes)
+
+    result = {
+        "current_price": closes[:, -1],
+        "rsi": rsi(closes),
+        "macd": macd(closes),
+        "ma20": moving_average(closes, 20),
+        "ma50": moving_average(closes, 50),
+    }
+
+    if volumes is not None:
+        volumes = _as_matrix(volumes)
+        if volumes.shape != closes.shape:
+            raise ValueError("closes and volumes must have the same shape")
+        current_volume = volumes[:, -1]
+        avg_volume = volumes[:, -volume_window:].sum(axis=1) / volume_window
+        with np.errstate(divide="ignore", invalid="ignore"):
+            volume_ratio = np.where(avg_volume > 0, current_volume / avg_volume, 0.0)
+        result["volume"] = current_volume
+        result["volume_7d_avg"] = avg_volume
+        result["volume_ratio"] = volume_ratio
+
+    return result
+
+
+def rolling_mean(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Trailing simple moving average at every bar
+
+    Bars before a full window average whatever history exists so far,
+    matching moving_average() on a truncated series.
+    """
+    values = _as_matrix(values)
+    n_bars = values.shape[1]
+    csum = np.cumsum(values, axis=1)
+    result = np.empty_like(values)
+    head = min(period, n_bars)
+    result[:, :head] = csum[:, :head] / np.arange(1, head + 1)
+    if n_bars > period:
+        result[:, period:] = (csum[:, period:] - csum[:, :-period]) / period
+    return result
+
+
+def rsi_series(closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """RSI at every bar, matching rsi() evaluated on each prefix of the series"""
+    closes = _as_matrix(closes)
+    n_symbols, n_bars = closes.shape
+    result = np.full((n_symbols, n_bars), 50.0)
+    if n_bars < period + 1:
+        return result
+
+    changes = np.diff(closes, axis=1)
+    gains = np.cumsum(np.clip(changes, 0.0, None), axis=1)
+    losses = np.cumsum(np.clip(-changes, 0.0, None), axis=1)
+    zeros = np.zeros((n_symbols, 1))
+    gains = np.hstack([zeros, gains])
+    losses = np.hstack([zeros, losses])
+
+    avg_gain = (gains[:, period:] - gains[:, :-period]) / period
+    avg_loss = (losses[:, period:] - losses[:, :-period]) / period
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+    result[:, period:] = np.where(avg_loss <= 1e-12 * np.abs(closes[:, period:]), 100.0, values)
+    return result
@@ -0,0 +1,225 @@
+"""
+Incremental indicator state: O(1) per-bar updates for streaming symbols
+Maintains RSI, EMA12/EMA26/MACD signal line and ring-buffer SMAs with the
+same definitions as indicator_kernel, so streamed and batch payloads agree
+State is snapshottable to plain dicts so it can be persisted and restored
+"""
+from typing import Dict, List, Optional, Any
+
+
+class RollingWindow:
+    """Fixed-size ring buffer with a running sum"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.values: List[float] = [0.0] * size
+        self.index = 0
+        self.count = 0
+        self.total = 0.0
+
+    def push(self, value: float) -> None:
+        if self.count == self.size:
+            self.total -= self.values[self.index]
+        else:
+            self.count += 1
+        self.values[self.index] = value
+        self.total += value
+        self.index = (self.index + 1) % self.size
+
+        # Resync the running sum once per lap to stop floating point drift
+        if self.index == 0 and self.count == self.size:
+            self.total = sum(self.values)
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"size": self.size, "values": list(self.values), "index": self.index, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RollingWindow":
+        window = cls(data["size"])
+        window.values = [float(v) for v in data["values"]]
+        window.index = data["index"]
+        window.count = data["count"]
+        window.total = sum(window.values)
+        return window
+
+
+class IncrementalEma:
+    """EMA seeded with the SMA of the first `period` values, then updated recursively"""
+
+    def __init__(self, period: int):
+        self.period = period
+        self.multiplier = 2 / (period + 1)
+        self.count = 0
+        self.seed_sum = 0.0
+        self.value: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.value is not None
+
+    def update(self, price: float) -> None:
+        self.count += 1
+        if self.value is None:
+            self.seed_sum += price
+            if self.count == self.period:
+                self.value = self.seed_sum / self.period
+        else:
+            self.value = (price * self.multiplier) + (self.value * (1 - self.multiplier))
+
+    def current(self) -> float:
+        """Current EMA, or the running mean while still seeding"""
+        if self.value is not None:
+            return self.value
+        return self.seed_sum / self.count if self.count else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"period": self.period, "count": self.count, "seed_sum": self.seed_sum, "value": self.value}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IncrementalEma":
+        ema = cls(data["period"])
+        ema.count = data["count"]
+        ema.seed_sum = data["seed_sum"]
+        ema.value = data["value"]
+        return ema
+
+
+class IndicatorState:
+    """
+    Per-symbol streaming indicator state
+
+    Every append() is constant time regardless of history length.
+    RSI is the simple average gain/loss over the last `rsi_period` changes,
+    as in indicator_kernel.rsi.
+    """
+
+    def __init__(self, symbol: str, rsi_period: int = 14, volume_window: int = 7):
+        self.symbol = symbol
+        self.rsi_period = rsi_period
+        self.volume_window = volume_window
+
+        self.bars = 0
+        self.last_price: Optional[float] = None
+        self.last_volume = 0.0
+        self.last_timestamp: Optional[str] = None
+
+        self.gains = RollingWindow(rsi_period)
+        self.losses = RollingWindow(rsi_period)
+
+        self.ema_fast = IncrementalEma(12)
+        self.ema_slow = IncrementalEma(26)
+        self.signal_line = IncrementalEma(9)
+
+        self.ma20 = RollingWindow(20)
+        self.ma50 = RollingWindow(50)
+        self.volume = RollingWindow(volume_window)
+
+    def append(self, price: float, volume: float = 0.0, timestamp: Optional[str] = None) -> None:
+        """Fold one new bar into every indicator"""
+        price = float(price)
+        volume = float(volume)
+
+        if self.last_price is not None:
+            change = price - self.last_price
+            self.gains.push(change if change > 0 else 0.0)
+            self.losses.push(-change if change < 0 else 0.0)
+
+        self.ema_fast.update(price)
+        self.ema_slow.update(price)
+        if self.ema_slow.ready:
+            self.signal_line.update(self.ema_fast.current() - self.ema_slow.current())
+
+        self.ma20.push(price)
+        self.ma50.push(price)
+        self.volume.push(volume)
+
+        self.bars += 1
+        self.last_price = price
+        self.last_volume = volume
+        self.last_timestamp = timestamp
+
+    @property
+    def rsi(self) -> float:
+        if self.gains.count < self.rsi_period:
+            return 50.0
+        # Summed directly (rsi_period values) so a flat window is exactly zero
+        avg_loss = sum(self.losses.values) / self.rsi_period
+        if avg_loss == 0:
+            return 100.0
+        rs = (sum(self.gains.values) / self.rsi_period) / avg_loss
+        return 100 - (100 / (1 + rs))
+
+    @property
+    def macd(self) -> float:
+        if not self.ema_slow.ready:
+            return 0.0
+        return self.ema_fast.current() - self.ema_slow.current()
+
+    @property
+    def macd_signal(self) -> float:
+        return self.signal_line.current() if self.signal_line.count else 0.0
+
+    def signal_data(self) -> Dict[str, Any]:
+        """Indicator values in the SignalEngine payload shape (same keys and types as the batch path)"""
+        avg_volume = self.volume.total / self.volume_window
+        return {
+            "symbol": self.symbol,
+            "current_price": float(self.last_price),
+            "rsi": round(self.rsi, 2),
+            "macd": round(self.macd, 4),
+            "ma20": round(self.ma20.mean(), 2),
+            "ma50": round(self.ma50.mean(), 2),
+            "volume": int(self.last_volume),
+            "volume_7d_avg": round(avg_volume),
+            "volume_ratio": round(self.last_volume / avg_volume, 2) if avg_volume > 0 else 0.0,
+            "timestamp": self.last_timestamp,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize state to a JSON-safe dict"""
+        return {
+            "symbol": self.symbol,
+            "rsi_period": self.rsi_period,
+            "volume_window": self.volume_window,
+            "bars": self.bars,
+            "last_price": self.last_price,
+            "last_volume": self.last_volume,
+            "last_timestamp": self.last_timestamp,
+            "gains": self.gains.to_dict(),
+            "losses": self.losses.to_dict(),
+            "ema_fast": self.ema_fast.to_dict(),
+            "ema_slow": self.ema_slow.to_dict(),
+            "signal_line": self.signal_line.to_dict(),
+            "ma20": self.ma20.to_dict(),
+            "ma50": self.ma50.to_dict(),
+            "volume": self.volume.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IndicatorState":
+        """Restore state from a to_dict() snapshot"""
+        state = cls(data["symbol"], data["rsi_period"], data["volume_window"])
+        state.bars = data["bars"]
+        state.last_price = data["last_price"]
+        state.last_volume = data["last_volume"]
+        state.last_timestamp = data["last_timestamp"]
+        state.gains = RollingWindow.from_dict(data["gains"])
+        state.losses = RollingWindow.from_dict(data["losses"])
+        state.ema_fast = IncrementalEma.from_dict(data["ema_fast"])
+        state.ema_slow = IncrementalEma.from_dict(data["ema_slow"])
+        state.signal_line = IncrementalEma.from_dict(data["signal_line"])
+        state.ma20 = RollingWindow.from_dict(data["ma20"])
+        state.ma50 = RollingWindow.from_dict(data["ma50"])
+        state.volume = RollingWindow.from_dict(data["volume"])
+        return state
+
+    @classmethod
+    def from_columns(cls, symbol: str, prices, volumes) -> "IndicatorState":
+        """Build state by replaying price/volume columns (one-time O(n) seed)"""
+        state = cls(symbol)
+        for price, volume in zip(prices, volumes):
+            state.append(price, volume)
+        return state
@@ -0,0 +1,189 @@
+"""
+Parameter Sweep: parallel grid search over backtest configurations
+Price arrays are placed in shared memory once and attached by each worker
+process, so tasks only carry parameter dicts. Results stream back as a
+running top-K while chunks complete.
+"""
+import os
+import heapq
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory, util
+from typing import Dict, Any, List, Optional, Iterator, Tuple
+
+import numpy as np
+
+from server.logic.backtest_engine import run_backtest, STRATEGY_DEFAULTS, BacktestError
+
+logger = logging.getLogger(__name__)
+
+SWEEP_MAX_WORKERS = int(os.getenv("SWEEP_MAX_WORKERS", "0")) or None
+SWEEP_CHUNK_SIZE = int(os.getenv("SWEEP_CHUNK_SIZE", "64"))
+
+# Backtest stats where a smaller value ranks higher
+LOWER_IS_BETTER_METRICS = {"max_drawdown_pct", "volatility_pct"}
+
+# Per-worker views onto the shared price arrays, set by _init_worker
+_worker_arrays: Dict[str, np.ndarray] = {}
+_worker_segments: List[shared_memory.SharedMemory] = []
+
+
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Cartesian product of a parameter grid as a list of param dicts"""
+    keys = list(grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+class SharedArrays:
+    """Context manager that copies named arrays into shared memory segments"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+        self.segments: List[shared_memory.SharedMemory] = []
+        self.descriptors: Dict[str, Tuple[str, Tuple[int, ...], str]] = {}
+
+    def __enter__(self) -> Dict[str, Tuple[str, Tuple[int, ...], str]]:
+        for name, array in self.arrays.items():
+            array = np.ascontiguousarray(array)
+            segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+            self.segments.append(segment)
+            self.descriptors[name] = (segment.name, array.shape, array.dtype.str)
+        return self.descriptors
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+
+
+def _close_worker_segments() -> None:
+    """Release the worker's views and close its handles (the parent unlinks the segments)"""
+    _worker_arrays.clear()
+    while _worker_segments:
+        _worker_segments.pop().close()
+
+
+def _init_worker(descriptors: Dict[str, Tuple[str, Tuple[int, ...], str]]) -> None:
+    """Attach to the shared price arrays once per worker process"""
+    # Runs when the worker exits; unlike atexit, multiprocessing finalizers
+    # also run in forked pool workers
+    util.Finalize(None, _close_worker_segments, exitpriority=0)
+    for name, (segment_name, shape, dtype) in descriptors.items():
+        segment = shared_memory.SharedMemory(name=segment_name)
+        _worker_segments.append(segment)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+        array.flags.writeable = False
+        _worker_arrays[name] = array
+
+
+def _evaluate_chunk(
+    strategy: str,
+    param_sets: List[Dict[str, Any]],
+    metric: str,
+    fee_bps: float,
+) -> List[Dict[str, Any]]:
+    """Backtest a chunk of parameter sets against the shared arrays"""
+    closes = _worker_arrays["closes"]
+    volumes = _worker_arrays.get("volumes")
+    results = []
+    for params in param_sets:
+        try:
+            stats = run_backtest(
+                strategy, closes, volumes, params=params, fee_bps=fee_bps, include_trades=False
+            )["stats"]
+        except BacktestError as e:
+            results.append({"params": params, "error": str(e)})
+            continue
+        results.append({"params": params, "score": stats.get(metric, 0.0), "stats": stats})
+    return results
+
+
+def sweep(
+    strategy: str,
+    closes,
+    grid: Dict[str, List[Any]],
+    volumes=None,
+    metric: str = "sharpe",
+    top_k: int = 10,
+    fee_bps: float = 0.0,
+    max_workers: Optional[int] = SWEEP_MAX_WORKERS,
+    chunk_size: int = SWEEP_CHUNK_SIZE,
+    maximize: Optional[bool] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Fan a parameter grid out across a process pool, streaming progress
+
+    Results are ranked by metric, highest first unless maximize is False;
+    by default metrics in LOWER_IS_BETTER_METRICS rank lowest first.
+
+    Yields after every completed chunk:
+        {"completed": n, "total": N, "failed": f, "top": [best results so far]}
+    """
+    if maximize is None:
+        maximize = metric not in LOWER_IS_BETTER_METRICS
+    sign = 1.0 if maximize else -1.0
+
+    if strategy not in STRATEGY_DEFAULTS:
+        raise BacktestError(f"Unknown strategy: {strategy}")
+    unknown = set(grid) - set(STRATEGY_DEFAULTS[strategy])
+    if unknown:
+        raise BacktestError(f"Unknown parameters for {strategy}: {', '.join(sorted(unknown))}")
+
+    param_sets = expand_grid(grid)
+    total = len(param_sets)
+    chunks = [param_sets[i:i + chunk_size] for i in range(0, total, chunk_size)]
+
+    arrays = {"closes": np.asarray(closes, dtype=np.float64)}
+    if volumes is not None:
+        arrays["volumes"] = np.asarray(volumes, dtype=np.float64)
+
+    heap: List[Tuple[float, int, Dict[str, Any]]] = []
+    sequence = itertools.count()
+    completed = 0
+    failed = 0
+
+    with SharedArrays(arrays) as descriptors:
+        with ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker, initargs=(descriptors,)
+        ) as pool:
+            futures = [
+                pool.submit(_evaluate_chunk, strategy, chunk, metric, fee_bps) for chunk in chunks
+            ]
+            for future in as_completed(futures):
+                for result in future.result():
+                    completed += 1
+                    if "error" in result:
+                        failed += 1
+                        continue
+                    entry = (sign * result["score"], next(sequence), result)
+                    if len(heap) < top_k:
+                        heapq.heappush(heap, entry)
+                    elif entry[0] > heap[0][0]:
+                        heapq.heapreplace(heap, entry)
+
+                yield {
+                    "completed": completed,
+                    "total": total,
+                    "failed": failed,
+                    "top": [item[2] for item in sorted(heap, key=lambda x: (-x[0], x[1]))],
+                }
+
+
+def optimize(
+    strategy: str,
+    closes,
+    grid: Dict[str, List[Any]],
+    volumes=None,
+    metric: str = "sharpe",
+    top_k: int = 10,
+    **kwargs,
+) -> List[Dict[str, Any]]:
+    """Run a full sweep and return the final top-K results"""
+    top: List[Dict[str, Any]] = []
+    for progress in sweep(strategy, closes, grid, volumes, metric, top_k, **kwargs):
+        top = progress["top"]
+    logger.info(f"Sweep finished for {strategy}: {len(expand_grid(grid))} configurations")
+    return top
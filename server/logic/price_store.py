@@ -0,0 +1,241 @@
+"""
+PriceStore: columnar, memory-mapped price history
+One contiguous array per field per symbol, persisted as memory-mapped files
+and appended in place. Every worker maps the same files, so history lives
+once in the page cache and last-N lookups are zero-copy slices. Each
+series records the provider that seeded it, so history from a different
+provider (e.g. mock walks left in the shared default directory) is
+re-seeded instead of served.
+"""
+import os
+import re
+import fcntl
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+DEFAULT_PRICE_STORE_DIR = os.getenv(
+    "PRICE_STORE_DIR",
+    os.path.join(tempfile.gettempdir(), "stackmotive_price_store"),
+)
+
+FIELDS = {
+    "timestamp": np.dtype(np.int64),
+    "price": np.dtype(np.float64),
+    "volume": np.dtype(np.float64),
+}
+
+_SYMBOL_PATTERN = re.compile(r"^[A-Za-z0-9._-]+$")
+
+
+class PriceStore:
+    """
+    Columnar price history store backed by memory-mapped files
+
+    Layout per symbol directory:
+        length.i64      - committed bar count (shared across processes)
+        <field>.col     - preallocated column, grown by doubling
+        source          - name of the provider that seeded the series
+    Appends write the data first and bump the length last, so readers in
+    other processes only ever observe fully written bars.
+    """
+
+    def __init__(self, root: Optional[str] = None, initial_capacity: int = 256):
+        self.root = root or DEFAULT_PRICE_STORE_DIR
+        self.initial_capacity = initial_capacity
+        os.makedirs(self.root, exist_ok=True)
+        self._lengths: Dict[str, np.memmap] = {}
+        self._columns: Dict[str, Dict[str, np.memmap]] = {}
+
+    def _symbol_dir(self, symbol: str) -> str:
+        if not _SYMBOL_PATTERN.match(symbol):
+            raise ValueError(f"Invalid symbol for price store: {symbol!r}")
+        return os.path.join(self.root, symbol)
+
+    def __contains__(self, symbol: str) -> bool:
+        try:
+            return self.length(symbol) > 0
+        except ValueError:
+            return False
+
+    def symbols(self) -> List[str]:
+        """All symbols with at least one stored bar"""
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, name, "length.i64")) and name in self
+        )
+
+    def _length_map(self, symbol: str, create: bool = False) -> Optional[np.memmap]:
+        length_map = self._lengths.get(symbol)
+        if length_map is not None:
+            return length_map
+
+        path = os.path.join(self._symbol_dir(symbol), "length.i64")
+        if not os.path.exists(path):
+            if not create:
+                return None
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            np.zeros(1, dtype=np.int64).tofile(path)
+
+        length_map = np.memmap(path, dtype=np.int64, mode="r+", shape=(1,))
+        self._lengths[symbol] = length_map
+        return length_map
+
+    def length(self, symbol: str) -> int:
+        """Number of committed bars for a symbol"""
+        length_map = self._length_map(symbol)
+        return int(length_map[0]) if length_map is not None else 0
+
+    def _columns_for(self, symbol: str, min_capacity: int) -> Dict[str, np.memmap]:
+        """Map the symbol's columns, growing or remapping them if too small"""
+        columns = self._columns.get(symbol)
+        if columns is not None and len(columns["price"]) >= min_capacity:
+            return columns
+
+        symbol_dir = self._symbol_dir(symbol)
+        os.makedirs(symbol_dir, exist_ok=True)
+        columns = {}
+        for field, dtype in FIELDS.items():
+            path = os.path.join(symbol_dir, f"{field}.col")
+            capacity = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+            if capacity < min_capacity:
+                capacity = max(self.initial_capacity, capacity)
+                while capacity < min_capacity:
+                    capacity *= 2
+                with open(path, "ab") as f:
+                    f.truncate(capacity * dtype.itemsize)
+            columns[field] = np.memmap(path, dtype=dtype, mode="r+", shape=(capacity,))
+
+        self._columns[symbol] = columns
+        return columns
+
+    @contextmanager
+    def _write_lock(self, symbol: str):
+        lock_path = os.path.join(self._symbol_dir(symbol), ".lock")
+        os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def extend(
+        self,
+        symbol: str,
+        timestamps: Iterable[int],
+        prices: Iterable[float],
+        volumes: Iterable[float],
+        only_if_empty: bool = False,
+    ) -> int:
+        """
+        Append bars for a symbol in place
+
+        With only_if_empty, nothing is written when the symbol already has
+        history; the check runs under the write lock so concurrent workers
+        seeding the same symbol write it exactly once.
+
+        Returns:
+            New committed bar count
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        volumes = np.asarray(volumes, dtype=np.float64)
+        if not (len(timestamps) == len(prices) == len(volumes)):
+            raise ValueError("timestamps, prices and volumes must have equal length")
+
+        with self._write_lock(symbol):
+            length_map = self._length_map(symbol, create=True)
+            start = int(length_map[0])
+            if only_if_empty and start > 0:
+                return start
+            end = start + len(prices)
+            columns = self._columns_for(symbol, end)
+            columns["timestamp"][start:end] = timestamps
+            columns["price"][start:end] = prices
+            columns["volume"][start:end] = volumes
+            length_map[0] = end
+        return end
+
+    def provenance(self, symbol: str) -> Optional[str]:
+        """Name of the provider that seeded a symbol (None if unrecorded)"""
+        try:
+            with open(os.path.join(self._symbol_dir(symbol), "source")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def seed(
+        self,
+        symbol: str,
+        timestamps: Iterable[int],
+        prices: Iterable[float],
+        volumes: Iterable[float],
+        source: str,
+    ) -> int:
+        """
+        Write a symbol's history from a provider, replacing any other provider's
+
+        Nothing is written when the stored series already came from `source`;
+        the check runs under the write lock so concurrent workers seed once.
+        A replaced series is rewritten in place, so views taken before the
+        re-seed may observe the new values.
+
+        Returns:
+            Committed bar count
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        volumes = np.asarray(volumes, dtype=np.float64)
+        if not (len(timestamps) == len(prices) == len(volumes)):
+            raise ValueError("timestamps, prices and volumes must have equal length")
+
+        with self._write_lock(symbol):
+            length_map = self._length_map(symbol, create=True)
+            if int(length_map[0]) > 0 and self.provenance(symbol) == source:
+                return int(length_map[0])
+            length_map[0] = 0
+            columns = self._columns_for(symbol, len(prices))
+            columns["timestamp"][:len(prices)] = timestamps
+            columns["price"][:len(prices)] = prices
+            columns["volume"][:len(prices)] = volumes
+            source_path = os.path.join(self._symbol_dir(symbol), "source")
+            with open(f"{source_path}.tmp", "w") as f:
+                f.write(source)
+            os.replace(f"{source_path}.tmp", source_path)
+            length_map[0] = len(prices)
+        return len(prices)
+
+    def append(self, symbol: str, timestamp: int, price: float, volume: float) -> int:
+        """Append a single bar; returns the new committed bar count"""
+        return self.extend(symbol, [timestamp], [price], [volume])
+
+    def last_n(self, symbol: str, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Zero-copy views of the trailing `n` bars (all bars when n is None)
+
+        Returns:
+            Dict of field name -> read-only array view
+        """
+        length = self.length(symbol)
+        if length == 0:
+            raise ValueError(f"Symbol {symbol} not supported")
+
+        columns = self._columns_for(symbol, length)
+        start = 0 if n is None else max(0, length - n)
+        views = {}
+        for field, column in columns.items():
+            view = column[start:length]
+            view.flags.writeable = False
+            views[field] = view
+        return views
+
+    def flush(self) -> None:
+        """Flush dirty pages to disk (durability only; visibility is immediate)"""
+        for columns in self._columns.values():
+            for column in columns.values():
+                column.flush()
+        for length_map in self._lengths.values():
+            length_map.flush()
@@ -0,0 +1,235 @@
+"""
+Risk Engine: portfolio VaR, CVaR, volatility and beta from price history
+Works on an (assets x bars) price matrix: covariance with Ledoit-Wolf
+shrinkage, parametric and historical VaR/CVaR, beta against a benchmark,
+and Monte Carlo VaR with paths split across a process pool.
+"""
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+RISK_MC_PATHS = int(os.getenv("RISK_MC_PATHS", "10000"))
+# Below RISK_MC_PATHS so a default run is split across the process pool
+RISK_MC_CHUNK_PATHS = int(os.getenv("RISK_MC_CHUNK_PATHS", "2500"))
+RISK_MC_MAX_WORKERS = int(os.getenv("RISK_MC_MAX_WORKERS", "0")) or None
+
+TRADING_DAYS = 252
+CONFIDENCE_LEVELS = (0.95, 0.99)
+
+_NORMAL = NormalDist()
+
+
+class RiskError(ValueError):
+    """Inputs insufficient for a risk calculation"""
+    pass
+
+
+def returns_matrix(prices) -> np.ndarray:
+    """
+    Simple returns as a (bars - 1) x assets matrix
+
+    Args:
+        prices: assets x bars array, aligned on the same trailing bars
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim == 1:
+        prices = prices[np.newaxis, :]
+    if prices.shape[1] < 3:
+        raise RiskError("At least 3 price bars are required")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = prices[:, 1:] / prices[:, :-1] - 1.0
+    return np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0).T
+
+
+def shrunk_covariance(returns: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Ledoit-Wolf covariance shrunk toward a scaled identity
+
+    Returns:
+        (covariance, shrinkage intensity in [0, 1])
+    """
+    t, n = returns.shape
+    x = returns - returns.mean(axis=0)
+    sample = x.T @ x / t
+    mu = np.trace(sample) / n
+    target = mu * np.eye(n)
+
+    delta = np.sum((sample - target) ** 2) / n
+    if delta <= 0:
+        return sample, 0.0
+    # sum_t ||x_t x_t' - S||_F^2 without materializing the outer products
+    row_norms = np.sum(x ** 2, axis=1)
+    beta = (np.sum(row_norms ** 2) - t * np.sum(sample ** 2)) / (t ** 2 * n)
+    shrinkage = float(min(max(beta / delta, 0.0), 1.0))
+    return shrinkage * target + (1.0 - shrinkage) * sample, shrinkage
+
+
+def parametric_var_cvar(mean: float, sigma: float, confidence: float) -> Tuple[float, float]:
+    """Normal VaR and CVaR of a return distribution (as returns, losses negative)"""
+    z = _NORMAL.inv_cdf(1.0 - confidence)
+    var = mean + z * sigma
+    cvar = mean - sigma * _NORMAL.pdf(z) / (1.0 - confidence)
+    return var, cvar
+
+
+def historical_var_cvar(portfolio_returns: np.ndarray, confidence: float) -> Tuple[float, float]:
+    """Empirical VaR (lower quantile) and CVaR (mean of returns at or below it)"""
+    var = float(np.quantile(portfolio_returns, 1.0 - confidence))
+    tail = portfolio_returns[portfolio_returns <= var]
+    return var, float(tail.mean()) if len(tail) else var
+
+
+def beta(portfolio_returns: np.ndarray, benchmark_returns: np.ndarray) -> Optional[float]:
+    """Beta over the overlapping trailing window; None if the benchmark is flat"""
+    n = min(len(portfolio_returns), len(benchmark_returns))
+    if n < 2:
+        return None
+    p = portfolio_returns[-n:]
+    b = benchmark_returns[-n:]
+    variance = np.var(b)
+    if variance <= 0:
+        return None
+    return float(np.mean((p - p.mean()) * (b - b.mean())) / variance)
+
+
+def _simulate_chunk(
+    mean: np.ndarray,
+    chol: np.ndarray,
+    weights: np.ndarray,
+    paths: int,
+    horizon: int,
+    seed: np.random.SeedSequence,
+) -> np.ndarray:
+    """Portfolio returns over `horizon` days for one chunk of simulated paths"""
+    rng = np.random.default_rng(seed)
+    growth = np.ones((paths, len(weights)))
+    for _ in range(horizon):
+        shocks = rng.standard_normal((paths, len(weights)))
+        growth *= 1.0 + mean + shocks @ chol.T
+    return growth @ weights - 1.0
+
+
+def monte_carlo_var_cvar(
+    mean: np.ndarray,
+    cov: np.ndarray,
+    weights: np.ndarray,
+    confidence_levels: Sequence[float] = CONFIDENCE_LEVELS,
+    paths: int = RISK_MC_PATHS,
+    horizon: int = 1,
+    seed: Optional[int] = None,
+    max_workers: Optional[int] = RISK_MC_MAX_WORKERS,
+    chunk_paths: int = RISK_MC_CHUNK_PATHS,
+) -> Dict[float, Tuple[float, float]]:
+    """
+    Monte Carlo VaR/CVaR from correlated normal asset returns
+
+    Paths are split into chunks with independent child seeds, so results
+    depend only on (seed, paths, chunk_paths), not on the worker count.
+    Chunks run in a process pool when there is more than one.
+
+    Returns:
+        confidence -> (VaR, CVaR) as horizon returns
+    """
+    # Jitter keeps Cholesky stable for (near-)singular covariances
+    chol = np.linalg.cholesky(cov + np.eye(len(cov)) * 1e-12)
+    sizes = [min(chunk_paths, paths - start) for start in range(0, paths, chunk_paths)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if len(sizes) == 1:
+        simulated = _simulate_chunk(mean, chol, weights, sizes[0], horizon, seeds[0])
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [
+                pool.submit(_simulate_chunk, mean, chol, weights, size, horizon, child)
+                for size, child in zip(sizes, seeds)
+            ]
+            simulated = np.concatenate([f.result() for f in futures])
+
+    return {c: historical_var_cvar(simulated, c) for c in confidence_levels}
+
+
+def _pct(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value * 100, 4)
+
+
+def compute_risk(
+    weights,
+    prices,
+    benchmark_prices=None,
+    mc_paths: int = RISK_MC_PATHS,
+    mc_horizon: int = 1,
+    seed: Optional[int] = None,
+    symbols: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Full risk report for a weighted portfolio
+
+    Args:
+        weights: per-asset portfolio weights (normalized here)
+        prices: assets x bars price matrix aligned on the same bars
+        benchmark_prices: benchmark price series for beta (optional)
+        mc_paths: Monte Carlo path count (0 disables the simulation)
+
+    Returns:
+        Dict of risk figures; VaR/CVaR/volatility are percentages
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.ndim != 1 or not len(weights) or weights.sum() <= 0:
+        raise RiskError("Portfolio weights must be a non-empty positive vector")
+    weights = weights / weights.sum()
+
+    returns = returns_matrix(prices)
+    if returns.shape[1] != len(weights):
+        raise RiskError("Weights and price matrix have different asset counts")
+
+    mean = returns.mean(axis=0)
+    cov, shrinkage = shrunk_covariance(returns)
+    portfolio_returns = returns @ weights
+    portfolio_mean = float(weights @ mean)
+    portfolio_variance = float(weights @ cov @ weights)
+    sigma = float(np.sqrt(max(portfolio_variance, 0.0)))
+
+    methods: Dict[str, Dict[str, Optional[float]]] = {"parametric": {}, "historical": {}}
+    for c in CONFIDENCE_LEVELS:
+        level = int(round(c * 100))
+        p_var, p_cvar = parametric_var_cvar(portfolio_mean, sigma, c)
+        h_var, h_cvar = historical_var_cvar(portfolio_returns, c)
+        methods["parametric"].update({f"var_{level}": _pct(p_var), f"cvar_{level}": _pct(p_cvar)})
+        methods["historical"].update({f"var_{level}": _pct(h_var), f"cvar_{level}": _pct(h_cvar)})
+
+    if mc_paths > 0:
+        simulated = monte_carlo_var_cvar(mean, cov, weights, paths=mc_paths, horizon=mc_horizon, seed=seed)
+        methods["monte_carlo"] = {"paths": mc_paths, "horizon_days": mc_horizon}
+        for c, (mc_var, mc_cvar) in simulated.items():
+            level = int(round(c * 100))
+            methods["monte_carlo"].update({f"var_{level}": _pct(mc_var), f"cvar_{level}": _pct(mc_cvar)})
+
+    portfolio_beta = None
+    if benchmark_prices is not None and len(benchmark_prices) >= 3:
+        benchmark_returns = returns_matrix(benchmark_prices)[:, 0]
+        portfolio_beta = beta(portfolio_returns, benchmark_returns)
+
+    ranked = np.sort(weights)[::-1] * 100
+    result = {
+        "portfolio_variance": portfolio_variance,
+        "portfolio_volatility": round(sigma * np.sqrt(TRADING_DAYS) * 100, 4),
+        "portfolio_beta": None if portfolio_beta is None else round(portfolio_beta, 4),
+        "var_1day_95": methods["historical"]["var_95"],
+        "var_1day_99": methods["historical"]["var_99"],
+        "cvar_1day_95": methods["historical"]["cvar_95"],
+        "largest_position_pct": round(float(ranked[0]), 4),
+        "top_5_positions_pct": round(float(ranked[:5].sum()), 4),
+        "top_10_positions_pct": round(float(ranked[:10].sum()), 4),
+        "covariance_shrinkage": round(shrinkage, 4),
+        "observations": int(returns.shape[0]),
+        "methods": methods,
+    }
+    if symbols is not None:
+        result["symbols"] = list(symbols)
+    return result
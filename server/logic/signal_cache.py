@@ -0,0 +1,182 @@
+"""
+SignalCache: bounded LRU + TTL cache for time-bucketed signal data
+Level 1 is an in-process OrderedDict with O(1) eviction and a lock-free read path.
+Level 2 is optional Redis, shared by every worker so each symbol is computed
+once per bucket instead of once per process. With Redis, each symbol also has
+a version counter; invalidation bumps it, and L1 entries built under an older
+version are ignored by every worker.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SIGNAL_CACHE_WINDOW_SEC = int(os.getenv("SIGNAL_CACHE_WINDOW_SEC", "300"))
+SIGNAL_CACHE_MAX_ENTRIES = int(os.getenv("SIGNAL_CACHE_MAX_ENTRIES", "10000"))
+
+
+class SignalCache:
+    """
+    Two-level cache keyed by (symbol, time bucket)
+
+    Entries expire at the end of their bucket. Writes take a lock; reads do a
+    single dict lookup and only refresh LRU order when the lock is free, so
+    readers never block behind writers. With Redis, every lookup first reads
+    the symbols' versions in one MGET so invalidations from other workers
+    take effect immediately.
+    """
+
+    def __init__(
+        self,
+        window_seconds: int = SIGNAL_CACHE_WINDOW_SEC,
+        max_entries: int = SIGNAL_CACHE_MAX_ENTRIES,
+        redis_client: Any = None,
+        key_prefix: str = "signal",
+    ):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self.redis_client = redis_client
+        self.key_prefix = key_prefix
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, Optional[int], Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bucket(self, now: Optional[float] = None) -> int:
+        """Current time bucket index"""
+        return int((now if now is not None else time.time()) // self.window_seconds)
+
+    def _redis_key(self, symbol: str, bucket: int, version: Optional[int]) -> str:
+        return f"{self.key_prefix}:{symbol}:{bucket}:{version or 0}"
+
+    def _version_key(self, symbol: str) -> str:
+        return f"{self.key_prefix}:{symbol}:version"
+
+    def _versions(self, symbols: Iterable[str]) -> Optional[Dict[str, int]]:
+        """Shared invalidation versions, or None without Redis (or if it is unreachable)"""
+        if self.redis_client is None:
+            return None
+        symbols = list(symbols)
+        try:
+            raw_values = self.redis_client.mget([self._version_key(s) for s in symbols])
+        except Exception as e:
+            logger.warning(f"Signal cache version lookup failed: {e}")
+            return None
+        return {symbol: int(raw or 0) for symbol, raw in zip(symbols, raw_values)}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get_local(self, key: Tuple[str, int], now: float, version: Optional[int] = None) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, entry_version, value = entry
+        if expires_at <= now or (version is not None and entry_version != version):
+            return None
+        # Refresh recency opportunistically; a contended lock just skips it
+        if self._lock.acquire(blocking=False):
+            try:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+            finally:
+                self._lock.release()
+        return value
+
+    def _set_local(
+        self, key: Tuple[str, int], value: Dict, expires_at: float, now: float, version: Optional[int] = None
+    ) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, version, value)
+            self._entries.move_to_end(key)
+            # Expired entries are oldest first, so trimming the head is O(1) each
+            while self._entries:
+                oldest_key, (oldest_expiry, _, _) = next(iter(self._entries.items()))
+                if oldest_expiry > now and len(self._entries) <= self.max_entries:
+                    break
+                del self._entries[oldest_key]
+
+    def get(self, symbol: str) -> Optional[Dict]:
+        """Get signal data for the current bucket, or None"""
+        return self.get_many([symbol]).get(symbol)
+
+    def get_many(self, symbols: Iterable[str]) -> Dict[str, Dict]:
+        """Get cached signal data for many symbols, falling back to Redis for local misses"""
+        symbols = list(symbols)
+        now = time.time()
+        bucket = self.bucket(now)
+        versions = self._versions(symbols)
+        hits: Dict[str, Dict] = {}
+        misses = []
+        for symbol in symbols:
+            version = versions[symbol] if versions is not None else None
+            value = self._get_local((symbol, bucket), now, version)
+            if value is not None:
+                hits[symbol] = value
+            else:
+                misses.append(symbol)
+
+        if misses and versions is not None:
+            try:
+                raw_values = self.redis_client.mget([self._redis_key(s, bucket, versions[s]) for s in misses])
+            except Exception as e:
+                logger.warning(f"Signal cache L2 get failed: {e}")
+                raw_values = []
+            expires_at = (bucket + 1) * self.window_seconds
+            for symbol, raw in zip(misses, raw_values):
+                if raw:
+                    value = json.loads(raw)
+                    self._set_local((symbol, bucket), value, expires_at, now, versions[symbol])
+                    hits[symbol] = value
+
+        return hits
+
+    def set(self, symbol: str, value: Dict) -> None:
+        """Cache signal data for the current bucket"""
+        self.set_many({symbol: value})
+
+    def set_many(self, values: Dict[str, Dict]) -> None:
+        """Cache signal data for many symbols in both levels"""
+        if not values:
+            return
+        now = time.time()
+        bucket = self.bucket(now)
+        expires_at = (bucket + 1) * self.window_seconds
+        versions = self._versions(values)
+        for symbol, value in values.items():
+            version = versions[symbol] if versions is not None else None
+            self._set_local((symbol, bucket), value, expires_at, now, version)
+
+        if versions is not None:
+            ttl = max(1, int(expires_at - now))
+            try:
+                pipe = self.redis_client.pipeline()
+                for symbol, value in values.items():
+                    pipe.setex(self._redis_key(symbol, bucket, versions[symbol]), ttl, json.dumps(value))
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Signal cache L2 set failed: {e}")
+
+    def invalidate(self, symbol: str) -> None:
+        """
+        Drop the current bucket's entry for a symbol in every worker
+
+        The local entry is removed directly; bumping the shared version makes
+        other workers' L1 entries and the old L2 entry unreachable.
+        """
+        bucket = self.bucket()
+        with self._lock:
+            self._entries.pop((symbol, bucket), None)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.incr(self._version_key(symbol))
+            except Exception as e:
+                logger.warning(f"Signal cache invalidation failed: {e}")
+
+    def clear(self) -> None:
+        """Drop all local entries"""
+        with self._lock:
+            self._entries.clear()
@@ -2,10 +2,40 @@
 SignalEngine: Real-time technical indicator calculation engine
 Calculates RSI, MACD, Moving Averages, and Volume indicators for trading signals
 """
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
-import random
-import time
+from typing import Callable, Dict, List, Optional
+from datetime import datetime
+import logging
+import threading
+
+import numpy as np
+
+from server.logic import indicator_kernel
+from server.logic.backtest_engine import STRATEGY_DEFAULTS
+from server.logic.bar_aggregator import Bar, MultiTimeframeAggregator
+from server.logic.indicator_state import IndicatorState
+from server.logic.price_providers import SYNTHETIC_PROVIDER_NAMES, PriceHistoryProvider, get_default_provider
+from server.logic.price_store import PriceStore
+from server.logic.signal_cache import SignalCache
+from server.logic.signal_state_tracker import SignalStateTracker, persist_signal_edges
+from server.logic.volatility_tracker import VolatilityTracker
+from server.services.cache import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Trailing bars fed to the indicator kernel and used to seed streaming state
+SIGNAL_LOOKBACK_BARS = 100
+
+# Moving averages present in the signal payload
+SIGNAL_MA_PERIODS = (20, 50)
+
+# Parameters live recommendations apply; any other parameter must equal the
+# default the signal payload is computed with (RSI period, volume window, ...)
+RECOMMENDATION_PARAMS = {
+    "RSI Rebound": {"rsi_entry"},
+    "Momentum Buy": {"ma_period", "min_volume_ratio"},
+    "Trend Exit": {"ma_period"},
+    "DCA Weekly": {"amount"},
+}
 
 
 class SignalEngine:
@@ -13,67 +43,87 @@ class SignalEngine:
     Technical indicator calculation engine for trading signals
     """
     
-    def __init__(self):
-        # Mock historical price data for demonstration
-        # In production, this would connect to a real data provider
-        self.mock_price_history = self._generate_mock_price_history()
-        # Price cache for 5-minute stability windows
-        self.price_cache = {}
+    def __init__(
+        self,
+        price_store: Optional[PriceStore] = None,
+        signal_cache: Optional[SignalCache] = None,
+        provider: Optional[PriceHistoryProvider] = None,
+        on_bar_appended: Optional[Callable[[str], None]] = None,
+    ):
+        # Columnar price history shared by all workers through memory-mapped files
+        self.price_store = price_store or PriceStore()
+        # Source of history for symbols not yet in the store, loaded on first request
+        self.provider = provider or get_default_provider()
+        # Bounded signal cache for 5-minute stability windows, shared via Redis when configured
+        if signal_cache is None:
+            signal_cache = SignalCache(redis_client=get_redis_client())
+        self.signal_cache = signal_cache
+        # Incremental indicator state for symbols receiving live bars
+        self.stream_states: Dict[str, IndicatorState] = {}
+        # Intraday bars built from ticks; completed daily bars feed the price store
+        self.bar_aggregator = MultiTimeframeAggregator(on_bar_close=self._on_bar_close)
+        # Online realized volatility, seeded from stored history on first query
+        self.volatility = VolatilityTracker()
+        # Last trigger state per symbol, so only flips become stored signals
+        self.signal_state = SignalStateTracker()
+        # Called with the symbol after each appended bar (e.g. to mark holders' overlays dirty)
+        self.on_bar_appended = on_bar_appended
+        # Stored symbols whose provenance was checked against the provider
+        self._provenance_checked: set = set()
     
-    def _generate_mock_price_history(self) -> Dict[str, List[Dict]]:
-        """Generate realistic mock price history for all supported symbols"""
-        symbols = ["BTC", "ETH", "SOL", "ADA", "DOT", "MATIC", "LINK", "AVAX", 
-                  "AAPL", "META", "GOOGL", "MSFT", "AMZN", "TSLA", "NVDA", "NFLX"]
-        
-        # Base prices for each symbol
-        base_prices = {
-            # Cryptocurrencies  
-            "BTC": 95000,
-            "ETH": 3500,
-            "SOL": 220,
-            "ADA": 0.85,
-            "DOT": 8.5,
-            "MATIC": 1.2,
-            "LINK": 18.5,
-            "AVAX": 45.0,
-            # Equities
-            "AAPL": 195.50,
-            "META": 425.30,
-            "GOOGL": 165.80,
-            "MSFT": 415.20,
-            "AMZN": 185.75,
-            "TSLA": 248.90,
-            "NVDA": 128.45,
-            "NFLX": 695.20
-        }
+    def supported_symbols(self) -> List[str]:
+        """Symbols available from the provider or already in the store"""
+        return sorted(set(self.provider.symbols()) | set(self.price_store.symbols()))
+    
+    def ensure_symbol(self, symbol: str) -> bool:
+        """
+        Warm a symbol's history into the store if needed
         
-        history = {}
+        Stored history seeded by a different provider is re-seeded once per
+        process when this provider can supply the symbol; otherwise it is
+        served as stored, keeping its recorded provenance.
         
-        for symbol in symbols:
-            base_price = base_prices[symbol]
-            prices = []
-            current_price = base_price
-            
-            # Generate 100 days of price history
-            for i in range(100):
-                # Add realistic price movement (random walk with trend)
-                change_percent = random.uniform(-0.005, 0.005)  # ±0.5% daily change max
-                current_price *= (1 + change_percent)
-                
-                # Generate volume (higher volume on bigger price moves)
-                volume_base = random.uniform(800000, 2000000)
-                volume_multiplier = 1 + abs(change_percent) * 10
-                volume = volume_base * volume_multiplier
-                
-                prices.append({
-                    'timestamp': datetime.now() - timedelta(days=99-i),
-                    'price': round(current_price, 2 if current_price > 1 else 6),
-                    'volume': round(volume)
-                })
-            
-            history[symbol] = prices
-            
-        return history
+        Returns:
+            True if the symbol has history available
+        """
+        if symbol in self.price_store and (
+            symbol in self._provenance_checked or self.price_store.provenance(symbol) == self.provider.name
+        ):
+            return True
+        history = self.provider.load(symbol)
+        self._provenance_checked.add(symbol)
+        if not history or not history[1]:
+            return symbol in self.price_store
+        self.price_store.seed(symbol, *history, source=self.provider.name)
+        self.signal_cache.invalidate(symbol)
+        return True
+    
+    def is_synthetic(self, symbol: str) -> bool:
+        """
+        Whether the symbol's stored history was seeded by a synthetic (demo) provider
+        
+        Based on the provenance recorded in the price store, so mock walks
+        served through another provider are still reported; unrecorded
+        history is judged by the current provider.
+        """
+        source = self.price_store.provenance(symbol)
+        if source is None or source == self.provider.name:
+            return self.provider.synthetic
+        return source in SYNTHETIC_PROVIDER_NAMES
+    
+    def prewarm(self, symbols: Optional[List[str]] = None) -> int:
+        """
+        Load history and compute signals for symbols ahead of first request
+        
+        Returns:
+            Number of symbols warmed
+        """
+        symbols = symbols if symbols is not None else self.supported_symbols()
+        warmed = [s for s in symbols if self.ensure_symbol(s)]
+        if warmed:
+            self.get_signal_data_batch(warmed)
+        logger.info(f"Signal engine prewarmed {len(warmed)} symbols")
+        return len(warmed)
     
     def get_signal_data(self, symbol: str) -> Dict:
         """
@@ -85,57 +135,164 @@ class SignalEngine:
         Returns:
             Dictionary containing all signal data
         """
-        if symbol not in self.mock_price_history:
+        if not self.ensure_symbol(symbol):
             raise ValueError(f"Symbol {symbol} not supported")
         
-        # Create cache key for 5-minute windows (300 seconds)
-        cache_key = f"{symbol}_{int(time.time() // 300)}"
+        return self.get_signal_data_batch([symbol])[symbol]
+    
+    def get_signal_data_batch(self, symbols: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        Calculate technical indicators for many symbols in one batched kernel pass
+        
+        Args:
+            symbols: Symbols to evaluate (defaults to every tracked symbol)
+            
+        Returns:
+            Dictionary of symbol -> signal data
+        """
+        if symbols is None:
+            symbols = self.supported_symbols()
+        
+        unsupported = [s for s in symbols if not self.ensure_symbol(s)]
+        if unsupported:
+            raise ValueError(f"Symbol {unsupported[0]} not supported")
+        
+        # Return cached data where available within the 5-minute window
+        results = self.signal_cache.get_many(symbols)
+        misses = [symbol for symbol in symbols if symbol not in results]
+        computed = {}
+        
+        timestamp = datetime.now().isoformat()
+        
+        # Streaming symbols already hold up-to-date indicators; the rest are
+        # grouped by lookback length so each group forms a dense matrix
+        groups: Dict[int, List[str]] = {}
+        for symbol in misses:
+            state = self.stream_states.get(symbol)
+            if state is not None:
+                signal_data = state.signal_data()
+                signal_data["timestamp"] = timestamp
+                computed[symbol] = signal_data
+            else:
+                lookback = min(self.price_store.length(symbol), SIGNAL_LOOKBACK_BARS)
+                groups.setdefault(lookback, []).append(symbol)
+        
+        for lookback, group in groups.items():
+            windows = [self.price_store.last_n(s, lookback) for s in group]
+            closes = np.stack([w['price'] for w in windows])
+            volumes = np.stack([w['volume'] for w in windows])
+            indicators = indicator_kernel.compute_indicators(closes, volumes)
+            
+            for row, symbol in enumerate(group):
+                computed[symbol] = self._build_signal_data(symbol, indicators, row, timestamp)
         
-        # Return cached data if available within the 5-minute window
-        if cache_key in self.price_cache:
-            return self.price_cache[cache_key]
+        self.signal_cache.set_many(computed)
+        results.update(computed)
+        return results
+    
+    def append_bar(self, symbol: str, price: float, volume: float, timestamp: Optional[datetime] = None) -> Dict:
+        """
+        Append a new bar and update the symbol's indicators in constant time
         
-        price_data = self.mock_price_history[symbol]
+        The first bar for a symbol seeds its streaming state from stored history;
+        every later bar is folded in without touching the history. The
+        on_bar_appended hook runs last; its failures are logged, not raised.
         
-        # Extract price and volume arrays
-        prices = [item['price'] for item in price_data]
-        volumes = [item['volume'] for item in price_data]
+        Returns:
+            Updated signal data for the symbol
+        """
+        if not self.ensure_symbol(symbol):
+            raise ValueError(f"Symbol {symbol} not supported")
         
-        # Calculate technical indicators
-        rsi = self._calculate_rsi(prices)
-        macd = self._calculate_macd(prices)
-        ma20 = self._calculate_moving_average(prices, 20)
-        ma50 = self._calculate_moving_average(prices, 50)
-        current_volume = volumes[-1]
-        avg_volume_7d = sum(volumes[-7:]) / 7
+        timestamp = timestamp or datetime.now()
+        state = self.stream_states.get(symbol)
+        if state is None:
+            history = self.price_store.last_n(symbol, SIGNAL_LOOKBACK_BARS)
+            state = IndicatorState.from_columns(symbol, history['price'], history['volume'])
+            self.stream_states[symbol] = state
         
-        # Get current price
-        current_price = prices[-1]
+        state.append(price, volume, timestamp.isoformat())
+        self.price_store.append(symbol, int(timestamp.timestamp()), price, volume)
+        self.volatility.update(symbol, price, int(timestamp.timestamp()))
         
-        signal_data = {
-            "symbol": symbol,
-            "current_price": current_price,
-            "rsi": round(rsi, 2),
-            "macd": round(macd, 4),
-            "ma20": round(ma20, 2),
-            "ma50": round(ma50, 2),
-            "volume": current_volume,
-            "volume_7d_avg": round(avg_volume_7d),
-            "volume_ratio": round(current_volume / avg_volume_7d, 2),
-            "timestamp": datetime.now().isoformat()
-        }
+        # Drop the cached entry so the next read reflects the new bar
+        self.signal_cache.invalidate(symbol)
         
-        # Cache the signal data for the 5-minute window
-        self.price_cache[cache_key] = signal_data
+        if self.on_bar_appended is not None:
+            try:
+                self.on_bar_appended(symbol)
+            except Exception as e:
+                logger.error(f"Bar-appended hook failed for {symbol}: {e}")
         
-        # Clean up old cache entries (keep only current and previous window)
-        current_window = int(time.time() // 300)
-        keys_to_remove = [key for key in self.price_cache.keys() 
-                         if int(key.split('_')[-1]) < current_window - 1]
-        for key in keys_to_remove:
-            del self.price_cache[key]
+        return state.signal_data()
+    
+    def _track_volatility(self, symbol: str) -> bool:
+        if symbol in self.volatility:
+            return True
+        if not self.ensure_symbol(symbol):
+            return False
+        self.volatility.add_symbol(symbol, self.price_store.last_n(symbol)["price"])
+        return True
+    
+    def get_volatility(self, symbol: str) -> Dict:
+        """Realized and EWMA volatility for a symbol (annualized %)"""
+        if not self._track_volatility(symbol):
+            raise ValueError(f"Symbol {symbol} not supported")
+        return self.volatility.symbol_volatility(symbol)
+    
+    def get_portfolio_volatility(self, weights: Dict[str, float]) -> Dict:
+        """Volatility of a weighted portfolio; symbols without history are reported as uncovered"""
+        for symbol in weights:
+            self._track_volatility(symbol)
+        return self.volatility.portfolio_volatility(weights)
+    
+    def ingest_tick(self, symbol: str, timestamp: int, price: float, size: float = 0.0) -> None:
+        """Feed a trade tick into the 1m -> 5m -> 1h -> 1d bar cascade"""
+        if not self.ensure_symbol(symbol):
+            raise ValueError(f"Symbol {symbol} not supported")
+        self.bar_aggregator.ingest(symbol, timestamp, price, size)
+    
+    def _on_bar_close(self, symbol: str, timeframe: str, bar: Bar) -> None:
+        """Append completed daily bars to the stored history"""
+        if timeframe == "1d":
+            self.append_bar(symbol, bar.close, bar.volume, datetime.fromtimestamp(bar.start))
+    
+    def get_timeframe_signal_data(self, symbol: str, timeframe: str = "1d") -> Dict:
+        """
+        Get indicators for any supported timeframe without a separate history load
         
-        return signal_data
+        Daily data comes from the price store; intraday timeframes come from
+        bars aggregated out of the tick stream.
+        """
+        if timeframe == "1d":
+            return self.get_signal_data(symbol)
+        if symbol not in self.bar_aggregator:
+            raise ValueError(f"No {timeframe} bars for {symbol}")
+        return self.bar_aggregator.get(symbol).signal_data(timeframe)
+    
+    def snapshot_stream_states(self) -> Dict[str, Dict]:
+        """Serialize all streaming indicator state (JSON-safe)"""
+        return {symbol: state.to_dict() for symbol, state in self.stream_states.items()}
+    
+    def restore_stream_states(self, snapshot: Dict[str, Dict]) -> None:
+        """Restore streaming indicator state from snapshot_stream_states() output"""
+        for symbol, data in snapshot.items():
+            self.stream_states[symbol] = IndicatorState.from_dict(data)
+    
+    def _build_signal_data(self, symbol: str, indicators: Dict, row: int, timestamp: str) -> Dict:
+        """Convert one row of kernel output into the signal data payload"""
+        return {
+            "symbol": symbol,
+            "current_price": float(indicators["current_price"][row]),
+            "rsi": round(float(indicators["rsi"][row]), 2),
+            "macd": round(float(indicators["macd"][row]), 4),
+            "ma20": round(float(indicators["ma20"][row]), 2),
+            "ma50": round(float(indicators["ma50"][row]), 2),
+            "volume": int(indicators["volume"][row]),
+            "volume_7d_avg": round(float(indicators["volume_7d_avg"][row])),
+            "volume_ratio": round(float(indicators["volume_ratio"][row]), 2),
+            "timestamp": timestamp
+        }
     
     def _calculate_rsi(self, prices: List[float], period: int = 14) -> float:
         """Calculate Relative Strength Index"""
@@ -200,16 +357,60 @@ class SignalEngine:
         
         return sum(prices[-period:]) / period
     
-    def check_strategy_signals(self, symbol: str) -> Dict:
+    def check_strategy_signals(self, symbol: str, db=None) -> Dict:
         """
         Check if current signals meet strategy trigger conditions
         
         Returns:
             Dictionary with strategy trigger status
         """
-        signals = self.get_signal_data(symbol)
+        return self.check_strategy_signals_batch([symbol], db)[symbol]
+    
+    def check_strategy_signals_batch(self, symbols: Optional[List[str]] = None, db=None) -> Dict[str, Dict]:
+        """
+        Check strategy trigger conditions for many symbols at once
+        
+        Each result lists the triggers that flipped since the last check
+        under "changed". With a db session, rising edges are stored as
+        TradingSignal rows and committed before the trigger state advances,
+        so a failed insert is retried on the next check; without one the
+        state is left untouched.
         
-        triggers = {
+        Returns:
+            Dictionary of symbol -> strategy trigger status
+        """
+        signal_data = self.get_signal_data_batch(symbols)
+        timestamp = datetime.now().isoformat()
+        
+        results = {
+            symbol: {
+                "symbol": symbol,
+                "signals": signals,
+                "triggers": self._evaluate_triggers(symbol, signals),
+                "timestamp": timestamp
+            }
+            for symbol, signals in signal_data.items()
+        }
+        
+        changes, masks = self.signal_state.diff(results)
+        for result in results.values():
+            result["changed"] = []
+        for change in changes:
+            results[change["symbol"]]["changed"].append(change["trigger"])
+        
+        if db is not None:
+            try:
+                persist_signal_edges(db, changes)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            self.signal_state.commit(masks)
+        return results
+    
+    def _evaluate_triggers(self, symbol: str, signals: Dict) -> Dict:
+        """Evaluate strategy trigger conditions against computed signals"""
+        return {
             "rsi_rebound": {
                 "triggered": signals["rsi"] < 30,
                 "condition": "RSI < 30",
@@ -235,41 +436,63 @@ class SignalEngine:
                 "target_asset": "BTC" if symbol == "BTC" else None
             }
         }
-        
-        return {
-            "symbol": symbol,
-            "signals": signals,
-            "triggers": triggers,
-            "timestamp": datetime.now().isoformat()
-        }
     
-    def get_strategy_recommendation(self, strategy_name: str, account_holdings: Dict = None) -> Dict:
+    def get_strategy_recommendation(self, strategy_name: str, account_holdings: Dict = None, params: Dict = None) -> Dict:
         """
         Get specific strategy recommendation based on current signals
         
         Args:
             strategy_name: Name of the strategy
             account_holdings: Current holdings in the account
+            params: Overrides (e.g. from a parameter sweep), see STRATEGY_DEFAULTS;
+                parameters the live signals cannot honor are rejected
             
         Returns:
             Strategy recommendation with trade details
         """
+        if strategy_name not in STRATEGY_DEFAULTS:
+            return {"error": f"Unknown strategy: {strategy_name}"}
+        try:
+            p = self._recommendation_params(strategy_name, params)
+        except ValueError as e:
+            return {"error": str(e)}
+        
         if strategy_name == "RSI Rebound":
-            return self._check_rsi_rebound()
+            return self._check_rsi_rebound(p)
         elif strategy_name == "Momentum Buy":
-            return self._check_momentum_buy()
+            return self._check_momentum_buy(p)
         elif strategy_name == "Trend Exit":
-            return self._check_trend_exit(account_holdings or {})
-        elif strategy_name == "DCA Weekly":
-            return self._check_dca_weekly()
+            return self._check_trend_exit(account_holdings or {}, p)
         else:
-            return {"error": f"Unknown strategy: {strategy_name}"}
+            return self._check_dca_weekly(p)
+    
+    def _recommendation_params(self, strategy_name: str, params: Optional[Dict]) -> Dict:
+        """Defaults merged with overrides, raising ValueError for overrides that would be ignored"""
+        defaults = STRATEGY_DEFAULTS[strategy_name]
+        params = params or {}
+        unknown = set(params) - set(defaults)
+        if unknown:
+            raise ValueError(f"Unknown parameters for {strategy_name}: {', '.join(sorted(unknown))}")
+        fixed = sorted(
+            key for key, value in params.items()
+            if key not in RECOMMENDATION_PARAMS[strategy_name] and value != defaults[key]
+        )
+        if fixed:
+            raise ValueError(
+                f"Live {strategy_name} recommendations use the default "
+                + ", ".join(f"{key}={defaults[key]}" for key in fixed)
+            )
+        p = {**defaults, **params}
+        if "ma_period" in p and int(p["ma_period"]) not in SIGNAL_MA_PERIODS:
+            raise ValueError(f"ma_period must be one of {', '.join(map(str, SIGNAL_MA_PERIODS))} for live recommendations")
+        return p
     
-    def _check_rsi_rebound(self) -> Dict:
+    def _check_rsi_rebound(self, params: Dict) -> Dict:
         """Check RSI Rebound strategy for ETH"""
         signals = self.get_signal_data("ETH")
+        rsi_entry = params["rsi_entry"]
         
-        if signals["rsi"] < 30:
+        if signals["rsi"] < rsi_entry:
             return {
                 "strategy": "RSI Rebound",
                 "symbol": "ETH",
@@ -289,44 +512,54 @@ class SignalEngine:
             "signals": signals
         }
     
-    def _check_momentum_buy(self) -> Dict:
+    def _check_momentum_buy(self, params: Dict) -> Dict:
         """Check Momentum Buy strategy for SOL"""
         signals = self.get_signal_data("SOL")
+        min_volume_ratio = params["min_volume_ratio"]
+        ma_period = int(params["ma_period"])
+        ma = signals[f"ma{ma_period}"]
         
-        if signals["current_price"] > signals["ma50"]:
+        if signals["current_price"] > ma and signals["volume_ratio"] >= min_volume_ratio:
             return {
                 "strategy": "Momentum Buy",
                 "symbol": "SOL",
                 "action": "buy",
                 "amount": 75.0,
-                "reason": f"Price ${signals['current_price']} above MA50 ${signals['ma50']}",
+                "reason": f"Price ${signals['current_price']} above MA{ma_period} ${ma}",
                 "triggered": True,
                 "signals": signals
             }
         
+        if signals["current_price"] > ma:
+            reason = f"Volume ratio {signals['volume_ratio']}x below {min_volume_ratio}x"
+        else:
+            reason = f"Price ${signals['current_price']} below MA{ma_period} ${ma}"
+        
         return {
             "strategy": "Momentum Buy",
             "symbol": "SOL",
             "action": None,
-            "reason": f"Price ${signals['current_price']} below MA50 ${signals['ma50']}",
+            "reason": reason,
             "triggered": False,
             "signals": signals
         }
     
-    def _check_trend_exit(self, holdings: Dict) -> Dict:
+    def _check_trend_exit(self, holdings: Dict, params: Dict) -> Dict:
         """Check Trend Exit strategy for any holdings"""
+        ma_period = int(params["ma_period"])
         for symbol, quantity in holdings.items():
             if quantity > 0:
                 signals = self.get_signal_data(symbol)
+                ma = signals[f"ma{ma_period}"]
                 
-                if signals["current_price"] < signals["ma20"]:
+                if signals["current_price"] < ma:
                     sell_quantity = quantity * 0.25  # Sell 25%
                     return {
                         "strategy": "Trend Exit",
                         "symbol": symbol,
                         "action": "sell",
                         "quantity": sell_quantity,
-                        "reason": f"Price ${signals['current_price']} below MA20 ${signals['ma20']}",
+                        "reason": f"Price ${signals['current_price']} below MA{ma_period} ${ma}",
                         "triggered": True,
                         "signals": signals
                     }
@@ -334,11 +567,11 @@ class SignalEngine:
         return {
             "strategy": "Trend Exit",
             "action": None,
-            "reason": "No holdings below MA20 threshold",
+            "reason": f"No holdings below MA{ma_period} threshold",
             "triggered": False
         }
     
-    def _check_dca_weekly(self) -> Dict:
+    def _check_dca_weekly(self, params: Dict) -> Dict:
         """Check DCA Weekly strategy for BTC"""
         signals = self.get_signal_data("BTC")
         
@@ -346,12 +579,36 @@ class SignalEngine:
             "strategy": "DCA Weekly",
             "symbol": "BTC",
             "action": "buy",
-            "amount": 100.0,
+            "amount": float(params["amount"]),
             "reason": "Regular DCA purchase",
             "triggered": True,  # DCA always triggers if time conditions are met
             "signals": signals
         }
 
 
-# Global signal engine instance
-signal_engine = SignalEngine() 
\ No newline at end of file
+_engine_lock = threading.Lock()
+_engine: Optional[SignalEngine] = None
+
+
+def get_signal_engine() -> SignalEngine:
+    """Process-wide SignalEngine, constructed on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from server.services.strategy_overlay_store import bump_symbol_holders_with_session
+                _engine = SignalEngine(on_bar_appended=bump_symbol_holders_with_session)
+    return _engine
+
+
+async def prewarm_signal_engine(symbols: Optional[List[str]] = None) -> int:
+    """Prewarm the shared engine off the event loop (for startup background tasks)"""
+    import asyncio
+    return await asyncio.to_thread(get_signal_engine().prewarm, symbols)
+
+
+def __getattr__(name: str):
+    # Keep `from server.logic.signal_engine import signal_engine` working lazily
+    if name == "signal_engine":
+        return get_signal_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
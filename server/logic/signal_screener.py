@@ -0,0 +1,173 @@
+"""
+Signal Screener: universe-wide indicator columns with sorted indices
+Each indexed column keeps an argsort so a range predicate becomes a binary
+search plus a slice; compound AND predicates intersect the matching row sets.
+"""
+import re
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+INDEXED_COLUMNS = ("rsi", "price_ma50_ratio", "price_ma20_ratio", "volume_ratio", "macd")
+
+# Price-vs-average comparisons are rewritten onto the ratio columns
+_RATIO_ALIASES = {
+    ("price", "ma50"): "price_ma50_ratio",
+    ("price", "ma20"): "price_ma20_ratio",
+}
+
+_CLAUSE_PATTERN = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*(<=|>=|<|>)\s*([A-Za-z_][A-Za-z0-9_]*|-?\d+(?:\.\d+)?)\s*$")
+
+Predicate = Tuple[str, str, float]
+
+
+class ScreenerQueryError(ValueError):
+    """Malformed screener query"""
+    pass
+
+
+def parse_query(query: str) -> List[Predicate]:
+    """
+    Parse "rsi < 30 AND price > ma50" into (column, op, value) predicates
+
+    Supported forms: <column> <op> <number> and price <op> ma20|ma50.
+    """
+    predicates = []
+    for clause in re.split(r"\s+AND\s+", query.strip(), flags=re.IGNORECASE):
+        match = _CLAUSE_PATTERN.match(clause)
+        if not match:
+            raise ScreenerQueryError(f"Cannot parse clause: {clause!r}")
+        left, op, right = match.group(1).lower(), match.group(2), match.group(3).lower()
+
+        if (left, right) in _RATIO_ALIASES:
+            predicates.append((_RATIO_ALIASES[(left, right)], op, 1.0))
+            continue
+        if left not in INDEXED_COLUMNS:
+            raise ScreenerQueryError(f"Unknown column: {left}")
+        try:
+            predicates.append((left, op, float(right)))
+        except ValueError:
+            raise ScreenerQueryError(f"Expected a number in clause: {clause!r}")
+    return predicates
+
+
+def _json_value(value: float) -> Optional[float]:
+    """Rounded float, or None for NaN/inf (e.g. a ratio against a zero MA), which JSON cannot carry"""
+    value = float(value)
+    return round(value, 4) if math.isfinite(value) else None
+
+
+class SignalScreener:
+    """
+    Column store of the latest indicators for every tracked symbol
+
+    load() replaces the universe in one go and rebuilds the sorted indices
+    (O(n log n) per column); screen() then answers each predicate in
+    O(log n + matches).
+    """
+
+    def __init__(self):
+        self.symbols: np.ndarray = np.array([], dtype=object)
+        self.columns: Dict[str, np.ndarray] = {}
+        self.sorted_index: Dict[str, np.ndarray] = {}
+        self.sorted_values: Dict[str, np.ndarray] = {}
+        self.refreshed_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def load(self, signal_data: Dict[str, Dict]) -> None:
+        """Rebuild columns and indices from symbol -> signal data payloads"""
+        symbols = list(signal_data.keys())
+        rows = [signal_data[s] for s in symbols]
+
+        price = np.array([r["current_price"] for r in rows], dtype=np.float64)
+        ma20 = np.array([r["ma20"] for r in rows], dtype=np.float64)
+        ma50 = np.array([r["ma50"] for r in rows], dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            columns = {
+                "rsi": np.array([r["rsi"] for r in rows], dtype=np.float64),
+                "macd": np.array([r["macd"] for r in rows], dtype=np.float64),
+                "volume_ratio": np.array([r["volume_ratio"] for r in rows], dtype=np.float64),
+                "price_ma50_ratio": np.where(ma50 > 0, price / ma50, np.nan),
+                "price_ma20_ratio": np.where(ma20 > 0, price / ma20, np.nan),
+            }
+        columns["price"] = price
+
+        sorted_index = {}
+        sorted_values = {}
+        for name in INDEXED_COLUMNS:
+            order = np.argsort(columns[name], kind="stable")
+            sorted_index[name] = order
+            sorted_values[name] = columns[name][order]
+
+        # Publish the new universe only after every index is built
+        self.symbols, self.columns = np.array(symbols, dtype=object), columns
+        self.sorted_index, self.sorted_values = sorted_index, sorted_values
+        self.refreshed_at = time.time()
+
+    def refresh(self, engine, symbols: Optional[List[str]] = None) -> None:
+        """Reload the universe from a SignalEngine (batched, cache-aware)"""
+        self.load(engine.get_signal_data_batch(symbols))
+
+    def refresh_if_stale(self, engine, max_age_seconds: float) -> bool:
+        """Reload from the engine when the universe is older than max_age_seconds"""
+        if len(self.symbols) and time.time() - self.refreshed_at < max_age_seconds:
+            return False
+        self.refresh(engine)
+        return True
+
+    def _match_rows(self, column: str, op: str, value: float) -> np.ndarray:
+        values = self.sorted_values[column]
+        order = self.sorted_index[column]
+        # NaNs sort last; exclude them from every range
+        valid = len(values) - int(np.isnan(values).sum())
+        if op == "<":
+            return order[:np.searchsorted(values[:valid], value, side="left")]
+        if op == "<=":
+            return order[:np.searchsorted(values[:valid], value, side="right")]
+        if op == ">":
+            return order[np.searchsorted(values[:valid], value, side="right"):valid]
+        return order[np.searchsorted(values[:valid], value, side="left"):valid]
+
+    def screen(self, query: str, sort_by: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+        """
+        Resolve a compound predicate by sorted-index lookup and intersection
+
+        Returns:
+            Matching rows as dicts, optionally sorted by an indexed column
+        """
+        predicates = parse_query(query)
+        if not len(self.symbols):
+            return []
+
+        # Start from the most selective predicate to keep intersections small
+        row_sets = sorted((self._match_rows(*p) for p in predicates), key=len)
+        rows = row_sets[0]
+        for other in row_sets[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+
+        if sort_by:
+            if sort_by not in INDEXED_COLUMNS:
+                raise ScreenerQueryError(f"Unknown sort column: {sort_by}")
+            rows = rows[np.argsort(self.columns[sort_by][rows], kind="stable")]
+        else:
+            rows = np.sort(rows)
+        if limit is not None:
+            rows = rows[:limit]
+
+        return [
+            {
+                "symbol": self.symbols[i],
+                **{name: _json_value(column[i]) for name, column in self.columns.items()},
+            }
+            for i in rows
+        ]
+
+
+# Global screener instance
+signal_screener = SignalScreener()
@@ -0,0 +1,170 @@
+"""
+Signal State Tracker: edge-triggered strategy signals
+Keeps the last trigger state per (symbol, strategy) as one bitmask per symbol
+and reports only the triggers that flipped since the previous evaluation.
+Rising edges are stored as TradingSignal rows, one per active strategy the
+trigger belongs to, in a single bulk insert; the bitmap only advances (via
+diff() then commit()) once that insert has been committed.
+"""
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+from server.db.bulk import copy_rows
+from server.db.qmark import qmark
+
+logger = logging.getLogger(__name__)
+
+# Bit position of each trigger in a symbol's bitmask
+TRIGGERS = ("rsi_rebound", "momentum_buy", "trend_exit", "volume_spike")
+
+# Strategy each trigger signals for; triggers without one are never stored
+TRIGGER_STRATEGIES = {
+    "rsi_rebound": ("RSI Rebound", "BUY"),
+    "momentum_buy": ("Momentum Buy", "BUY"),
+    "trend_exit": ("Trend Exit", "SELL"),
+}
+
+SIGNAL_COLUMNS = ("strategyId", "userId", "symbol", "action", "technicalIndicators", "status", "generatedAt")
+
+
+class SignalStateTracker:
+    """
+    Bitmap of the last seen trigger state for every tracked symbol
+
+    Symbols map to rows of a uint8 array (one bit per trigger), so a whole
+    universe of results is diffed with a single XOR.
+    """
+
+    def __init__(self):
+        self.rows: Dict[str, int] = {}
+        self.bitmap = np.zeros(0, dtype=np.uint8)
+
+    def _row_indices(self, symbols: List[str]) -> np.ndarray:
+        for symbol in symbols:
+            if symbol not in self.rows:
+                self.rows[symbol] = len(self.rows)
+        if len(self.rows) > len(self.bitmap):
+            grown = np.zeros(max(len(self.rows), 2 * len(self.bitmap)), dtype=np.uint8)
+            grown[:len(self.bitmap)] = self.bitmap
+            self.bitmap = grown
+        return np.fromiter((self.rows[s] for s in symbols), dtype=np.int64, count=len(symbols))
+
+    def state(self, symbol: str) -> Dict[str, bool]:
+        """Last known trigger state for a symbol"""
+        mask = int(self.bitmap[self.rows[symbol]]) if symbol in self.rows else 0
+        return {name: bool(mask >> bit & 1) for bit, name in enumerate(TRIGGERS)}
+
+    def diff(self, results: Dict[str, Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """
+        Compare check_strategy_signals results with the bitmap without changing it
+
+        Args:
+            results: symbol -> check_strategy_signals payload
+
+        Returns:
+            (change dicts with symbol, trigger, triggered, signals;
+             new bitmask per symbol to pass to commit())
+        """
+        symbols = list(results.keys())
+        if not symbols:
+            return [], {}
+
+        new_masks = np.zeros(len(symbols), dtype=np.uint8)
+        for i, symbol in enumerate(symbols):
+            triggers = results[symbol]["triggers"]
+            mask = 0
+            for bit, name in enumerate(TRIGGERS):
+                if triggers.get(name, {}).get("triggered"):
+                    mask |= 1 << bit
+            new_masks[i] = mask
+
+        old_masks = np.fromiter(
+            (self.bitmap[self.rows[s]] if s in self.rows else 0 for s in symbols), dtype=np.uint8, count=len(symbols)
+        )
+        flipped = old_masks ^ new_masks
+
+        changes = []
+        for i in np.flatnonzero(flipped):
+            symbol = symbols[i]
+            for bit, name in enumerate(TRIGGERS):
+                if flipped[i] >> bit & 1:
+                    changes.append({
+                        "symbol": symbol,
+                        "trigger": name,
+                        "triggered": bool(new_masks[i] >> bit & 1),
+                        "signals": results[symbol].get("signals", {}),
+                    })
+        return changes, dict(zip(symbols, new_masks.tolist()))
+
+    def commit(self, masks: Dict[str, int]) -> None:
+        """Advance the bitmap to masks returned by diff()"""
+        if not masks:
+            return
+        rows = self._row_indices(list(masks.keys()))
+        self.bitmap[rows] = np.fromiter(masks.values(), dtype=np.uint8, count=len(masks))
+
+    def update(self, results: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Fold in check_strategy_signals results and return only the flips
+
+        Args:
+            results: symbol -> check_strategy_signals payload
+
+        Returns:
+            List of change dicts (symbol, trigger, triggered, signals)
+        """
+        changes, masks = self.diff(results)
+        self.commit(masks)
+        return changes
+
+    def snapshot(self) -> Dict[str, int]:
+        """Bitmask per symbol, for persisting across restarts"""
+        return {symbol: int(self.bitmap[row]) for symbol, row in self.rows.items()}
+
+    def restore(self, snapshot: Dict[str, int]) -> None:
+        """Restore bitmasks from snapshot() output"""
+        self.commit(snapshot)
+
+
+def persist_signal_edges(db, changes: List[Dict[str, Any]]) -> int:
+    """
+    Store rising edges as pending TradingSignal rows in one bulk insert
+
+    Each edge is attached to every active strategy with the trigger's name
+    and symbol; edges with no such strategy are skipped. Does not commit.
+
+    Returns:
+        Number of rows written
+    """
+    rising = [c for c in changes if c["triggered"] and c["trigger"] in TRIGGER_STRATEGIES]
+    if not rising:
+        return 0
+
+    names = sorted({TRIGGER_STRATEGIES[c["trigger"]][0] for c in rising})
+    symbols = sorted({c["symbol"] for c in rising})
+    stmt, params = qmark(f"""
+        SELECT id, userId, name, symbol FROM strategies
+        WHERE status = 'active'
+          AND name IN ({", ".join("?" for _ in names)})
+          AND symbol IN ({", ".join("?" for _ in symbols)})
+    """, (*names, *symbols))
+    strategies: Dict[Tuple[str, str], List[Tuple[int, int]]] = {}
+    for strategy_id, user_id, name, symbol in db.execute(stmt, params).all():
+        strategies.setdefault((name, symbol), []).append((int(strategy_id), int(user_id)))
+
+    now = datetime.utcnow()
+    rows = []
+    for change in rising:
+        name, action = TRIGGER_STRATEGIES[change["trigger"]]
+        indicators = json.dumps(change["signals"], default=str)
+        for strategy_id, user_id in strategies.get((name, change["symbol"]), []):
+            rows.append((strategy_id, user_id, change["symbol"], action, indicators, "pending", now))
+    if not rows:
+        return 0
+    written = copy_rows(db, "trading_signals", SIGNAL_COLUMNS, rows)
+    logger.info(f"Stored {written} trading signals from {len(rising)} trigger edges")
+    return written
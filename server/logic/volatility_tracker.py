@@ -0,0 +1,277 @@
+"""
+Volatility Tracker: online realized volatility per symbol and per portfolio
+Each symbol keeps Welford running moments and an EWMA variance of its bar
+returns, both updated in O(1) per bar. Cross-symbol EWMA covariances are
+folded once per day from that day's returns, so any portfolio's volatility
+is answered from the tracked state without rescanning price history.
+"""
+import os
+from collections import deque
+from typing import Deque, Dict, Any, List, Optional
+
+import numpy as np
+
+VOL_EWMA_LAMBDA = float(os.getenv("VOL_EWMA_LAMBDA", "0.94"))
+VOL_SEED_BARS = int(os.getenv("VOL_SEED_BARS", "250"))
+
+TRADING_DAYS = 252
+SECONDS_PER_DAY = 86400
+
+# Annualized volatility (%) thresholds, highest first
+VOLATILITY_CLASSES = ((60.0, "high"), (30.0, "medium"))
+
+
+def volatility_class(annualized_pct: Optional[float]) -> str:
+    if annualized_pct is None:
+        return "unknown"
+    for threshold, name in VOLATILITY_CLASSES:
+        if annualized_pct > threshold:
+            return name
+    return "low"
+
+
+def _annualized_pct(daily_variance: Optional[float]) -> Optional[float]:
+    if daily_variance is None:
+        return None
+    return float(np.sqrt(max(daily_variance, 0.0) * TRADING_DAYS) * 100)
+
+
+def _ewma_weights(n: int, lam: float) -> np.ndarray:
+    """Normalized EWMA weights for n observations, oldest first"""
+    weights = (1 - lam) * lam ** np.arange(n - 1, -1, -1, dtype=np.float64)
+    return weights / weights.sum()
+
+
+class RunningMoments:
+    """Welford's online mean and variance"""
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def update(self, value: float) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other: "RunningMoments") -> None:
+        """Combine with moments of another sample (Chan et al. parallel update)"""
+        if other.count == 0:
+            return
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+
+    @classmethod
+    def from_values(cls, values: np.ndarray) -> "RunningMoments":
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return cls()
+        mean = float(values.mean())
+        return cls(len(values), mean, float(np.sum((values - mean) ** 2)))
+
+    def variance(self) -> Optional[float]:
+        """Sample variance, or None with fewer than two observations"""
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+
+class SymbolVolatility:
+    """Return moments and EWMA variance for one symbol's bars"""
+
+    def __init__(self, lam: float = VOL_EWMA_LAMBDA):
+        self.lam = lam
+        self.last_price: Optional[float] = None
+        self.moments = RunningMoments()
+        self.ewma_variance: Optional[float] = None
+
+    def seed(self, prices: np.ndarray) -> np.ndarray:
+        """Initialize from a price history in one vectorized pass; returns its returns"""
+        prices = np.asarray(prices, dtype=np.float64)
+        if not len(prices):
+            return np.zeros(0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = prices[1:] / prices[:-1] - 1.0
+        returns = returns[np.isfinite(returns)]
+        self.last_price = float(prices[-1])
+        self.moments = RunningMoments.from_values(returns)
+        if len(returns):
+            self.ewma_variance = float(_ewma_weights(len(returns), self.lam) @ returns ** 2)
+        return returns
+
+    def update(self, price: float) -> Optional[float]:
+        """Fold in a new bar's close; returns the bar return"""
+        price = float(price)
+        previous, self.last_price = self.last_price, price
+        if previous is None or previous <= 0:
+            return None
+        ret = price / previous - 1.0
+        self.moments.update(ret)
+        if self.ewma_variance is None:
+            self.ewma_variance = ret * ret
+        else:
+            self.ewma_variance = self.lam * self.ewma_variance + (1 - self.lam) * ret * ret
+        return ret
+
+
+class VolatilityTracker:
+    """
+    Realized volatility for a universe of symbols
+
+    Per-symbol updates are O(1). Same-day returns are compounded and folded
+    into the EWMA covariance matrix when the next day starts (O(k^2) for the
+    k symbols that traded). Portfolio queries combine Welford/EWMA standard
+    deviations with EWMA correlations in O(holdings^2).
+    """
+
+    def __init__(self, lam: float = VOL_EWMA_LAMBDA, seed_bars: int = VOL_SEED_BARS, capacity: int = 32):
+        self.lam = lam
+        self.seed_bars = seed_bars
+        self.index: Dict[str, int] = {}
+        self.stats: List[SymbolVolatility] = []
+        self.recent: List[Deque[float]] = []
+        self.cov = np.zeros((capacity, capacity))
+        self.paired = np.zeros((capacity, capacity), dtype=bool)
+        self.day: Optional[int] = None
+        self.pending: Dict[int, float] = {}
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.index
+
+    def _grow(self) -> None:
+        size = len(self.cov)
+        if len(self.index) < size:
+            return
+        cov = np.zeros((2 * size, 2 * size))
+        cov[:size, :size] = self.cov
+        paired = np.zeros((2 * size, 2 * size), dtype=bool)
+        paired[:size, :size] = self.paired
+        self.cov, self.paired = cov, paired
+
+    def add_symbol(self, symbol: str, prices) -> None:
+        """
+        Start tracking a symbol from its price history
+
+        Covariances with already-tracked symbols are seeded from the trailing
+        seed_bars returns, aligned on the most recent bar.
+        """
+        self._grow()
+        i = self.index.setdefault(symbol, len(self.index))
+        stats = SymbolVolatility(self.lam)
+        returns = stats.seed(prices)[-self.seed_bars:]
+        if i == len(self.stats):
+            self.stats.append(stats)
+            self.recent.append(deque(maxlen=self.seed_bars))
+        else:
+            self.stats[i] = stats
+            self.recent[i].clear()
+        self.recent[i].extend(returns.tolist())
+
+        n = len(self.index)
+        if not len(returns):
+            return
+        # Trailing-aligned peer returns, NaN-padded where a peer has fewer bars
+        peers = np.full((n, len(returns)), np.nan)
+        for j, window in enumerate(self.recent):
+            k = min(len(window), len(returns))
+            if k:
+                peers[j, -k:] = list(window)[-k:]
+        valid = ~np.isnan(peers)
+        weights = np.where(valid, _ewma_weights(len(returns), self.lam), 0.0)
+        norm = weights.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            row = np.where(norm > 0, np.nansum(weights * peers * returns, axis=1) / norm, 0.0)
+        self.cov[i, :n] = row
+        self.cov[:n, i] = row
+        self.paired[i, :n] = norm > 0
+        self.paired[:n, i] = norm > 0
+
+    def update(self, symbol: str, price: float, timestamp: Optional[int] = None) -> Optional[float]:
+        """
+        Fold one bar close into a tracked symbol in O(1)
+
+        Returns:
+            The bar return, or None for untracked symbols / the first bar
+        """
+        i = self.index.get(symbol)
+        if i is None:
+            return None
+        if timestamp is not None:
+            day = int(timestamp) // SECONDS_PER_DAY
+            if self.day is not None and day > self.day:
+                self.flush()
+            self.day = day if self.day is None else max(self.day, day)
+
+        ret = self.stats[i].update(price)
+        if ret is None:
+            return None
+        self.recent[i].append(ret)
+        self.pending[i] = (1 + self.pending.get(i, 0.0)) * (1 + ret) - 1
+        return ret
+
+    def flush(self) -> None:
+        """Fold the pending day's returns into the EWMA covariance matrix"""
+        if not self.pending:
+            return
+        idx = np.fromiter(self.pending.keys(), dtype=np.int64, count=len(self.pending))
+        returns = np.fromiter(self.pending.values(), dtype=np.float64, count=len(self.pending))
+        block = np.ix_(idx, idx)
+        fresh = np.outer(returns, returns)
+        self.cov[block] = np.where(
+            self.paired[block], self.lam * self.cov[block] + (1 - self.lam) * fresh, fresh
+        )
+        self.paired[block] = True
+        self.pending = {}
+
+    def symbol_volatility(self, symbol: str) -> Dict[str, Any]:
+        """Realized and EWMA volatility for a tracked symbol (annualized %)"""
+        stats = self.stats[self.index[symbol]]
+        realized = _annualized_pct(stats.moments.variance())
+        return {
+            "observations": stats.moments.count,
+            "realized_vol_pct": realized,
+            "ewma_vol_pct": _annualized_pct(stats.ewma_variance),
+            "class": volatility_class(realized),
+        }
+
+    def _correlation(self, idx: np.ndarray) -> np.ndarray:
+        cov = self.cov[np.ix_(idx, idx)]
+        diag = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.outer(diag, diag)
+        corr = np.where(self.paired[np.ix_(idx, idx)] & np.isfinite(corr), corr, 0.0)
+        np.fill_diagonal(corr, 1.0)
+        return np.clip(corr, -1.0, 1.0)
+
+    def portfolio_volatility(self, weights: Dict[str, float]) -> Dict[str, Any]:
+        """
+        Volatility of a weighted portfolio of tracked symbols
+
+        Weights are renormalized over symbols with at least two returns;
+        the rest are reported as uncovered.
+        """
+        covered = [
+            s for s, w in weights.items()
+            if w > 0 and s in self.index and self.stats[self.index[s]].moments.count > 1
+        ]
+        uncovered = [s for s in weights if s not in covered]
+        if not covered:
+            return {"realized_vol_pct": None, "ewma_vol_pct": None, "class": "unknown", "uncovered": uncovered}
+
+        idx = np.array([self.index[s] for s in covered], dtype=np.int64)
+        w = np.array([weights[s] for s in covered], dtype=np.float64)
+        w /= w.sum()
+        corr = self._correlation(idx)
+        realized_sd = np.sqrt([self.stats[i].moments.variance() for i in idx])
+        ewma_sd = np.sqrt([self.stats[i].ewma_variance or 0.0 for i in idx])
+
+        realized = _annualized_pct(float((w * realized_sd) @ corr @ (w * realized_sd)))
+        return {
+            "realized_vol_pct": realized,
+            "ewma_vol_pct": _annualized_pct(float((w * ewma_sd) @ corr @ (w * ewma_sd))),
+            "class": volatility_class(realized),
+            "uncovered": uncovered,
+        }
@@ -7,6 +7,7 @@ from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 from fastapi.responses import JSONResponse
+import asyncio
 import logging
 import uvicorn
 from fastapi.security import OAuth2PasswordBearer
@@ -485,12 +486,32 @@ async def startup_event():
     """Initialize services on startup"""
     logger.info("StackMotive API starting...")
     await initialize_websocket_services()
+    if os.getenv("SIGNAL_PREWARM", "false").lower() == "true":
+        from server.logic.signal_engine import prewarm_signal_engine
+        # Warm price history in the background so startup is not blocked
+        app.state.signal_prewarm = asyncio.create_task(prewarm_signal_engine())
+    if os.getenv("OVERLAY_WORKER_ENABLED", "false").lower() == "true":
+        from server.services.strategy_overlay_store import run_overlay_worker
+        # Workers claim dirty users, so enabling this on several processes is safe
+        app.state.overlay_worker = asyncio.create_task(run_overlay_worker())
+    if os.getenv("SYNC_WORKER_ENABLED", "false").lower() == "true":
+        from server.services.scheduler import run_sync_worker
+        # Single in-process shard; larger fleets run `python -m server.services.scheduler`
+        app.state.sync_worker = asyncio.create_task(run_sync_worker(0, 1))
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("StackMotive API shutting down...")
     await cleanup_websocket_services()
+    workers = [getattr(app.state, name, None) for name in ("signal_prewarm", "overlay_worker", "sync_worker")]
+    workers = [worker for worker in workers if worker is not None]
+    for worker in workers:
+        worker.cancel()
+    # Let cancelled workers unwind before their HTTP clients are closed
+    await asyncio.gather(*workers, return_exceptions=True)
+    from server.services.http_client import close_http_clients
+    await close_http_clients()
 
 @app.exception_handler(RateLimitExceeded)
 async def rate_limit_handler(request, exc):
@@ -48,6 +48,7 @@ ROUTE_TIER_REQUIREMENTS: Dict[str, str] = {
     "/api/ai/explain": "builder",
     "/api/ai-rebalance": "participant",
     "/api/signals": "participant",
+    "/api/signals/screen": "participant",
     "/api/kucoin/accounts": "premium",
     "/api/kucoin/fills": "premium",
     "/api/portfolio/loader/csv": "builder",
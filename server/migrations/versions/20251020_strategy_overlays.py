@@ -0,0 +1,82 @@
+"""add strategy_overlays read model
+
+Revision ID: 20251020_strategy_overlays
+Revises: 20251009_magic_links
+Create Date: 2025-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20251020_strategy_overlays'
+down_revision = '20251009_magic_links'
+branch_labels = None
+depends_on = None
+
+# Tables whose writes invalidate a user's overlays
+VERSIONED_TABLES = ('portfolio_positions', 'trades')
+
+# (event, transition table) pairs; transition tables need one trigger per event
+TRIGGER_EVENTS = (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD'))
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS strategy_overlays (
+            userId INTEGER PRIMARY KEY,
+            data_version BIGINT NOT NULL DEFAULT 0,
+            computed_version BIGINT NOT NULL DEFAULT 0,
+            overlays TEXT,
+            computed_at TIMESTAMP
+        )
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_strategy_overlays_dirty
+        ON strategy_overlays(computed_at)
+        WHERE data_version > computed_version
+    """)
+
+    # One version bump per user per statement, however many rows it touched
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_strategy_overlay_version() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO strategy_overlays (userId, data_version)
+            SELECT DISTINCT userId, 1 FROM changed_rows WHERE userId IS NOT NULL
+            ON CONFLICT (userId)
+            DO UPDATE SET data_version = strategy_overlays.data_version + 1;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    for table in VERSIONED_TABLES:
+        for event, transition in TRIGGER_EVENTS:
+            op.execute(f"""
+                DO $$
+                BEGIN
+                    IF to_regclass('{table}') IS NOT NULL THEN
+                        DROP TRIGGER IF EXISTS {table}_overlay_version_{event.lower()} ON {table};
+                        CREATE TRIGGER {table}_overlay_version_{event.lower()}
+                        AFTER {event} ON {table}
+                        REFERENCING {transition} TABLE AS changed_rows
+                        FOR EACH STATEMENT EXECUTE FUNCTION bump_strategy_overlay_version();
+                    END IF;
+                END
+                $$
+            """)
+
+
+def downgrade():
+    for table in VERSIONED_TABLES:
+        for event, _ in TRIGGER_EVENTS:
+            op.execute(f"""
+                DO $$
+                BEGIN
+                    IF to_regclass('{table}') IS NOT NULL THEN
+                        DROP TRIGGER IF EXISTS {table}_overlay_version_{event.lower()} ON {table};
+                    END IF;
+                END
+                $$
+            """)
+    op.execute("DROP FUNCTION IF EXISTS bump_strategy_overlay_version()")
+    op.execute("DROP TABLE IF EXISTS strategy_overlays")
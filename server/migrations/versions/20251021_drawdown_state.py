@@ -0,0 +1,116 @@
+"""add drawdown_state running totals
+
+Revision ID: 20251021_drawdown_state
+Revises: 20251020_strategy_overlays
+Create Date: 2025-10-21 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20251021_drawdown_state'
+down_revision = '20251020_strategy_overlays'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS drawdown_state (
+            userId INTEGER PRIMARY KEY,
+            equity NUMERIC NOT NULL DEFAULT 10000,
+            peak NUMERIC NOT NULL DEFAULT 10000,
+            max_drawdown NUMERIC NOT NULL DEFAULT 0,
+            trade_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # O(1) fold of each newly closed trade; mirrors DrawdownState.apply
+    op.execute("""
+        CREATE OR REPLACE FUNCTION apply_closed_trade_drawdown() RETURNS trigger AS $$
+        DECLARE
+            pnl NUMERIC := COALESCE(NEW.profit_loss, 0);
+        BEGIN
+            IF NEW.status IS DISTINCT FROM 'closed' OR NEW.exit_time IS NULL THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'UPDATE' AND OLD.status = 'closed' AND OLD.exit_time IS NOT NULL THEN
+                RETURN NULL;
+            END IF;
+
+            INSERT INTO drawdown_state AS s (userId, equity, peak, max_drawdown, trade_count, updated_at)
+            VALUES (
+                NEW.userId,
+                10000 + pnl,
+                GREATEST(10000, 10000 + pnl),
+                GREATEST(0, -pnl) / 10000,
+                1,
+                CURRENT_TIMESTAMP
+            )
+            ON CONFLICT (userId) DO UPDATE SET
+                equity = s.equity + pnl,
+                peak = GREATEST(s.peak, s.equity + pnl),
+                max_drawdown = GREATEST(
+                    s.max_drawdown,
+                    CASE WHEN GREATEST(s.peak, s.equity + pnl) > 0
+                         THEN (GREATEST(s.peak, s.equity + pnl) - (s.equity + pnl)) / GREATEST(s.peak, s.equity + pnl)
+                         ELSE 0 END
+                ),
+                trade_count = s.trade_count + 1,
+                updated_at = CURRENT_TIMESTAMP;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    # Backfill from full history, then keep it current with the trigger
+    op.execute("""
+        DO $$
+        BEGIN
+            IF to_regclass('trades') IS NOT NULL THEN
+                INSERT INTO drawdown_state (userId, equity, peak, max_drawdown, trade_count, updated_at)
+                SELECT userId,
+                       MAX(equity) FILTER (WHERE rn = cnt),
+                       MAX(peak),
+                       MAX(CASE WHEN peak > 0 THEN (peak - equity) / peak ELSE 0 END),
+                       MAX(cnt),
+                       CURRENT_TIMESTAMP
+                FROM (
+                    SELECT userId, equity, rn, cnt,
+                           GREATEST(10000, MAX(equity) OVER (PARTITION BY userId ORDER BY rn)) AS peak
+                    FROM (
+                        SELECT userId,
+                               10000 + SUM(COALESCE(profit_loss, 0)) OVER w AS equity,
+                               ROW_NUMBER() OVER w AS rn,
+                               COUNT(*) OVER (PARTITION BY userId) AS cnt
+                        FROM trades
+                        WHERE status = 'closed' AND exit_time IS NOT NULL
+                        WINDOW w AS (PARTITION BY userId ORDER BY exit_time ROWS UNBOUNDED PRECEDING)
+                    ) curve
+                ) peaks
+                GROUP BY userId
+                ON CONFLICT (userId) DO NOTHING;
+
+                DROP TRIGGER IF EXISTS trades_drawdown_state ON trades;
+                CREATE TRIGGER trades_drawdown_state
+                AFTER INSERT OR UPDATE OF status, exit_time ON trades
+                FOR EACH ROW EXECUTE FUNCTION apply_closed_trade_drawdown();
+            END IF;
+        END
+        $$
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DO $$
+        BEGIN
+            IF to_regclass('trades') IS NOT NULL THEN
+                DROP TRIGGER IF EXISTS trades_drawdown_state ON trades;
+            END IF;
+        END
+        $$
+    """)
+    op.execute("DROP FUNCTION IF EXISTS apply_closed_trade_drawdown()")
+    op.execute("DROP TABLE IF EXISTS drawdown_state")
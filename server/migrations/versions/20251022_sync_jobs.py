@@ -0,0 +1,38 @@
+"""add sync_jobs fleet scheduler queue
+
+Revision ID: 20251022_sync_jobs
+Revises: 20251021_drawdown_state
+Create Date: 2025-10-22 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20251022_sync_jobs'
+down_revision = '20251021_drawdown_state'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS sync_jobs (
+            id BIGSERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL UNIQUE,
+            status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running')),
+            next_run_at TIMESTAMP NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            locked_by TEXT,
+            locked_at TIMESTAMP,
+            last_finished_at TIMESTAMP,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # Claim scans walk due jobs in next_run_at order
+    op.execute("CREATE INDEX IF NOT EXISTS idx_sync_jobs_due ON sync_jobs(next_run_at, id)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_sync_jobs_due")
+    op.execute("DROP TABLE IF EXISTS sync_jobs")
@@ -0,0 +1,43 @@
+"""add per-source position snapshots for delta ingest
+
+Revision ID: 20251023_position_snapshots
+Revises: 20251022_sync_jobs
+Create Date: 2025-10-23 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20251023_position_snapshots'
+down_revision = '20251022_sync_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS source_position_snapshots (
+            source_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            account TEXT NOT NULL DEFAULT '',
+            symbol TEXT NOT NULL,
+            quantity NUMERIC NOT NULL,
+            avg_cost NUMERIC,
+            currency TEXT,
+            as_of TIMESTAMP,
+            fingerprint TEXT NOT NULL,
+            PRIMARY KEY (source_id, account, symbol)
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS idx_source_position_snapshots_user_symbol ON source_position_snapshots(user_id, symbol)")
+    op.execute("""
+        ALTER TABLE positions_staging
+        ADD COLUMN IF NOT EXISTS change_type TEXT NOT NULL DEFAULT 'upsert'
+        CHECK (change_type IN ('upsert', 'delete'))
+    """)
+
+
+def downgrade():
+    op.execute("ALTER TABLE positions_staging DROP COLUMN IF EXISTS change_type")
+    op.execute("DROP INDEX IF EXISTS idx_source_position_snapshots_user_symbol")
+    op.execute("DROP TABLE IF EXISTS source_position_snapshots")
@@ -0,0 +1,44 @@
+"""add trades_staging for Flex statement trades
+
+Revision ID: 20251024_trades_staging
+Revises: 20251023_position_snapshots
+Create Date: 2025-10-24 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20251024_trades_staging'
+down_revision = '20251023_position_snapshots'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS trades_staging (
+            id SERIAL PRIMARY KEY,
+            sync_run_id UUID NOT NULL,
+            user_id INTEGER NOT NULL,
+            source_id INTEGER NOT NULL,
+            account TEXT,
+            trade_id TEXT,
+            symbol TEXT,
+            asset_category TEXT,
+            currency TEXT,
+            trade_time TIMESTAMP,
+            quantity NUMERIC,
+            price NUMERIC,
+            proceeds NUMERIC,
+            commission NUMERIC,
+            buy_sell TEXT,
+            realized_pnl NUMERIC,
+            meta JSONB DEFAULT '{}'
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS idx_trades_staging_sync_run_id ON trades_staging(sync_run_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_trades_staging_user_id ON trades_staging(user_id)")
+
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS trades_staging")
@@ -0,0 +1,26 @@
+"""add trade/cash high-watermark to data_sources
+
+Revision ID: 20251025_source_watermarks
+Revises: 20251024_trades_staging
+Create Date: 2025-10-25 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20251025_source_watermarks'
+down_revision = '20251024_trades_staging'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE data_sources ADD COLUMN IF NOT EXISTS last_trade_id TEXT")
+    op.execute("ALTER TABLE data_sources ADD COLUMN IF NOT EXISTS last_trade_at TIMESTAMP")
+    op.execute("ALTER TABLE data_sources ADD COLUMN IF NOT EXISTS last_cash_at TIMESTAMP")
+
+
+def downgrade():
+    op.execute("ALTER TABLE data_sources DROP COLUMN IF EXISTS last_cash_at")
+    op.execute("ALTER TABLE data_sources DROP COLUMN IF EXISTS last_trade_at")
+    op.execute("ALTER TABLE data_sources DROP COLUMN IF EXISTS last_trade_id")
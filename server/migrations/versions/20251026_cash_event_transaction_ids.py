@@ -0,0 +1,30 @@
+"""add broker transaction IDs to cash events
+
+Revision ID: 20251026_cash_event_transaction_ids
+Revises: 20251025_source_watermarks
+Create Date: 2025-10-26 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20251026_cash_event_transaction_ids'
+down_revision = '20251025_source_watermarks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE cash_events_staging ADD COLUMN IF NOT EXISTS transaction_id TEXT")
+    op.execute("ALTER TABLE cash_events ADD COLUMN IF NOT EXISTS transactionId TEXT")
+    op.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_cash_events_transaction
+        ON cash_events(userId, source, accountId, transactionId)
+        WHERE transactionId IS NOT NULL
+    """)
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_cash_events_transaction")
+    op.execute("ALTER TABLE cash_events DROP COLUMN IF EXISTS transactionId")
+    op.execute("ALTER TABLE cash_events_staging DROP COLUMN IF EXISTS transaction_id")
@@ -0,0 +1,24 @@
+"""add worker claims to strategy_overlays
+
+Revision ID: 20251027_overlay_claims
+Revises: 20251026_cash_event_transaction_ids
+Create Date: 2025-10-27 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20251027_overlay_claims'
+down_revision = '20251026_cash_event_transaction_ids'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE strategy_overlays ADD COLUMN IF NOT EXISTS locked_by TEXT")
+    op.execute("ALTER TABLE strategy_overlays ADD COLUMN IF NOT EXISTS locked_at TIMESTAMP")
+
+
+def downgrade():
+    op.execute("ALTER TABLE strategy_overlays DROP COLUMN IF EXISTS locked_at")
+    op.execute("ALTER TABLE strategy_overlays DROP COLUMN IF EXISTS locked_by")
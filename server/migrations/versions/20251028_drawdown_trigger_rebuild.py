@@ -0,0 +1,196 @@
+"""rebuild drawdown_state on trade deletes, P&L edits and backdated exits
+
+Revision ID: 20251028_drawdown_trigger_rebuild
+Revises: 20251027_overlay_claims
+Create Date: 2025-10-28 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20251028_drawdown_trigger_rebuild'
+down_revision = '20251027_overlay_claims'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE drawdown_state ADD COLUMN IF NOT EXISTS last_exit_time TIMESTAMP")
+
+    # Full refold of one user's closed trades; mirrors rebuild_drawdown_state
+    op.execute("""
+        CREATE OR REPLACE FUNCTION rebuild_user_drawdown(uid INTEGER) RETURNS void AS $$
+        BEGIN
+            INSERT INTO drawdown_state AS s (userId, equity, peak, max_drawdown, trade_count, last_exit_time, updated_at)
+            SELECT uid,
+                   COALESCE(MAX(equity) FILTER (WHERE rn = cnt), 10000),
+                   COALESCE(MAX(peak), 10000),
+                   COALESCE(MAX(CASE WHEN peak > 0 THEN (peak - equity) / peak ELSE 0 END), 0),
+                   COALESCE(MAX(cnt), 0),
+                   MAX(exit_time),
+                   CURRENT_TIMESTAMP
+            FROM (
+                SELECT equity, rn, cnt, exit_time,
+                       GREATEST(10000, MAX(equity) OVER (ORDER BY rn)) AS peak
+                FROM (
+                    SELECT exit_time,
+                           10000 + SUM(COALESCE(profit_loss, 0)) OVER w AS equity,
+                           ROW_NUMBER() OVER w AS rn,
+                           COUNT(*) OVER () AS cnt
+                    FROM trades
+                    WHERE userId = uid AND status = 'closed' AND exit_time IS NOT NULL
+                    WINDOW w AS (ORDER BY exit_time ROWS UNBOUNDED PRECEDING)
+                ) curve
+            ) peaks
+            ON CONFLICT (userId) DO UPDATE SET
+                equity = EXCLUDED.equity,
+                peak = EXCLUDED.peak,
+                max_drawdown = EXCLUDED.max_drawdown,
+                trade_count = EXCLUDED.trade_count,
+                last_exit_time = EXCLUDED.last_exit_time,
+                updated_at = EXCLUDED.updated_at;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    # O(1) fold for trades closing in exit order; anything that changes or
+    # removes an already folded trade, or closes one before the last folded
+    # exit, refolds the user's history instead
+    op.execute("""
+        CREATE OR REPLACE FUNCTION apply_closed_trade_drawdown() RETURNS trigger AS $$
+        DECLARE
+            pnl NUMERIC;
+            old_counted BOOLEAN := FALSE;
+            new_counted BOOLEAN := FALSE;
+            last_exit TIMESTAMP;
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                old_counted := OLD.status = 'closed' AND OLD.exit_time IS NOT NULL;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                new_counted := NEW.status = 'closed' AND NEW.exit_time IS NOT NULL;
+            END IF;
+
+            IF old_counted THEN
+                IF TG_OP = 'UPDATE' AND new_counted
+                   AND NEW.userId IS NOT DISTINCT FROM OLD.userId
+                   AND NEW.exit_time IS NOT DISTINCT FROM OLD.exit_time
+                   AND NEW.profit_loss IS NOT DISTINCT FROM OLD.profit_loss THEN
+                    RETURN NULL;
+                END IF;
+                PERFORM rebuild_user_drawdown(OLD.userId);
+                IF new_counted AND NEW.userId IS DISTINCT FROM OLD.userId THEN
+                    PERFORM rebuild_user_drawdown(NEW.userId);
+                END IF;
+                RETURN NULL;
+            END IF;
+            IF NOT new_counted THEN
+                RETURN NULL;
+            END IF;
+
+            SELECT last_exit_time INTO last_exit FROM drawdown_state WHERE userId = NEW.userId;
+            IF last_exit IS NOT NULL AND NEW.exit_time < last_exit THEN
+                PERFORM rebuild_user_drawdown(NEW.userId);
+                RETURN NULL;
+            END IF;
+
+            pnl := COALESCE(NEW.profit_loss, 0);
+            INSERT INTO drawdown_state AS s (userId, equity, peak, max_drawdown, trade_count, last_exit_time, updated_at)
+            VALUES (
+                NEW.userId,
+                10000 + pnl,
+                GREATEST(10000, 10000 + pnl),
+                GREATEST(0, -pnl) / 10000,
+                1,
+                NEW.exit_time,
+                CURRENT_TIMESTAMP
+            )
+            ON CONFLICT (userId) DO UPDATE SET
+                equity = s.equity + pnl,
+                peak = GREATEST(s.peak, s.equity + pnl),
+                max_drawdown = GREATEST(
+                    s.max_drawdown,
+                    CASE WHEN GREATEST(s.peak, s.equity + pnl) > 0
+                         THEN (GREATEST(s.peak, s.equity + pnl) - (s.equity + pnl)) / GREATEST(s.peak, s.equity + pnl)
+                         ELSE 0 END
+                ),
+                trade_count = s.trade_count + 1,
+                last_exit_time = GREATEST(s.last_exit_time, NEW.exit_time),
+                updated_at = CURRENT_TIMESTAMP;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+
+    op.execute("""
+        DO $$
+        BEGIN
+            IF to_regclass('trades') IS NOT NULL THEN
+                UPDATE drawdown_state s
+                SET last_exit_time = (
+                    SELECT MAX(t.exit_time) FROM trades t
+                    WHERE t.userId = s.userId AND t.status = 'closed' AND t.exit_time IS NOT NULL
+                );
+
+                DROP TRIGGER IF EXISTS trades_drawdown_state ON trades;
+                CREATE TRIGGER trades_drawdown_state
+                AFTER INSERT OR DELETE OR UPDATE OF status, exit_time, profit_loss, userId ON trades
+                FOR EACH ROW EXECUTE FUNCTION apply_closed_trade_drawdown();
+            END IF;
+        END
+        $$
+    """)
+
+
+def downgrade():
+    op.execute("""
+        DO $$
+        BEGIN
+            IF to_regclass('trades') IS NOT NULL THEN
+                DROP TRIGGER IF EXISTS trades_drawdown_state ON trades;
+                CREATE TRIGGER trades_drawdown_state
+                AFTER INSERT OR UPDATE OF status, exit_time ON trades
+                FOR EACH ROW EXECUTE FUNCTION apply_closed_trade_drawdown();
+            END IF;
+        END
+        $$
+    """)
+    # Restore the insert/close-only fold from 20251021_drawdown_state
+    op.execute("""
+        CREATE OR REPLACE FUNCTION apply_closed_trade_drawdown() RETURNS trigger AS $$
+        DECLARE
+            pnl NUMERIC := COALESCE(NEW.profit_loss, 0);
+        BEGIN
+            IF NEW.status IS DISTINCT FROM 'closed' OR NEW.exit_time IS NULL THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'UPDATE' AND OLD.status = 'closed' AND OLD.exit_time IS NOT NULL THEN
+                RETURN NULL;
+            END IF;
+
+            INSERT INTO drawdown_state AS s (userId, equity, peak, max_drawdown, trade_count, updated_at)
+            VALUES (
+                NEW.userId,
+                10000 + pnl,
+                GREATEST(10000, 10000 + pnl),
+                GREATEST(0, -pnl) / 10000,
+                1,
+                CURRENT_TIMESTAMP
+            )
+            ON CONFLICT (userId) DO UPDATE SET
+                equity = s.equity + pnl,
+                peak = GREATEST(s.peak, s.equity + pnl),
+                max_drawdown = GREATEST(
+                    s.max_drawdown,
+                    CASE WHEN GREATEST(s.peak, s.equity + pnl) > 0
+                         THEN (GREATEST(s.peak, s.equity + pnl) - (s.equity + pnl)) / GREATEST(s.peak, s.equity + pnl)
+                         ELSE 0 END
+                ),
+                trade_count = s.trade_count + 1,
+                updated_at = CURRENT_TIMESTAMP;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP FUNCTION IF EXISTS rebuild_user_drawdown(INTEGER)")
+    op.execute("ALTER TABLE drawdown_state DROP COLUMN IF EXISTS last_exit_time")
@@ -0,0 +1,23 @@
+"""carry position fingerprints through staging
+
+Revision ID: 20251029_staging_fingerprints
+Revises: 20251028_drawdown_trigger_rebuild
+Create Date: 2025-10-29 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20251029_staging_fingerprints'
+down_revision = '20251028_drawdown_trigger_rebuild'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Snapshots now advance at reconcile time from the staged fingerprint
+    op.execute("ALTER TABLE positions_staging ADD COLUMN IF NOT EXISTS fingerprint TEXT")
+
+
+def downgrade():
+    op.execute("ALTER TABLE positions_staging DROP COLUMN IF EXISTS fingerprint")
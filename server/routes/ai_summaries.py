@@ -29,10 +29,10 @@ async def get_ai_summary(
     Get AI-powered portfolio summary (navigator+ tier)
     """
     try:
-        from server.services.strategy_engine import get_strategy_overlays
+        from server.services.strategy_overlay_store import get_overlays
         from server.services.ai_orchestrator import summarize_portfolio
         
-        overlays = get_strategy_overlays(data.user_id, db)
+        overlays = get_overlays(db, data.user_id)
         
         summary = await summarize_portfolio(overlays)
         
@@ -58,10 +58,10 @@ async def get_ai_explanation(
     Get detailed AI strategy explanation (operator+ tier)
     """
     try:
-        from server.services.strategy_engine import get_strategy_overlays
+        from server.services.strategy_overlay_store import get_overlays
         from server.services.ai_orchestrator import explain_strategy
         
-        overlays = get_strategy_overlays(data.user_id, db)
+        overlays = get_overlays(db, data.user_id)
         
         explanation = await explain_strategy(overlays)
         
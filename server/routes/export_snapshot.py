@@ -25,7 +25,7 @@ async def generate_snapshot_background(export_id: int, user_id: int, formats: li
     """Background task to generate snapshot artifacts"""
     try:
         from server.services.snapshot_exporter import create_snapshot
-        from server.services.strategy_engine import get_strategy_overlays
+        from server.services.strategy_overlay_store import get_overlays
         
         positions_query = text("""
             SELECT symbol, quantity, avg_price, current_price, 
@@ -37,7 +37,7 @@ async def generate_snapshot_background(export_id: int, user_id: int, formats: li
         positions = db.execute(positions_query, {"user_id": user_id}).mappings().all()
         positions_list = [dict(row) for row in positions]
         
-        overlays = get_strategy_overlays(user_id, db)
+        overlays = get_overlays(db, user_id)
         
         total_value = sum(p.get('market_value', 0) for p in positions_list)
         unrealized_pnl = sum(p.get('unrealized_pnl', 0) for p in positions_list)
@@ -17,12 +17,14 @@ async def import_ibkr_flex(
     Import portfolio data from IBKR Flex Query
     
     Requires: operator tier or higher
-    Environment: IBKR_FLEX_TOKEN, IBKR_FLEX_QUERY_ID
+    Credentials: the user's ibkr_flex data source, else IBKR_FLEX_TOKEN / IBKR_FLEX_QUERY_ID
     Rate limit: 10 requests/minute per user
     """
     with log_import_operation("ibkr", user_id) as log_ctx:
         try:
-            payload = await ibkr_flex_service.get_ibkr_portfolio_payload()
+            payload = await ibkr_flex_service.get_ibkr_portfolio_payload(
+                ibkr_flex_service.user_credentials(db, user_id)
+            )
             digest = payload.pop("_digest")
             
             stmt, params = qmark("""
@@ -1,4 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
+from typing import Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -7,3 +12,35 @@ router = APIRouter()
 async def stub_endpoint():
     """Temporary stub - pending PostgreSQL migration"""
     raise HTTPException(status_code=501, detail="Route pending PostgreSQL migration")
+
+
+@router.get("/signals/screen")
+async def screen_signals(
+    q: str = Query(..., description="Compound predicate, e.g. 'rsi < 30 AND price > ma50'"),
+    sort_by: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=5000)
+):
+    """
+    Screen the tracked universe by indicator predicates (participant+ tier)
+    Predicates resolve against precomputed sorted indices
+    """
+    from server.logic.signal_engine import signal_engine
+    from server.logic.signal_cache import SIGNAL_CACHE_WINDOW_SEC
+    from server.logic.signal_screener import signal_screener, ScreenerQueryError
+    
+    # A refresh runs the indicator kernel over the whole universe; keep it off the event loop
+    await asyncio.to_thread(signal_screener.refresh_if_stale, signal_engine, SIGNAL_CACHE_WINDOW_SEC)
+    
+    try:
+        matches = signal_screener.screen(q, sort_by=sort_by, limit=limit)
+    except ScreenerQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "status": "success",
+        "data": {
+            "query": q,
+            "universe_size": len(signal_screener),
+            "matches": matches
+        }
+    }
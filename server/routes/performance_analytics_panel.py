@@ -14,6 +14,7 @@ from fastapi import APIRouter, HTTPException, Depends, Query, Body
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 import json
+import asyncio
 from datetime import datetime, date, timedelta
 from pathlib import Path as FilePath
 
@@ -375,62 +376,50 @@ async def get_risk_analytics(user_id: int = 1, db = Depends(db_session)):
         """, ())
         db.execute(stmt, params)
         
-        # Get latest risk analytics
-        stmt, params = qmark("""
-            SELECT * FROM RiskAnalytics 
-            WHERE userId = ? 
-            ORDER BY analysis_date DESC 
-            LIMIT 1
-        """, (user_id,))
-        
-        result = db.execute(stmt, params).mappings().first()
+        # Compute from positions and price history (cached per portfolio version)
+        from server.logic.risk_engine import RiskError
+        from server.services.risk_service import get_portfolio_risk
         
-        if not result:
-            # Generate sample risk analytics
-            risk_data = generate_sample_risk_analytics(user_id)
-            
-            stmt, params = qmark("""
-                INSERT INTO RiskAnalytics 
-                (userId, analysis_date, portfolio_volatility, portfolio_beta,
-                 var_1day_95, var_1day_99, cvar_1day_95, largest_position_pct,
-                 top_5_positions_pct, top_10_positions_pct, sector_concentrations)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                user_id,
-                datetime.now().date().isoformat(),
-                risk_data['portfolio_volatility'],
-                risk_data['portfolio_beta'],
-                risk_data['var_1day_95'],
-                risk_data['var_1day_99'],
-                risk_data['cvar_1day_95'],
-                risk_data['largest_position_pct'],
-                risk_data['top_5_positions_pct'],
-                risk_data['top_10_positions_pct'],
-                json.dumps(risk_data['sector_concentrations'])
-            ))
-            db.execute(stmt, params)
-            
-            db.commit()
-            
-            # Re-fetch data
-            stmt, params = qmark("""
-                SELECT * FROM RiskAnalytics 
-                WHERE userId = ? 
-                ORDER BY analysis_date DESC 
-                LIMIT 1
-            """, (user_id,))
-            
-            result = db.execute(stmt, params).mappings().first()
+        try:
+            risk_data = await asyncio.to_thread(get_portfolio_risk, db, user_id)
+        except RiskError as e:
+            raise HTTPException(status_code=404, detail=str(e))
         
-        risk_data = dict(result)
-        
-        # Parse JSON fields
-        sector_concentrations = json.loads(risk_data.get('sector_concentrations', '{}'))
-        geographic_concentrations = json.loads(risk_data.get('geographic_concentrations', '{}'))
+        stmt, params = qmark("""
+            INSERT INTO RiskAnalytics 
+            (userId, analysis_date, portfolio_variance, portfolio_volatility, portfolio_beta,
+             var_1day_95, var_1day_99, cvar_1day_95, largest_position_pct,
+             top_5_positions_pct, top_10_positions_pct)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (userId, analysis_date) DO UPDATE SET
+                portfolio_variance = EXCLUDED.portfolio_variance,
+                portfolio_volatility = EXCLUDED.portfolio_volatility,
+                portfolio_beta = EXCLUDED.portfolio_beta,
+                var_1day_95 = EXCLUDED.var_1day_95,
+                var_1day_99 = EXCLUDED.var_1day_99,
+                cvar_1day_95 = EXCLUDED.cvar_1day_95,
+                largest_position_pct = EXCLUDED.largest_position_pct,
+                top_5_positions_pct = EXCLUDED.top_5_positions_pct,
+                top_10_positions_pct = EXCLUDED.top_10_positions_pct
+        """, (
+            user_id,
+            datetime.now().date().isoformat(),
+            risk_data['portfolio_variance'],
+            risk_data['portfolio_volatility'],
+            risk_data['portfolio_beta'],
+            risk_data['var_1day_95'],
+            risk_data['var_1day_99'],
+            risk_data['cvar_1day_95'],
+            risk_data['largest_position_pct'],
+            risk_data['top_5_positions_pct'],
+            risk_data['top_10_positions_pct']
+        ))
+        db.execute(stmt, params)
+        db.commit()
         
         risk_analytics = {
-            "analysisDate": risk_data['analysis_date'],
-            "portfolioVariance": risk_data.get('portfolio_variance', 0),
+            "analysisDate": datetime.now().date().isoformat(),
+            "portfolioVariance": risk_data['portfolio_variance'],
             "portfolioVolatility": risk_data['portfolio_volatility'],
             "portfolioBeta": risk_data['portfolio_beta'],
             "var1Day95": risk_data['var_1day_95'],
@@ -439,9 +428,17 @@ async def get_risk_analytics(user_id: int = 1, db = Depends(db_session)):
             "largestPositionPct": risk_data['largest_position_pct'],
             "top5PositionsPct": risk_data['top_5_positions_pct'],
             "top10PositionsPct": risk_data['top_10_positions_pct'],
-            "sectorConcentrations": sector_concentrations,
-            "geographicConcentrations": geographic_concentrations,
-            "concentrationRisk": get_concentration_risk_level(risk_data['largest_position_pct'])
+            "sectorConcentrations": {},
+            "geographicConcentrations": {},
+            "concentrationRisk": get_concentration_risk_level(risk_data['largest_position_pct']),
+            "varMethods": risk_data['methods'],
+            "benchmark": risk_data['benchmark'],
+            "covarianceShrinkage": risk_data['covariance_shrinkage'],
+            "observations": risk_data['observations'],
+            "excludedSymbols": risk_data['excluded_symbols'],
+            "synthetic": risk_data['synthetic'],
+            "warnings": risk_data['warnings'],
+            "portfolioVersion": risk_data['portfolio_version']
         }
         
         await log_to_agent_memory(
@@ -456,6 +453,8 @@ async def get_risk_analytics(user_id: int = 1, db = Depends(db_session)):
         
         return risk_analytics
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -695,29 +694,6 @@ def generate_sample_trading_metrics(start_date: str, end_date: str, period_type:
     
     return metrics
 
-def generate_sample_risk_analytics(user_id: int) -> Dict:
-    """Generate sample risk analytics data"""
-    seed = hash(str(user_id) + str(datetime.now().date())) % 1000
-    
-    return {
-        "portfolio_volatility": 12 + (seed % 20),  # 12-32% volatility
-        "portfolio_beta": 0.7 + (seed % 60) / 100,  # 0.7-1.3 beta
-        "var_1day_95": -(1 + (seed % 400) / 100),  # -1% to -5% VaR
-        "var_1day_99": -(2 + (seed % 600) / 100),  # -2% to -8% VaR
-        "cvar_1day_95": -(1.5 + (seed % 500) / 100),  # -1.5% to -6.5% CVaR
-        "largest_position_pct": 8 + (seed % 25),  # 8-33% largest position
-        "top_5_positions_pct": 35 + (seed % 30),  # 35-65% top 5 positions
-        "top_10_positions_pct": 55 + (seed % 35),  # 55-90% top 10 positions
-        "sector_concentrations": {
-            "Technology": 25 + (seed % 20),
-            "Healthcare": 15 + (seed % 15),
-            "Finance": 12 + (seed % 18),
-            "Consumer": 10 + (seed % 12),
-            "Energy": 8 + (seed % 10),
-            "Other": 30 - (seed % 15)
-        }
-    }
-
 def get_concentration_risk_level(largest_position_pct: float) -> str:
     """Determine concentration risk level based on largest position percentage"""
     if largest_position_pct < 10:
@@ -1,9 +1,63 @@
 from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import Optional, Dict, Any
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
+class BacktestRequest(BaseModel):
+    strategy: str
+    symbol: str
+    params: Optional[Dict[str, Any]] = None
+    initial_capital: float = 10000.0
+    fee_bps: float = 0.0
+    bars: Optional[int] = None
+
+
 @router.get("/stub")
 async def stub_endpoint():
     """Temporary stub - pending PostgreSQL migration"""
     raise HTTPException(status_code=501, detail="Route pending PostgreSQL migration")
+
+
+@router.post("/backtest")
+async def backtest_strategy(request: BacktestRequest):
+    """
+    Backtest a built-in strategy over stored price history (builder+ tier)
+    Returns equity curve, trade list and summary stats
+    """
+    from server.logic.backtest_engine import run_backtest, BacktestError
+    from server.logic.signal_engine import get_signal_engine
+    
+    signal_engine = get_signal_engine()
+    if not signal_engine.ensure_symbol(request.symbol):
+        raise HTTPException(status_code=404, detail=f"No price history for {request.symbol}")
+    
+    history = signal_engine.price_store.last_n(request.symbol, request.bars)
+    
+    try:
+        result = run_backtest(
+            request.strategy,
+            history["price"],
+            volumes=history["volume"],
+            params=request.params,
+            timestamps=history["timestamp"],
+            initial_capital=request.initial_capital,
+            fee_bps=request.fee_bps,
+        )
+    except BacktestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "status": "success",
+        "data": {
+            "strategy": request.strategy,
+            "symbol": request.symbol,
+            "equity_curve": [round(float(v), 4) for v in result["equity_curve"]],
+            "trades": result["trades"],
+            "stats": result["stats"]
+        }
+    }
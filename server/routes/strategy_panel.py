@@ -24,9 +24,9 @@ async def get_strategy_overlays(
     Returns momentum, volatility, concentration, and drawdown metrics
     """
     try:
-        from server.services.strategy_engine import get_strategy_overlays
+        from server.services.strategy_overlay_store import get_overlays
         
-        overlays = get_strategy_overlays(user_id, db)
+        overlays = get_overlays(db, user_id)
         
         return {
             "status": "success",
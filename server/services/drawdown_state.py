@@ -0,0 +1,141 @@
+"""
+Drawdown State - running equity, peak and max drawdown per user
+Closed trades fold into the state in O(1) (a PostgreSQL trigger on trades
+applies the same update in the database, and refolds the user's history when
+a folded trade is deleted or edited or a trade closes before the last folded
+exit), so reads are a primary-key lookup and the drawdown covers the user's
+full trade history.
+"""
+import logging
+from typing import Dict, Any, Sequence
+
+import numpy as np
+
+from server.db.qmark import qmark
+
+logger = logging.getLogger(__name__)
+
+STARTING_EQUITY = 10000.0
+
+
+class DrawdownState:
+    """Running equity curve summary: current equity, peak and worst drawdown"""
+
+    def __init__(
+        self,
+        equity: float = STARTING_EQUITY,
+        peak: float = STARTING_EQUITY,
+        max_drawdown: float = 0.0,
+        trade_count: int = 0,
+    ):
+        self.equity = float(equity)
+        self.peak = float(peak)
+        self.max_drawdown = float(max_drawdown)
+        self.trade_count = int(trade_count)
+
+    def apply(self, pnl: float) -> None:
+        """Fold one closed trade's P&L into the state"""
+        self.equity += float(pnl)
+        if self.equity > self.peak:
+            self.peak = self.equity
+        drawdown = (self.peak - self.equity) / self.peak if self.peak > 0 else 0.0
+        if drawdown > self.max_drawdown:
+            self.max_drawdown = drawdown
+        self.trade_count += 1
+
+    def apply_many(self, pnls: Sequence[float]) -> None:
+        """Fold a run of closed trades (in exit order) in one vectorized pass"""
+        pnls = np.asarray(pnls, dtype=np.float64)
+        if not len(pnls):
+            return
+        equity = self.equity + np.cumsum(pnls)
+        peaks = np.maximum(self.peak, np.maximum.accumulate(equity))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drawdowns = np.where(peaks > 0, (peaks - equity) / peaks, 0.0)
+        self.equity = float(equity[-1])
+        self.peak = float(peaks[-1])
+        self.max_drawdown = max(self.max_drawdown, float(drawdowns.max()))
+        self.trade_count += len(pnls)
+
+    def overlay(self, unrealized_pnl: float = 0.0) -> Dict[str, Any]:
+        """
+        Drawdown overlay with current mark-to-market appended as the last point
+
+        Matches drawdown_from_arrays over the full closed-trade history.
+        """
+        current_value = self.equity + float(unrealized_pnl)
+        peak = max(self.peak, current_value)
+        current_drawdown = (peak - current_value) / peak if peak > 0 else 0.0
+        max_drawdown = max(self.max_drawdown, current_drawdown)
+
+        return {
+            "max_drawdown_pct": round(max_drawdown * 100, 2),
+            "current_drawdown_pct": round(current_drawdown * 100, 2),
+            "peak_value": round(peak, 2),
+            "current_value": round(current_value, 2),
+            "trade_count": self.trade_count,
+            "summary": f"Max DD: {round(max_drawdown * 100, 2)}%"
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "equity": self.equity,
+            "peak": self.peak,
+            "max_drawdown": self.max_drawdown,
+            "trade_count": self.trade_count,
+        }
+
+
+def _save_state(db, user_id: int, state: DrawdownState, last_exit_time: Any = None) -> None:
+    stmt, params = qmark("""
+        INSERT INTO drawdown_state (userId, equity, peak, max_drawdown, trade_count, last_exit_time, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (userId)
+        DO UPDATE SET
+            equity = EXCLUDED.equity,
+            peak = EXCLUDED.peak,
+            max_drawdown = EXCLUDED.max_drawdown,
+            trade_count = EXCLUDED.trade_count,
+            last_exit_time = EXCLUDED.last_exit_time,
+            updated_at = EXCLUDED.updated_at
+    """, (user_id, state.equity, state.peak, state.max_drawdown, state.trade_count, last_exit_time))
+    db.execute(stmt, params)
+
+
+def rebuild_drawdown_state(db, user_id: int) -> DrawdownState:
+    """
+    Recompute a user's state from their full closed-trade history and store it
+
+    Runs in the caller's transaction; the caller commits.
+    """
+    stmt, params = qmark("""
+        SELECT profit_loss, exit_time FROM trades
+        WHERE userId = ? AND status = 'closed' AND exit_time IS NOT NULL
+        ORDER BY exit_time
+    """, (user_id,))
+    rows = db.execute(stmt, params).all()
+    pnls = [row[0] or 0.0 for row in rows]
+
+    state = DrawdownState()
+    state.apply_many(pnls)
+    _save_state(db, user_id, state, rows[-1][1] if rows else None)
+    logger.info(f"Rebuilt drawdown state for user {user_id} from {len(pnls)} trades")
+    return state
+
+
+def get_drawdown_state(db, user_id: int) -> DrawdownState:
+    """
+    Stored state for a user (primary-key lookup), rebuilt once if missing
+
+    A rebuild is written in the caller's transaction and is not committed here.
+    """
+    stmt, params = qmark("""
+        SELECT equity, peak, max_drawdown, trade_count
+        FROM drawdown_state
+        WHERE userId = ?
+    """, (user_id,))
+    row = db.execute(stmt, params).first()
+    if row is None:
+        return rebuild_drawdown_state(db, user_id)
+    return DrawdownState(*row)
+
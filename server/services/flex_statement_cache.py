@@ -0,0 +1,264 @@
+"""
+Flex statement cache
+Raw Flex statements kept on local disk, content-addressed by SHA-256 and
+indexed by (credentials scope, whenGenerated). The scope hashes the Flex token
+with the query ID, so a statement is only served to the credentials that
+fetched it. A sync within FLEX_CACHE_TTL_SEC of the last fetch for the same
+scope and period is answered from disk without calling IBKR, and a statement
+IBKR has already generated is recognized by its index entry without being
+scanned again. Blobs are capped at FLEX_CACHE_MAX_BYTES, evicting the least
+recently fetched first; FLEX_CACHE_MAX_BYTES=0 disables it.
+"""
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Optional
+
+FLEX_CACHE_DIR = os.getenv("FLEX_CACHE_DIR", os.path.join(tempfile.gettempdir(), "stackmotive-flex-cache"))
+FLEX_CACHE_MAX_BYTES = int(os.getenv("FLEX_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+FLEX_CACHE_TTL_SEC = float(os.getenv("FLEX_CACHE_TTL_SEC", "900"))
+# Blobs written or served this recently are never evicted, so a statement
+# another process has just returned stays readable while it is parsed
+FLEX_CACHE_GRACE_SEC = float(os.getenv("FLEX_CACHE_GRACE_SEC", "600"))
+
+INDEX_FILE = "index.json"
+LOCK_FILE = ".lock"
+BLOB_SUFFIX = ".xml"
+
+
+def cache_scope(token: str, query_id: str) -> str:
+    """Index scope for one set of Flex credentials (the token is never stored)"""
+    return hashlib.sha256(f"{token}\0{query_id}".encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class CachedStatement:
+    """One raw statement and the summary it was indexed with"""
+    scope: str
+    when_generated: str
+    sha256: str
+    size: int
+    fetched_at: float
+    meta: Dict[str, Any] = field(default_factory=dict, compare=False)
+    # Set only when the statement could not be written to disk
+    text: Optional[str] = field(default=None, repr=False, compare=False)
+
+
+class FlexStatementCache:
+    """
+    Disk cache of raw Flex statements
+
+    The index is a small JSON file replaced atomically; writers (put and
+    eviction) hold an fcntl lock on the cache directory for the whole
+    read-modify-write, so concurrent worker processes never drop each
+    other's entries. Blobs younger than grace_sec are not evicted.
+    """
+
+    def __init__(
+        self,
+        root: str = FLEX_CACHE_DIR,
+        max_bytes: int = FLEX_CACHE_MAX_BYTES,
+        ttl_sec: float = FLEX_CACHE_TTL_SEC,
+        grace_sec: float = FLEX_CACHE_GRACE_SEC
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_sec = ttl_sec
+        self.grace_sec = grace_sec
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def path(self, entry: CachedStatement) -> str:
+        return os.path.join(self.root, entry.sha256 + BLOB_SUFFIX)
+
+    @contextmanager
+    def _write_lock(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.root, INDEX_FILE), encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault("statements", {})
+        index.setdefault("latest", {})
+        return index
+
+    def _save_index(self, index: Dict[str, Dict[str, Any]]) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp, os.path.join(self.root, INDEX_FILE))
+
+    def _entry(self, index: Dict[str, Dict[str, Any]], key: Optional[str]) -> Optional[CachedStatement]:
+        record = index["statements"].get(key) if key else None
+        if record is None:
+            return None
+        try:
+            entry = CachedStatement(**record)
+        except TypeError:
+            return None
+        return entry if os.path.exists(self.path(entry)) else None
+
+    def _touch(self, entry: CachedStatement) -> Optional[CachedStatement]:
+        """Restart a served blob's grace period; None if it is already gone"""
+        try:
+            os.utime(self.path(entry))
+        except OSError:
+            return None
+        return entry
+
+    def get(self, scope: str, when_generated: str) -> Optional[CachedStatement]:
+        """The cached statement for a credentials scope generated at when_generated"""
+        if not self.enabled:
+            return None
+        entry = self._entry(self._load_index(), f"{scope}|{when_generated}")
+        return self._touch(entry) if entry is not None else None
+
+    def fresh(self, scope: str, period: str = "") -> Optional[CachedStatement]:
+        """The last statement fetched for a credentials scope and period, if fetched within the TTL"""
+        if not self.enabled or self.ttl_sec <= 0:
+            return None
+        index = self._load_index()
+        entry = self._entry(index, index["latest"].get(f"{scope}|{period}"))
+        if entry is None or time.time() - entry.fetched_at >= self.ttl_sec:
+            return None
+        return self._touch(entry)
+
+    def put(
+        self,
+        scope: str,
+        text: str,
+        when_generated: str,
+        meta: Dict[str, Any],
+        period: str = ""
+    ) -> CachedStatement:
+        """
+        Store a fetched statement and mark it latest for the scope and period
+
+        Statements larger than the cap are not stored; the returned entry then
+        carries the text itself.
+        """
+        data = text.encode("utf-8")
+        entry = CachedStatement(
+            scope=scope,
+            when_generated=when_generated,
+            sha256=hashlib.sha256(data).hexdigest(),
+            size=len(data),
+            fetched_at=time.time(),
+            meta=dict(meta),
+        )
+        if not self.enabled or entry.size > self.max_bytes:
+            return replace(entry, text=text)
+
+        os.makedirs(self.root, exist_ok=True)
+        blob = self.path(entry)
+        if self._touch(entry) is None:
+            fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, blob)
+
+        with self._write_lock():
+            index = self._load_index()
+            key = f"{scope}|{when_generated}"
+            index["statements"][key] = {
+                "scope": scope,
+                "when_generated": when_generated,
+                "sha256": entry.sha256,
+                "size": entry.size,
+                "fetched_at": entry.fetched_at,
+                "meta": entry.meta,
+            }
+            index["latest"][f"{scope}|{period}"] = key
+            self._evict(index, keep=key)
+            self._save_index(index)
+        return entry
+
+    def _evict(self, index: Dict[str, Dict[str, Any]], keep: str) -> None:
+        """
+        Drop unindexed blobs, then least recently fetched statements, until under the cap
+
+        Called with the write lock held. Blobs modified within grace_sec
+        (just written, or just served) are kept even if that leaves the
+        cache over the cap until a later put.
+        """
+        statements = index["statements"]
+        referenced = {record["sha256"] for record in statements.values()}
+        cutoff = time.time() - self.grace_sec
+        sizes, recent = {}, set()
+        for name in os.listdir(self.root):
+            if not name.endswith(BLOB_SUFFIX):
+                continue
+            sha = name[:-len(BLOB_SUFFIX)]
+            try:
+                stat = os.stat(os.path.join(self.root, name))
+            except OSError:
+                continue
+            if stat.st_mtime > cutoff:
+                recent.add(sha)
+            if sha in referenced:
+                sizes[sha] = stat.st_size
+            elif sha not in recent:
+                _remove(os.path.join(self.root, name))
+        total = sum(sizes.values())
+
+        for key, record in sorted(statements.items(), key=lambda item: item[1]["fetched_at"]):
+            if total <= self.max_bytes:
+                break
+            sha = record["sha256"]
+            if key == keep or sha in recent:
+                continue
+            del statements[key]
+            if sha in sizes and not any(r["sha256"] == sha for r in statements.values()):
+                total -= sizes.pop(sha)
+                _remove(os.path.join(self.root, sha + BLOB_SUFFIX))
+
+        index["latest"] = {period: key for period, key in index["latest"].items() if key in statements}
+
+    def read(self, entry: CachedStatement) -> str:
+        """Statement text"""
+        if entry.text is not None:
+            return entry.text
+        with open(self.path(entry), encoding="utf-8") as f:
+            return f.read()
+
+    def source(self, entry: CachedStatement):
+        """Blob path for streaming parsers, or the text when it is not on disk"""
+        return entry.text if entry.text is not None else self.path(entry)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+_cache: Optional[FlexStatementCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_statement_cache() -> FlexStatementCache:
+    """Process-wide statement cache, constructed on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = FlexStatementCache()
+    return _cache
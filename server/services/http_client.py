@@ -1,15 +1,124 @@
 """
 Shared HTTP client with retry logic and timeouts
 Used by data import adapters (IBKR, KuCoin)
+Requests go through app-lifetime pooled clients, one per origin, so repeated
+calls to the same host reuse keep-alive (and, with h2 installed, HTTP/2)
+connections instead of paying a TCP+TLS handshake each time.
 """
 import asyncio
+import logging
 import math
+import os
 import random
-from typing import Callable, Awaitable, Dict, Any, Optional
+from typing import Callable, Awaitable, Dict, Any, List, Optional, Set
+from urllib.parse import urlsplit
 import httpx
 
+logger = logging.getLogger(__name__)
+
 DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
 RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+USER_AGENT = "StackMotive/Phase6"
+
+# Connection pool per host (origin)
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "20"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "10"))
+HTTP_POOL_KEEPALIVE_EXPIRY_SEC = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY_SEC", "60"))
+HTTP_CLIENT_HTTP2 = os.getenv("HTTP_CLIENT_HTTP2", "true").lower() == "true"
+
+
+def _http2_available() -> bool:
+    if not HTTP_CLIENT_HTTP2:
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        logger.warning("h2 package not installed, pooled HTTP clients use HTTP/1.1")
+        return False
+
+
+class ClientRegistry:
+    """
+    Pooled AsyncClients for the application's lifetime, one per origin
+    
+    Each origin gets its own connection limits. Clients are bound to the
+    event loop that created them; a registry used from a new loop starts
+    over with fresh clients and closes the old ones, on their own loop if
+    it is still running elsewhere, otherwise on the new loop.
+    """
+    
+    def __init__(
+        self,
+        max_connections: int = HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive: int = HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry: float = HTTP_POOL_KEEPALIVE_EXPIRY_SEC,
+        http2: Optional[bool] = None
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = _http2_available() if http2 is None else http2
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Closes of clients left behind by a previous loop, kept referenced until done
+        self._retiring: Set[asyncio.Future] = set()
+    
+    def _retire(self, clients: List[httpx.AsyncClient], old_loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """Close clients created on a previous event loop"""
+        for client in clients:
+            if old_loop is not None and old_loop.is_running() and not old_loop.is_closed():
+                future = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.aclose(), old_loop))
+            else:
+                future = asyncio.ensure_future(client.aclose())
+            self._retiring.add(future)
+            future.add_done_callback(self._retired)
+    
+    def _retired(self, future: asyncio.Future) -> None:
+        self._retiring.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logger.debug(f"Closing a client from a previous event loop failed: {future.exception()}")
+    
+    def get(self, url: str) -> httpx.AsyncClient:
+        """The pooled client for url's origin, created on first use"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._retire(list(self._clients.values()), self._loop)
+            self._clients, self._loop = {}, loop
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        client = self._clients.get(origin)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=DEFAULT_TIMEOUT,
+                limits=self.limits,
+                http2=self.http2,
+                headers={"User-Agent": USER_AGENT},
+            )
+            self._clients[origin] = client
+        return client
+    
+    async def aclose(self) -> None:
+        """Close every pooled client (application shutdown)"""
+        clients, self._clients = list(self._clients.values()), {}
+        loop = asyncio.get_running_loop()
+        retiring = [future for future in self._retiring if future.get_loop() is loop]
+        await asyncio.gather(*(client.aclose() for client in clients), *retiring, return_exceptions=True)
+
+
+_registry = ClientRegistry()
+
+
+def get_http_client(url: str) -> httpx.AsyncClient:
+    """App-scoped pooled client for url's host"""
+    return _registry.get(url)
+
+
+async def close_http_clients() -> None:
+    """Close the app-scoped pooled clients"""
+    await _registry.aclose()
 
 async def _sleep_backoff(attempt: int, base: float = 0.25, cap: float = 4.0) -> None:
     delay = min(cap, base * (2 ** attempt))
@@ -29,30 +138,26 @@ async def request_with_retry(
     """
     Minimal async retry wrapper for httpx.
     Retries on network errors and retryable HTTP status codes.
+    Without a client, the app-scoped pooled client for url's host is used.
     """
     retry_on = retry_on or RETRYABLE_STATUS
-    owns_client = client is None
-    if owns_client:
-        client = httpx.AsyncClient(timeout=timeout, headers={"User-Agent": "StackMotive/Phase6"})
-    try:
-        last_exc = None
-        for attempt in range(max_attempts):
-            try:
-                resp = await client.request(method, url, **kwargs)
-                if resp.status_code in retry_on:
-                    _ = resp.text
-                    raise httpx.HTTPStatusError(
-                        f"Retryable status {resp.status_code}",
-                        request=resp.request,
-                        response=resp,
-                    )
-                return resp
-            except (httpx.TransportError, httpx.TimeoutException, httpx.HTTPStatusError) as e:
-                last_exc = e
-                if attempt == max_attempts - 1:
-                    raise
-                await _sleep_backoff(attempt)
-        raise last_exc if last_exc else RuntimeError("request_with_retry fell through")
-    finally:
-        if owns_client:
-            await client.aclose()
+    if client is None:
+        client = get_http_client(url)
+    last_exc = None
+    for attempt in range(max_attempts):
+        try:
+            resp = await client.request(method, url, timeout=timeout, **kwargs)
+            if resp.status_code in retry_on:
+                _ = resp.text
+                raise httpx.HTTPStatusError(
+                    f"Retryable status {resp.status_code}",
+                    request=resp.request,
+                    response=resp,
+                )
+            return resp
+        except (httpx.TransportError, httpx.TimeoutException, httpx.HTTPStatusError) as e:
+            last_exc = e
+            if attempt == max_attempts - 1:
+                raise
+            await _sleep_backoff(attempt)
+    raise last_exc if last_exc else RuntimeError("request_with_retry fell through")
@@ -1,13 +1,45 @@
 """
 IBKR Flex Query service for portfolio data import
 Harvested from StackMotive-V11 server/services/brokers/ibkr_flex_client.py
+Credentials are passed per call (FlexCredentials), so statements for many
+users can be fetched concurrently in one process; user_credentials() reads a
+user's own credentials from their IBKR data source.
 """
+import io
 import os
-import time
+import json
+import random
+import asyncio
 import hashlib
 import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+from server.db.qmark import qmark
+from server.services.flex_statement_cache import CachedStatement, cache_scope, get_statement_cache
 from server.services.http_client import request_with_retry
 
+DEFAULT_FLEX_BASE = "https://ndcdyn.interactivebrokers.com/AccountManagement/FlexWebService"
+IBKR_FLEX_POLL_INITIAL_SEC = float(os.getenv("IBKR_FLEX_POLL_INITIAL_SEC", "0.5"))
+IBKR_FLEX_POLL_MAX_SEC = float(os.getenv("IBKR_FLEX_POLL_MAX_SEC", "8"))
+IBKR_FLEX_POLL_BACKOFF = float(os.getenv("IBKR_FLEX_POLL_BACKOFF", "1.6"))
+IBKR_FLEX_POLL_TIMEOUT_SEC = float(os.getenv("IBKR_FLEX_POLL_TIMEOUT_SEC", "120"))
+
+# GetStatement error codes that mean "not ready yet / try again"
+FLEX_RETRY_CODES = frozenset({"1001", "1004", "1005", "1006", "1007", "1008", "1009", "1018", "1019", "1021"})
+FLEX_THROTTLED_CODE = "1018"
+
+# SendRequest fd/td (from/to date) parameter format
+FLEX_DATE_FORMAT = "%Y%m%d"
+
+FLEX_DATETIME_FORMATS = (
+    "%Y%m%d;%H%M%S", "%Y-%m-%d;%H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S",
+    "%Y%m%d", "%Y-%m-%d",
+)
+
+# FlexCredentials or (base_url, reference code) -> shared in-flight task
+_inflight: Dict[Hashable, "asyncio.Future"] = {}
+
 class IbkrFlexError(Exception):
     """IBKR Flex API error"""
     pass
@@ -18,6 +50,52 @@ class IbkrFlexNotConfigured(IbkrFlexError):
     pass
 
 
+@dataclass(frozen=True)
+class FlexCredentials:
+    """Flex Web Service token and query for one account"""
+    token: str = field(repr=False)
+    query_id: str
+    base_url: str = DEFAULT_FLEX_BASE
+
+    @classmethod
+    def from_env(cls) -> "FlexCredentials":
+        """Process-wide credentials from IBKR_FLEX_TOKEN / IBKR_FLEX_QUERY_ID"""
+        return cls(
+            token=os.getenv("IBKR_FLEX_TOKEN", ""),
+            query_id=os.getenv("IBKR_FLEX_QUERY_ID", ""),
+            base_url=os.getenv("IBKR_FLEX_BASE", DEFAULT_FLEX_BASE),
+        )
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "FlexCredentials":
+        """Credentials from a data source config (flex_token, flex_query_id, optional flex_base)"""
+        return cls(
+            token=config.get("flex_token") or "",
+            query_id=config.get("flex_query_id") or "",
+            base_url=config.get("flex_base") or os.getenv("IBKR_FLEX_BASE", DEFAULT_FLEX_BASE),
+        )
+
+
+def user_credentials(db, user_id: int) -> FlexCredentials:
+    """
+    Flex credentials from the user's enabled ibkr_flex data source
+
+    The highest-priority source wins. Users without one fall back to the
+    process-wide IBKR_FLEX_* environment (single-account deployments).
+    """
+    stmt, params = qmark("""
+        SELECT config FROM data_sources
+        WHERE user_id = ? AND source_type = 'ibkr_flex' AND enabled = TRUE
+        ORDER BY priority ASC, created_at ASC
+        LIMIT 1
+    """, (user_id,))
+    row = db.execute(stmt, params).first()
+    if row is None:
+        return FlexCredentials.from_env()
+    config = json.loads(row[0]) if isinstance(row[0], str) else row[0]
+    return FlexCredentials.from_config(config or {})
+
+
 def compute_statement_digest(account_id: str, when_generated: str, position_count: int) -> str:
     """
     Compute unique digest for IBKR statement to enable idempotency
@@ -34,10 +112,87 @@ def compute_statement_digest(account_id: str, when_generated: str, position_coun
     return hashlib.sha256(digest_input.encode()).hexdigest()
 
 
-async def fetch_statement_xml():
+def statement_digest(statement: CachedStatement) -> str:
+    """compute_statement_digest from a cached statement's summary, without reading it"""
+    meta = statement.meta
+    return compute_statement_digest(meta["accountId"], meta["whenGenerated"], meta["positions"])
+
+
+async def fetch_statement(
+    credentials: Optional[FlexCredentials] = None,
+    from_date: Optional[date] = None
+) -> CachedStatement:
+    """
+    Fetch an IBKR Flex Query statement through the local statement cache
+    
+    Within FLEX_CACHE_TTL_SEC of the last fetch with the same credentials and
+    period the cached statement is returned without any request. A newly fetched
+    statement whose whenGenerated is already cached reuses its summary.
+    
+    Args:
+        credentials: Account credentials; defaults to the IBKR_FLEX_* environment
+        from_date: Only request activity from this date through today,
+            overriding the query's configured period
+    
+    Returns:
+        Cached statement; meta holds accountId, whenGenerated and positions
+    
+    Raises:
+        IbkrFlexNotConfigured: Missing credentials
+        IbkrFlexError: API errors
+    """
+    credentials = credentials or FlexCredentials.from_env()
+    if not (credentials.token and credentials.query_id):
+        raise IbkrFlexNotConfigured("Missing IBKR_FLEX_TOKEN or IBKR_FLEX_QUERY_ID")
+    
+    period = from_date.isoformat() if from_date else ""
+    cached = get_statement_cache().fresh(cache_scope(credentials.token, credentials.query_id), period)
+    if cached is not None:
+        return cached
+    
+    # Concurrent imports of the same query share one request, poll and cache write
+    return await _coalesced((credentials, from_date), lambda: _fetch_and_cache(credentials, from_date, period))
+
+
+async def _fetch_and_cache(credentials: FlexCredentials, from_date: Optional[date], period: str) -> CachedStatement:
+    text = await _request_statement(credentials, from_date)
+    cache = get_statement_cache()
+    scope = cache_scope(credentials.token, credentials.query_id)
+    when_generated = _statement_header(text)["whenGenerated"]
+    known = cache.get(scope, when_generated)
+    if known is not None and known.sha256 == hashlib.sha256(text.encode("utf-8")).hexdigest():
+        meta = known.meta
+    else:
+        meta = statement_summary(text)
+    return cache.put(scope, text, when_generated, meta, period)
+
+
+async def fetch_statement_text(
+    credentials: Optional[FlexCredentials] = None,
+    from_date: Optional[date] = None
+) -> str:
+    """
+    Fetch IBKR Flex Query statement XML text with retry logic
+    
+    Args:
+        credentials: Account credentials; defaults to the IBKR_FLEX_* environment
+        from_date: Only request activity from this date through today,
+            overriding the query's configured period
+    
+    Raises:
+        IbkrFlexNotConfigured: Missing credentials
+        IbkrFlexError: API errors
+    """
+    return get_statement_cache().read(await fetch_statement(credentials, from_date))
+
+
+async def fetch_statement_xml(credentials: Optional[FlexCredentials] = None):
     """
     Fetch IBKR Flex Query statement XML with retry logic
     
+    Args:
+        credentials: Account credentials; defaults to the IBKR_FLEX_* environment
+    
     Returns:
         XML ElementTree root with FlexQueryResponse
         
@@ -45,22 +200,35 @@ async def fetch_statement_xml():
         IbkrFlexNotConfigured: Missing credentials
         IbkrFlexError: API errors
     """
-    flex_token = os.getenv("IBKR_FLEX_TOKEN")
-    flex_query = os.getenv("IBKR_FLEX_QUERY_ID")
-    flex_base = os.getenv(
-        "IBKR_FLEX_BASE",
-        "https://ndcdyn.interactivebrokers.com/AccountManagement/FlexWebService",
-    )
-    
-    if not (flex_token and flex_query):
-        raise IbkrFlexNotConfigured("Missing IBKR_FLEX_TOKEN or IBKR_FLEX_QUERY_ID")
+    return ET.fromstring(await fetch_statement_text(credentials))
+
 
+def _statement_header(text: str) -> Optional[Dict[str, str]]:
+    """First FlexStatement's attributes if the response is a statement (stops at its start tag)"""
     try:
-        r = await request_with_retry(
-            "GET",
-            f"{flex_base}/SendRequest",
-            params={"t": flex_token, "q": flex_query, "v": "3"},
-        )
+        for _, elem in ET.iterparse(io.StringIO(text), events=("start",)):
+            if elem.tag == "FlexStatement":
+                return {"accountId": elem.get("accountId") or "", "whenGenerated": elem.get("whenGenerated") or ""}
+            if elem.tag != "FlexQueryResponse" and elem.tag != "FlexStatements":
+                return None
+    except ET.ParseError:
+        return None
+    return None
+
+
+def _statement_ready(text: str) -> bool:
+    """True if the response is a FlexQueryResponse with a FlexStatement"""
+    return _statement_header(text) is not None
+
+
+async def _request_statement(credentials: FlexCredentials, from_date: Optional[date] = None):
+    """SendRequest, then poll the returned reference code"""
+    params = {"t": credentials.token, "q": credentials.query_id, "v": "3"}
+    if from_date is not None:
+        params["fd"] = from_date.strftime(FLEX_DATE_FORMAT)
+        params["td"] = max(from_date, datetime.utcnow().date()).strftime(FLEX_DATE_FORMAT)
+    try:
+        r = await request_with_retry("GET", f"{credentials.base_url}/SendRequest", params=params)
     except Exception as e:
         raise IbkrFlexError(f"SendRequest failed: {e}") from e
     
@@ -73,28 +241,74 @@ async def fetch_statement_xml():
     if not ref:
         raise IbkrFlexError("No ReferenceCode returned")
 
-    for attempt in range(10):
+    return await _coalesced((credentials.base_url, ref), lambda: poll_statement(credentials, ref))
+
+
+def _poll_delay(delay: float) -> float:
+    """Jitter a poll delay by +/-25% so concurrent pollers spread out"""
+    return delay * (0.75 + random.random() / 2)
+
+
+async def poll_statement(credentials: FlexCredentials, ref: str) -> str:
+    """
+    Poll GetStatement until the statement for a reference code is ready
+    
+    Waits with asyncio.sleep, starting at IBKR_FLEX_POLL_INITIAL_SEC and
+    growing geometrically (doubling on throttling) up to
+    IBKR_FLEX_POLL_MAX_SEC, until IBKR_FLEX_POLL_TIMEOUT_SEC has elapsed.
+    
+    Returns:
+        Statement XML text
+    
+    Raises:
+        IbkrFlexError: Non-retryable Flex error, or statement not ready in time
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + IBKR_FLEX_POLL_TIMEOUT_SEC
+    delay = IBKR_FLEX_POLL_INITIAL_SEC
+    
+    while True:
+        last_error = None
         try:
             g = await request_with_retry(
                 "GET",
-                f"{flex_base}/GetStatement",
-                params={"t": flex_token, "q": ref, "v": "3"},
+                f"{credentials.base_url}/GetStatement",
+                params={"t": credentials.token, "q": ref, "v": "3"},
             )
         except Exception as e:
-            if attempt == 9:
-                raise IbkrFlexError(f"GetStatement polling failed: {e}") from e
-            time.sleep(1)
-            continue
+            last_error = e
+        else:
+            if _statement_ready(g.text):
+                return g.text
+            gr = ET.fromstring(g.text)
+            code = gr.findtext(".//ErrorCode")
+            if code and code not in FLEX_RETRY_CODES:
+                raise IbkrFlexError(gr.findtext(".//ErrorMessage") or f"GetStatement failed ({code})")
+            if code == FLEX_THROTTLED_CODE:
+                delay *= 2
         
-        gr = ET.fromstring(g.text)
-        if (
-            gr.tag == "FlexQueryResponse"
-            and gr.find(".//FlexStatement") is not None
-        ):
-            return gr
-        time.sleep(1)
+        delay = min(delay, IBKR_FLEX_POLL_MAX_SEC)
+        if loop.time() + delay > deadline:
+            if last_error is not None:
+                raise IbkrFlexError(f"GetStatement polling failed: {last_error}") from last_error
+            raise IbkrFlexError("Statement not ready after polling")
+        await asyncio.sleep(_poll_delay(delay))
+        delay *= IBKR_FLEX_POLL_BACKOFF
 
-    raise IbkrFlexError("Statement not ready after polling")
+
+async def _coalesced(key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Share one in-flight task among concurrent callers with the same key
+    
+    Callers are shielded from each other: one caller's cancellation does
+    not cancel the shared task.
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _inflight.pop(key, None) if _inflight.get(key) is t else None)
+    return await asyncio.shield(task)
 
 
 def _as_float(s):
@@ -166,12 +380,202 @@ def parse_minimal_payload(xml_root):
     }
 
 
-async def get_ibkr_portfolio_payload():
+def parse_flex_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Parse Flex date/time attributes ("20240105;093000", "2024-01-05", ...)"""
+    if not value:
+        return None
+    value = value.strip()
+    for fmt in FLEX_DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _position_record(a: Dict[str, str]) -> Dict[str, Any]:
+    val_ccy = _as_float(a.get("positionValue") or "0")
+    return {
+        "accountId": a.get("accountId") or "",
+        "symbol": a.get("symbol"),
+        "description": a.get("description"),
+        "quantity": _as_float(a.get("position") or "0"),
+        "markPrice": _as_float(a.get("markPrice") or "0"),
+        "currency": a.get("currency"),
+        "valueCcy": val_ccy,
+        "valueBase": val_ccy * _as_float(a.get("fxRateToBase") or "1"),
+    }
+
+
+def _trade_record(a: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        "accountId": a.get("accountId") or "",
+        "tradeId": a.get("tradeID") or a.get("transactionID") or "",
+        "symbol": a.get("symbol"),
+        "description": a.get("description"),
+        "assetCategory": a.get("assetCategory"),
+        "currency": a.get("currency"),
+        "tradeTime": parse_flex_datetime(a.get("dateTime") or a.get("tradeDate")),
+        "quantity": _as_float(a.get("quantity") or "0"),
+        "price": _as_float(a.get("tradePrice") or "0"),
+        "proceeds": _as_float(a.get("proceeds") or "0"),
+        "commission": _as_float(a.get("ibCommission") or "0"),
+        "buySell": a.get("buySell"),
+        "realizedPnl": _as_float(a.get("fifoPnlRealized") or "0"),
+    }
+
+
+def _cash_transaction_record(a: Dict[str, str]) -> Dict[str, Any]:
+    return {
+        "accountId": a.get("accountId") or "",
+        "transactionId": a.get("transactionID") or "",
+        "type": a.get("type") or "",
+        "currency": a.get("currency"),
+        "amount": _as_float(a.get("amount") or "0"),
+        "dateTime": parse_flex_datetime(a.get("dateTime") or a.get("settleDate")),
+        "description": a.get("description"),
+    }
+
+
+def _cash_report_record(a: Dict[str, str]) -> Dict[str, Any]:
+    return {"currency": a.get("currency"), "endingCash": _as_float(a.get("endingCash") or "0")}
+
+
+# Flex element -> (record kind, attribute mapper)
+FLEX_RECORDS = {
+    "OpenPosition": ("position", _position_record),
+    "Trade": ("trade", _trade_record),
+    "CashTransaction": ("cash_transaction", _cash_transaction_record),
+    "CashReportCurrency": ("cash_report", _cash_report_record),
+}
+
+
+def iter_statement(source) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Stream records from a Flex statement in document order
+    
+    Elements are cleared as soon as they are emitted, so memory stays flat
+    however many rows the statement holds.
+    
+    Args:
+        source: XML text or bytes, a file path, or a binary file object
+    
+    Yields:
+        ("statement", {accountId, whenGenerated, fromDate, toDate}) at each
+        FlexStatement, then ("position" | "trade" | "cash_transaction" |
+        "cash_report", record) for its rows
+    """
+    if isinstance(source, str) and source.lstrip().startswith("<"):
+        source = io.StringIO(source)
+    elif isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    
+    parents: List[ET.Element] = []
+    for event, elem in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            if elem.tag == "FlexStatement":
+                yield "statement", {
+                    "accountId": elem.get("accountId") or "",
+                    "whenGenerated": elem.get("whenGenerated") or "",
+                    "fromDate": elem.get("fromDate"),
+                    "toDate": elem.get("toDate"),
+                }
+            parents.append(elem)
+            continue
+        
+        parents.pop()
+        record = FLEX_RECORDS.get(elem.tag)
+        # Trades sections may also carry order/lot summary rows
+        if record and (elem.tag != "Trade" or elem.get("levelOfDetail", "EXECUTION") == "EXECUTION"):
+            kind, mapper = record
+            yield kind, mapper(elem.attrib)
+        if len(parents) >= 2 and parents[-2].tag == "FlexStatement":
+            # A finished section row: drop it (and earlier rows) so the tree never grows
+            parents[-1].clear()
+        elif parents and parents[-1].tag == "FlexStatement":
+            elem.clear()
+
+
+def _iter_kind(source, kind: str) -> Iterator[Dict[str, Any]]:
+    return (record for record_kind, record in iter_statement(source) if record_kind == kind)
+
+
+def iter_positions(source) -> Iterator[Dict[str, Any]]:
+    """Stream OpenPosition records from a Flex statement"""
+    return _iter_kind(source, "position")
+
+
+def iter_trades(source) -> Iterator[Dict[str, Any]]:
+    """Stream execution-level Trade records from a Flex statement"""
+    return _iter_kind(source, "trade")
+
+
+def iter_cash_transactions(source) -> Iterator[Dict[str, Any]]:
+    """Stream CashTransaction records from a Flex statement"""
+    return _iter_kind(source, "cash_transaction")
+
+
+def parse_payload(source) -> Dict[str, Any]:
+    """
+    Streaming equivalent of parse_minimal_payload
+    
+    Args:
+        source: Statement XML text/bytes, path or file object
+    """
+    account_id, as_of, found = "", "", False
+    cash, positions, total_base = {}, [], 0.0
+    for kind, record in iter_statement(source):
+        if kind == "statement" and not found:
+            account_id, as_of, found = record["accountId"], record["whenGenerated"], True
+        elif kind == "cash_report" and record["currency"]:
+            cash[record["currency"]] = record["endingCash"]
+        elif kind == "position":
+            record.pop("accountId")
+            total_base += record["valueBase"]
+            positions.append(record)
+    if not found:
+        raise IbkrFlexError("No FlexStatement in response")
+    
+    return {
+        "broker": "ibkr",
+        "accountId": account_id,
+        "baseCurrency": "BASE",
+        "asOf": as_of,
+        "cashByCcy": cash,
+        "currencies": list(cash.keys()),
+        "portfolio": {"positions": positions, "totalValue": total_base},
+        "positionsImported": len(positions),
+        "_digest": compute_statement_digest(account_id, as_of, len(positions)),
+    }
+
+
+def statement_summary(source) -> Dict[str, Any]:
+    """
+    Digest inputs of a statement: first accountId and whenGenerated, and position count
+    
+    Args:
+        source: Statement XML text/bytes, path or file object
+    """
+    summary, found = {"accountId": "", "whenGenerated": "", "positions": 0}, False
+    for kind, record in iter_statement(source):
+        if kind == "statement" and not found:
+            summary["accountId"], summary["whenGenerated"], found = record["accountId"], record["whenGenerated"], True
+        elif kind == "position":
+            summary["positions"] += 1
+    if not found:
+        raise IbkrFlexError("No FlexStatement in response")
+    return summary
+
+
+async def get_ibkr_portfolio_payload(credentials: Optional[FlexCredentials] = None):
     """
     Main entry point: Fetch and parse IBKR Flex portfolio data
     
+    Args:
+        credentials: Account credentials; defaults to the IBKR_FLEX_* environment
+    
     Returns:
         Normalized portfolio dict with positions and cash
     """
-    xml_root = await fetch_statement_xml()
-    return parse_minimal_payload(xml_root)
+    statement = await fetch_statement(credentials)
+    return parse_payload(get_statement_cache().source(statement))
@@ -5,11 +5,19 @@ Unifies IBKR Flex, KuCoin, and CSV imports into normalized portfolio_positions a
 import hashlib
 from typing import Dict, Any, List
 from datetime import datetime
+from sqlalchemy import text
 from server.services import ibkr_flex_service
 from server.services.kucoin_service import KuCoinService
 from server.db.qmark import qmark
+from server.db.bulk import copy_rows, staged_rows
 from server.utils.observability import log_import_operation
 
+IBKR_POSITION_COLUMNS = (
+    "userId", "symbol", "name", "quantity", "avgCost", "currentPrice", "account", "currency", "asOf"
+)
+KUCOIN_POSITION_COLUMNS = ("userId", "symbol", "quantity", "account", "asOf")
+CASH_EVENT_COLUMNS = ("userId", "eventType", "amount", "currency", "eventDate", "source", "accountId")
+
 
 def compute_batch_digest(user_id: int, source: str, positions: List[Dict], timestamp: str) -> str:
     """Compute digest for idempotency checking"""
@@ -25,7 +33,9 @@ async def ingest_ibkr(user_id: int, db) -> dict:
         Dict with imported counts and import_id
     """
     with log_import_operation("ibkr", user_id) as log_ctx:
-        payload = await ibkr_flex_service.get_ibkr_portfolio_payload()
+        payload = await ibkr_flex_service.get_ibkr_portfolio_payload(
+            ibkr_flex_service.user_credentials(db, user_id)
+        )
         
         digest = compute_batch_digest(
             user_id, 
@@ -45,21 +55,9 @@ async def ingest_ibkr(user_id: int, db) -> dict:
             return {"imported": 0, "duplicate": True, "message": "Already imported"}
         
         import_id = f"ibkr_{user_id}_{int(datetime.now().timestamp())}"
-        positions_imported = 0
-        cash_events_imported = 0
-        
-        for pos in payload["portfolio"]["positions"]:
-            stmt, params = qmark("""
-                INSERT INTO portfolio_positions 
-                (userId, symbol, name, quantity, avgCost, currentPrice, assetClass, 
-                 account, currency, source, asOf)
-                VALUES (?, ?, ?, ?, ?, ?, 'equity', ?, ?, 'ibkr', ?)
-                ON CONFLICT (userId, symbol, account) 
-                DO UPDATE SET 
-                    quantity = EXCLUDED.quantity,
-                    currentPrice = EXCLUDED.currentPrice,
-                    lastUpdated = CURRENT_TIMESTAMP
-            """, (
+        # Last row wins per symbol, as with row-by-row upserts
+        positions = {
+            pos["symbol"]: (
                 user_id,
                 pos["symbol"],
                 pos.get("description", ""),
@@ -69,25 +67,31 @@ async def ingest_ibkr(user_id: int, db) -> dict:
                 payload["accountId"],
                 pos.get("currency", "USD"),
                 payload["asOf"]
-            ))
-            db.execute(stmt, params)
-            positions_imported += 1
+            )
+            for pos in payload["portfolio"]["positions"]
+        }
+        with staged_rows(db, "portfolio_positions", IBKR_POSITION_COLUMNS, positions.values()) as staged:
+            db.execute(text(f"""
+                INSERT INTO portfolio_positions
+                (userId, symbol, name, quantity, avgCost, currentPrice, assetClass,
+                 account, currency, source, asOf)
+                SELECT userId, symbol, name, quantity, avgCost, currentPrice, 'equity',
+                       account, currency, 'ibkr', asOf
+                FROM {staged}
+                WHERE true  -- lets SQLite parse ON CONFLICT after a SELECT
+                ON CONFLICT (userId, symbol, account)
+                DO UPDATE SET
+                    quantity = EXCLUDED.quantity,
+                    currentPrice = EXCLUDED.currentPrice,
+                    lastUpdated = CURRENT_TIMESTAMP
+            """))
+        positions_imported = len(payload["portfolio"]["positions"])
         
-        for currency, amount in payload["cashByCcy"].items():
-            if amount != 0:
-                stmt, params = qmark("""
-                    INSERT INTO cash_events 
-                    (userId, eventType, amount, currency, eventDate, source, accountId)
-                    VALUES (?, 'deposit', ?, ?, ?, 'ibkr', ?)
-                """, (
-                    user_id,
-                    amount,
-                    currency,
-                    payload["asOf"],
-                    payload["accountId"]
-                ))
-                db.execute(stmt, params)
-                cash_events_imported += 1
+        cash_events_imported = copy_rows(db, "cash_events", CASH_EVENT_COLUMNS, [
+            (user_id, "deposit", amount, currency, payload["asOf"], "ibkr", payload["accountId"])
+            for currency, amount in payload["cashByCcy"].items()
+            if amount != 0
+        ])
         
         stmt, params = qmark("""
             INSERT INTO import_digests (userId, source, digest, metadata)
@@ -121,41 +125,34 @@ async def ingest_kucoin(user_id: int, db) -> dict:
             return {"error": result["error"]}
         
         import_id = f"kucoin_{user_id}_{int(datetime.now().timestamp())}"
-        positions_imported = 0
-        cash_events_imported = 0
-        
-        for holding in result["holdings"]:
-            stmt, params = qmark("""
-                INSERT INTO portfolio_positions 
-                (userId, symbol, quantity, currentPrice, assetClass, account, source, asOf)
-                VALUES (?, ?, ?, 0, 'crypto', ?, 'kucoin', ?)
-                ON CONFLICT (userId, symbol, account) 
-                DO UPDATE SET 
-                    quantity = EXCLUDED.quantity,
-                    lastUpdated = CURRENT_TIMESTAMP
-            """, (
+        holdings = {
+            (holding["symbol"], holding["accountType"]): (
                 user_id,
                 holding["symbol"],
                 holding["quantity"],
                 holding["accountType"],
                 result["asOf"]
-            ))
-            db.execute(stmt, params)
-            positions_imported += 1
+            )
+            for holding in result["holdings"]
+        }
+        with staged_rows(db, "portfolio_positions", KUCOIN_POSITION_COLUMNS, holdings.values()) as staged:
+            db.execute(text(f"""
+                INSERT INTO portfolio_positions
+                (userId, symbol, quantity, currentPrice, assetClass, account, source, asOf)
+                SELECT userId, symbol, quantity, 0, 'crypto', account, 'kucoin', asOf
+                FROM {staged}
+                WHERE true
+                ON CONFLICT (userId, symbol, account)
+                DO UPDATE SET
+                    quantity = EXCLUDED.quantity,
+                    lastUpdated = CURRENT_TIMESTAMP
+            """))
+        positions_imported = len(result["holdings"])
         
-        for currency_key, amount in result["cashBalances"].items():
-            stmt, params = qmark("""
-                INSERT INTO cash_events 
-                (userId, eventType, amount, currency, eventDate, source)
-                VALUES (?, 'deposit', ?, ?, ?, 'kucoin')
-            """, (
-                user_id,
-                amount,
-                currency_key.split('_')[0],
-                result["asOf"]
-            ))
-            db.execute(stmt, params)
-            cash_events_imported += 1
+        cash_events_imported = copy_rows(db, "cash_events", CASH_EVENT_COLUMNS, [
+            (user_id, "deposit", amount, currency_key.split('_')[0], result["asOf"], "kucoin", None)
+            for currency_key, amount in result["cashBalances"].items()
+        ])
         
         db.commit()
         
@@ -1,25 +1,61 @@
 """
 Ingest Pipeline Service
-Orchestrates data source adapters → staging tables with idempotency via federation_import_digests
+Orchestrates data source adapters → staging tables with idempotency via federation_import_digests.
+Positions are diffed per row against each source's last accepted snapshot
+(source_position_snapshots), so only inserted, changed and removed rows are
+staged and reconciled. Snapshots advance when reconciliation commits the
+staged rows, so a run that fails before then is restaged on the next sync.
 """
 
 import os
+import asyncio
 import logging
 import hashlib
 import json
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, sessionmaker
 from uuid import uuid4
 
+from server.db.bulk import copy_rows
+from server.db.qmark import qmark, qmark_many
 from server.services.federation_registry import list_sources
 
 logger = logging.getLogger(__name__)
 
-SYNC_MAX_CONCURRENCY = int(os.getenv("SYNC_MAX_CONCURRENCY", "1"))
+# Sources ingested in parallel within one sync run
+SYNC_MAX_CONCURRENCY = max(1, int(os.getenv("SYNC_MAX_CONCURRENCY", "4")))
 SYNC_DEDUP_WINDOW_SEC = int(os.getenv("SYNC_DEDUP_WINDOW_SEC", "86400"))
 
+STAGING_COLUMNS = (
+    "sync_run_id", "user_id", "source_id", "account", "symbol",
+    "quantity", "avg_cost", "currency", "as_of", "meta", "change_type", "fingerprint"
+)
+TRADE_STAGING_COLUMNS = (
+    "sync_run_id", "user_id", "source_id", "account", "trade_id", "symbol", "asset_category", "currency",
+    "trade_time", "quantity", "price", "proceeds", "commission", "buy_sell", "realized_pnl", "meta"
+)
+CASH_STAGING_COLUMNS = (
+    "sync_run_id", "user_id", "source_id", "event_type", "amount", "currency",
+    "event_date", "account_id", "description", "transaction_id", "meta"
+)
+# Rows buffered per table before each COPY while streaming a statement
+FLEX_STAGE_BATCH_ROWS = int(os.getenv("FLEX_STAGE_BATCH_ROWS", "5000"))
+
+# Flex CashTransaction types that map onto cash events (None: sign decides)
+FLEX_CASH_EVENT_TYPES = {
+    "Deposits/Withdrawals": None,
+    "Deposits & Withdrawals": None,
+    "Broker Interest Received": "interest",
+    "Broker Interest Paid": "interest",
+    "Bond Interest Received": "interest",
+    "Dividends": "dividend",
+    "Payment In Lieu Of Dividends": "dividend",
+}
+
+WATERMARK_FIELDS = ("last_trade_id", "last_trade_at", "last_cash_at")
+
 
 def compute_content_hash(data: Any) -> str:
     """Compute SHA256 hash of normalized data for idempotency"""
@@ -56,6 +92,229 @@ async def check_duplicate_digest(
     return result.fetchone() is not None
 
 
+def position_fingerprint(row: Dict[str, Any]) -> str:
+    """Hash of the fields that matter for reconciliation (as_of excluded, it moves every pull)"""
+    return compute_content_hash([
+        row["account"],
+        row["symbol"],
+        float(row["quantity"] or 0),
+        float(row["avg_cost"] or 0),
+        row["currency"],
+        row["meta"],
+    ])
+
+
+def load_snapshot(db: Session, source_id: int) -> Dict[tuple, str]:
+    """Last accepted (account, symbol) -> fingerprint for a source"""
+    stmt, params = qmark("""
+        SELECT account, symbol, fingerprint FROM source_position_snapshots
+        WHERE source_id = ?
+    """, (source_id,))
+    return {(row[0], row[1]): row[2] for row in db.execute(stmt, params).all()}
+
+
+def stage_position_delta(
+    db: Session,
+    sync_run_id: str,
+    user_id: int,
+    source_id: int,
+    rows: List[Dict[str, Any]]
+) -> Dict[str, int]:
+    """
+    Stage only the positions that differ from the source's last snapshot
+
+    Inserted and changed rows are staged as upserts (with their fingerprint)
+    and rows missing from the payload as deletes. The snapshot is left as is;
+    reconcile_positions advances it with the canonical rows.
+
+    Returns:
+        Counts of inserted, changed, removed and unchanged rows
+    """
+    previous = load_snapshot(db, source_id)
+    # Last row wins if a payload repeats an (account, symbol)
+    current = {(row["account"], row["symbol"]): row for row in rows}
+
+    upserts, counts = [], {"inserted": 0, "changed": 0, "removed": 0, "unchanged": 0}
+    for key, row in current.items():
+        fingerprint = position_fingerprint(row)
+        if key not in previous:
+            counts["inserted"] += 1
+        elif previous[key] != fingerprint:
+            counts["changed"] += 1
+        else:
+            counts["unchanged"] += 1
+            continue
+        upserts.append((row, fingerprint))
+    removed = [key for key in previous if key not in current]
+    counts["removed"] = len(removed)
+
+    staged = [
+        (sync_run_id, user_id, source_id, row["account"], row["symbol"], row["quantity"],
+         row["avg_cost"], row["currency"], row["as_of"], row["meta"], "upsert", fingerprint)
+        for row, fingerprint in upserts
+    ] + [
+        (sync_run_id, user_id, source_id, account, symbol, 0, None, None, None, "{}", "delete", None)
+        for account, symbol in removed
+    ]
+    copy_rows(db, "positions_staging", STAGING_COLUMNS, staged)
+    return counts
+
+
+def _delta_result(counts: Dict[str, int], staged: int = 0) -> Dict[str, Any]:
+    if not (counts["inserted"] or counts["changed"] or counts["removed"] or staged):
+        return {"skipped": True, "reason": "unchanged", **counts}
+    return {"imported": counts["inserted"] + counts["changed"], **counts}
+
+
+def _as_datetime(value: Any) -> Optional[datetime]:
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+def load_watermark(db: Session, source_id: int) -> Dict[str, Any]:
+    """Last imported trade (ID and time) and cash transaction date for a source"""
+    stmt, params = qmark("""
+        SELECT last_trade_id, last_trade_at, last_cash_at FROM data_sources
+        WHERE id = ?
+    """, (source_id,))
+    row = db.execute(stmt, params).fetchone()
+    if row is None:
+        return dict.fromkeys(WATERMARK_FIELDS)
+    return {"last_trade_id": row[0], "last_trade_at": _as_datetime(row[1]), "last_cash_at": _as_datetime(row[2])}
+
+
+def save_watermark(db: Session, source_id: int, watermark: Dict[str, Any]) -> None:
+    """Store a source's watermark (in the caller's transaction)"""
+    stmt, params = qmark("""
+        UPDATE data_sources
+        SET last_trade_id = ?, last_trade_at = ?, last_cash_at = ?
+        WHERE id = ?
+    """, (*(watermark[f] for f in WATERMARK_FIELDS), source_id))
+    db.execute(stmt, params)
+
+
+def watermark_from_date(watermark: Dict[str, Any]):
+    """
+    First date to request, or None for the full statement
+    
+    Both sections need a watermark; the boundary day is re-read and
+    filtered by stage_flex_statement.
+    """
+    if watermark["last_trade_at"] is None or watermark["last_cash_at"] is None:
+        return None
+    return min(watermark["last_trade_at"], watermark["last_cash_at"]).date()
+
+
+def _trade_key(trade_at: datetime, trade_id: Optional[str]) -> tuple:
+    # IBKR trade IDs are numeric strings; compare by length first so "10" > "9"
+    trade_id = trade_id or ""
+    return (trade_at, len(trade_id), trade_id)
+
+
+def _cash_event_type(record: Dict[str, Any]) -> Optional[str]:
+    if record["type"] not in FLEX_CASH_EVENT_TYPES:
+        return None
+    return FLEX_CASH_EVENT_TYPES[record["type"]] or ("deposit" if record["amount"] >= 0 else "withdrawal")
+
+
+def stage_flex_statement(
+    db: Session,
+    sync_run_id: str,
+    user_id: int,
+    source_id: int,
+    source: Any,
+    watermark: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Stream a Flex statement into staging in one pass
+    
+    Trades and cash transactions are copied to trades_staging and
+    cash_events_staging in batches of FLEX_STAGE_BATCH_ROWS; positions are
+    returned for delta staging. With a watermark, only trades after the last
+    imported one and cash transactions from the last imported date on are
+    staged (the boundary day's cash is de-duplicated on reconciliation by
+    its Flex transactionID).
+    The watermark advances to the newest staged records, or to the start of
+    the statement's toDate when nothing newer was seen.
+    
+    Returns:
+        accountId, whenGenerated, positions, trades and cash_events counts,
+        and the advanced watermark
+    """
+    from server.services.ibkr_flex_service import iter_statement, parse_flex_datetime
+    
+    watermark = dict(watermark or dict.fromkeys(WATERMARK_FIELDS))
+    last_trade = (
+        _trade_key(watermark["last_trade_at"], watermark["last_trade_id"])
+        if watermark["last_trade_at"] is not None else None
+    )
+    newest_trade = last_trade
+    last_cash_at = watermark["last_cash_at"]
+    covered = None
+    statement = {
+        "accountId": "", "whenGenerated": "", "positions": [], "trades": 0, "cash_events": 0,
+        "watermark": watermark
+    }
+    trades, cash_events = [], []
+    
+    def flush():
+        statement["trades"] += copy_rows(db, "trades_staging", TRADE_STAGING_COLUMNS, trades)
+        statement["cash_events"] += copy_rows(db, "cash_events_staging", CASH_STAGING_COLUMNS, cash_events)
+        trades.clear()
+        cash_events.clear()
+    
+    for kind, record in iter_statement(source):
+        if kind == "statement":
+            if not statement["accountId"]:
+                statement["accountId"] = record["accountId"]
+                statement["whenGenerated"] = record["whenGenerated"]
+                covered = parse_flex_datetime(record["toDate"])
+        elif kind == "position":
+            statement["positions"].append(record)
+        elif kind == "trade":
+            if record["tradeTime"] is None:
+                if last_trade is not None:
+                    continue
+            else:
+                key = _trade_key(record["tradeTime"], record["tradeId"])
+                if last_trade is not None and key <= last_trade:
+                    continue
+                if newest_trade is None or key > newest_trade:
+                    newest_trade = key
+                    watermark["last_trade_at"], watermark["last_trade_id"] = record["tradeTime"], record["tradeId"]
+            trades.append((
+                sync_run_id, user_id, source_id, record["accountId"], record["tradeId"], record["symbol"],
+                record["assetCategory"], record["currency"], record["tradeTime"], record["quantity"],
+                record["price"], record["proceeds"], record["commission"], record["buySell"],
+                record["realizedPnl"], json.dumps({"description": record["description"]})
+            ))
+        elif kind == "cash_transaction":
+            event_type = _cash_event_type(record)
+            if event_type and record["dateTime"] is not None:
+                if last_cash_at is not None and record["dateTime"] < last_cash_at:
+                    continue
+                if watermark["last_cash_at"] is None or record["dateTime"] > watermark["last_cash_at"]:
+                    watermark["last_cash_at"] = record["dateTime"]
+                cash_events.append((
+                    sync_run_id, user_id, source_id, event_type, record["amount"], record["currency"] or "USD",
+                    record["dateTime"], record["accountId"], record["description"], record["transactionId"] or None,
+                    json.dumps({"transactionId": record["transactionId"], "type": record["type"]})
+                ))
+        if len(trades) >= FLEX_STAGE_BATCH_ROWS or len(cash_events) >= FLEX_STAGE_BATCH_ROWS:
+            flush()
+    flush()
+    
+    # Nothing newer up to the start of the statement's last day: move the
+    # watermark there so idle accounts don't keep re-requesting old periods
+    if covered is not None:
+        if newest_trade is None or newest_trade < _trade_key(covered, ""):
+            watermark["last_trade_at"], watermark["last_trade_id"] = covered, ""
+        if watermark["last_cash_at"] is None or watermark["last_cash_at"] < covered:
+            watermark["last_cash_at"] = covered
+    return statement
+
+
 async def start_sync(db: Session, user_id: int, trigger: str = "api") -> str:
     """
     Start sync run for user
@@ -69,7 +328,7 @@ async def start_sync(db: Session, user_id: int, trigger: str = "api") -> str:
         sync_run_id (UUID string)
         
     Raises:
-        RuntimeError: If concurrent sync already running
+        RuntimeError: If a sync is already running for the user
     """
     running = db.execute(
         text("""
@@ -81,7 +340,7 @@ async def start_sync(db: Session, user_id: int, trigger: str = "api") -> str:
         {"user_id": user_id}
     ).fetchone()
     
-    if running and SYNC_MAX_CONCURRENCY == 1:
+    if running:
         raise RuntimeError(f"Sync already running for user {user_id}")
     
     sync_run_id = str(uuid4())
@@ -106,18 +365,28 @@ async def ingest_ibkr_source(
 ) -> Dict[str, Any]:
     """Ingest IBKR Flex data"""
     try:
-        from server.services.ibkr_flex_service import get_ibkr_portfolio_payload
-        
-        os.environ["IBKR_FLEX_TOKEN"] = config.get("flex_token", "")
-        os.environ["IBKR_FLEX_QUERY_ID"] = config.get("flex_query_id", "")
+        from server.services.flex_statement_cache import get_statement_cache
+        from server.services.ibkr_flex_service import (
+            FlexCredentials,
+            fetch_statement,
+            parse_flex_datetime,
+            statement_digest,
+        )
         
-        payload = await get_ibkr_portfolio_payload()
+        watermark = load_watermark(db, source_id)
+        cached = await fetch_statement(FlexCredentials.from_config(config), watermark_from_date(watermark))
         
-        content_hash = payload.get("_digest") or compute_content_hash(payload["portfolio"]["positions"])
+        # Decided from the cache index alone: an already-imported statement is never parsed
+        content_hash = statement_digest(cached)
         if await check_duplicate_digest(db, user_id, source_id, content_hash, "positions"):
             logger.info(f"Skipping duplicate IBKR import: {content_hash[:8]}")
             return {"skipped": True, "reason": "duplicate"}
         
+        statement = stage_flex_statement(
+            db, sync_run_id, user_id, source_id, get_statement_cache().source(cached), watermark
+        )
+        positions = statement["positions"]
+        
         db.execute(
             text("""
                 INSERT INTO federation_import_digests (sync_run_id, user_id, source_id, content_hash, entity_scope)
@@ -131,30 +400,25 @@ async def ingest_ibkr_source(
             }
         )
         
-        positions = payload["portfolio"]["positions"]
-        for pos in positions:
-            db.execute(
-                text("""
-                    INSERT INTO positions_staging 
-                    (sync_run_id, user_id, source_id, account, symbol, quantity, avg_cost, currency, as_of, meta)
-                    VALUES (:sync_run_id, :user_id, :source_id, :account, :symbol, :quantity, :avg_cost, :currency, :as_of, :meta)
-                """),
-                {
-                    "sync_run_id": sync_run_id,
-                    "user_id": user_id,
-                    "source_id": source_id,
-                    "account": payload.get("accountId", ""),
-                    "symbol": pos["symbol"],
-                    "quantity": pos["quantity"],
-                    "avg_cost": pos.get("markPrice", 0),
-                    "currency": pos.get("currency", "USD"),
-                    "as_of": payload.get("asOf"),
-                    "meta": json.dumps({"description": pos.get("description", "")})
-                }
-            )
+        as_of = parse_flex_datetime(statement["whenGenerated"])
+        counts = stage_position_delta(db, sync_run_id, user_id, source_id, [
+            {
+                "account": pos["accountId"] or statement["accountId"],
+                "symbol": pos["symbol"],
+                "quantity": pos["quantity"],
+                "avg_cost": pos["markPrice"],
+                "currency": pos["currency"] or "USD",
+                "as_of": as_of,
+                "meta": json.dumps({"description": pos["description"] or ""})
+            }
+            for pos in positions
+        ])
+        save_watermark(db, source_id, statement["watermark"])
         
         db.commit()
-        return {"imported": len(positions)}
+        result = _delta_result(counts, statement["trades"] + statement["cash_events"])
+        result.update(trades_staged=statement["trades"], cash_events_staged=statement["cash_events"])
+        return result
         
     except Exception as e:
         logger.error(f"IBKR import failed: {e}")
@@ -203,39 +467,78 @@ async def ingest_kucoin_source(
             }
         )
         
-        for holding in holdings:
-            db.execute(
-                text("""
-                    INSERT INTO positions_staging
-                    (sync_run_id, user_id, source_id, account, symbol, quantity, avg_cost, currency, as_of, meta)
-                    VALUES (:sync_run_id, :user_id, :source_id, :account, :symbol, :quantity, :avg_cost, :currency, :as_of, :meta)
-                """),
-                {
-                    "sync_run_id": sync_run_id,
-                    "user_id": user_id,
-                    "source_id": source_id,
-                    "account": holding.get("accountType", "trade"),
-                    "symbol": holding["symbol"],
-                    "quantity": holding["quantity"],
-                    "avg_cost": 0,
-                    "currency": "USD",
-                    "as_of": data.get("asOf"),
-                    "meta": json.dumps({"available": holding.get("available", 0)})
-                }
-            )
+        counts = stage_position_delta(db, sync_run_id, user_id, source_id, [
+            {
+                "account": holding.get("accountType", "trade"),
+                "symbol": holding["symbol"],
+                "quantity": holding["quantity"],
+                "avg_cost": 0,
+                "currency": "USD",
+                "as_of": data.get("asOf"),
+                "meta": json.dumps({"available": holding.get("available", 0)})
+            }
+            for holding in holdings
+        ])
         
         db.commit()
-        return {"imported": len(holdings)}
+        return _delta_result(counts)
         
     except Exception as e:
         logger.error(f"KuCoin import failed: {e}")
         return {"error": str(e)}
 
 
+def _source_session(db: Session) -> Session:
+    """Independent session on the same engine, so each source commits or rolls back on its own"""
+    return sessionmaker(bind=db.get_bind(), autocommit=False, autoflush=False)()
+
+
+async def _run_source(
+    db: Session,
+    semaphore: asyncio.Semaphore,
+    sync_run_id: str,
+    user_id: int,
+    source: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """
+    Ingest one source in its own session under the concurrency limit
+
+    Returns None for source types that are not synced
+    """
+    source_type = source["source_type"]
+    source_id = source["id"]
+    config = source.get("config", {})
+
+    if source_type == "ibkr_flex":
+        ingest = ingest_ibkr_source
+    elif source_type == "kucoin":
+        ingest = ingest_kucoin_source
+    elif source_type in ("csv", "manual"):
+        return None
+    else:
+        logger.warning(f"Unknown source type: {source_type}")
+        return None
+
+    async with semaphore:
+        source_db = _source_session(db)
+        try:
+            return await ingest(source_db, sync_run_id, user_id, source_id, config)
+        except Exception as e:
+            source_db.rollback()
+            logger.error(f"Source {source_id} failed: {e}")
+            return {"error": str(e)}
+        finally:
+            source_db.close()
+
+
 async def run_full_sync(db: Session, user_id: int, trigger: str = "api") -> Dict[str, Any]:
     """
     Run full sync for all enabled sources
-    
+
+    Sources run concurrently (at most SYNC_MAX_CONCURRENCY at a time), each
+    with its own DB session, so one slow or failing source does not hold up
+    or roll back the others.
+
     Returns sync_run summary with stats
     """
     try:
@@ -249,40 +552,28 @@ async def run_full_sync(db: Session, user_id: int, trigger: str = "api") -> Dict
             "sources_skipped": 0,
             "sources_failed": 0,
             "positions_imported": 0,
+            "positions_removed": 0,
             "errors": []
         }
         
-        for source in enabled_sources:
-            source_type = source["source_type"]
-            source_id = source["id"]
-            config = source.get("config", {})
-            
-            try:
-                if source_type == "ibkr_flex":
-                    result = await ingest_ibkr_source(db, sync_run_id, user_id, source_id, config)
-                elif source_type == "kucoin":
-                    result = await ingest_kucoin_source(db, sync_run_id, user_id, source_id, config)
-                elif source_type == "csv":
-                    continue
-                elif source_type == "manual":
-                    continue
-                else:
-                    logger.warning(f"Unknown source type: {source_type}")
-                    continue
-                
-                if result.get("error"):
-                    stats["sources_failed"] += 1
-                    stats["errors"].append(f"{source_type}: {result['error']}")
-                elif result.get("skipped"):
-                    stats["sources_skipped"] += 1
-                else:
-                    stats["sources_processed"] += 1
-                    stats["positions_imported"] += result.get("imported", 0)
-                    
-            except Exception as e:
+        semaphore = asyncio.Semaphore(SYNC_MAX_CONCURRENCY)
+        results = await asyncio.gather(*[
+            _run_source(db, semaphore, sync_run_id, user_id, source)
+            for source in enabled_sources
+        ])
+        
+        for source, result in zip(enabled_sources, results):
+            if result is None:
+                continue
+            if result.get("error"):
                 stats["sources_failed"] += 1
-                stats["errors"].append(f"{source_type}: {str(e)}")
-                logger.error(f"Source {source_id} failed: {e}")
+                stats["errors"].append(f"{source['source_type']}: {result['error']}")
+            elif result.get("skipped"):
+                stats["sources_skipped"] += 1
+            else:
+                stats["sources_processed"] += 1
+                stats["positions_imported"] += result.get("imported", 0)
+                stats["positions_removed"] += result.get("removed", 0)
         
         status = "completed" if stats["sources_failed"] == 0 else "partial"
         db.execute(
@@ -11,6 +11,10 @@ from sqlalchemy.orm import Session
 
 logger = logging.getLogger(__name__)
 
+SNAPSHOT_COLUMNS = (
+    "source_id", "user_id", "account", "symbol", "quantity", "avg_cost", "currency", "as_of", "fingerprint"
+)
+
 SOURCE_CONFIDENCE = {
     "ibkr_flex": 4,
     "kucoin": 3,
@@ -19,10 +23,91 @@ SOURCE_CONFIDENCE = {
 }
 
 
+def _other_source_candidates(db: Session, user_id: int, staged: List[Any]) -> List[Any]:
+    """
+    Current snapshot rows for the staged symbols from sources not staged in this run
+
+    With delta ingest an unchanged source stages nothing, so its last accepted
+    values still compete for symbols another source touched. Rows are
+    matched per (source, account, symbol): a source's other accounts holding
+    a staged symbol still count.
+    """
+    symbols = sorted({p.symbol for p in staged})
+    if not symbols:
+        return []
+    staged_keys = {(p.source_id, getattr(p, "account", None), p.symbol) for p in staged}
+    placeholders = ", ".join(f":s{i}" for i in range(len(symbols)))
+    rows = db.execute(
+        text(f"""
+            SELECT sps.source_id, sps.account, sps.symbol, sps.quantity, sps.avg_cost,
+                   sps.as_of, ds.source_type, ds.priority
+            FROM source_position_snapshots sps
+            JOIN data_sources ds ON sps.source_id = ds.id
+            WHERE sps.user_id = :user_id
+              AND sps.symbol IN ({placeholders})
+        """),
+        {"user_id": user_id, **{f"s{i}": symbol for i, symbol in enumerate(symbols)}}
+    )
+    return [row for row in rows if (row.source_id, row.account, row.symbol) not in staged_keys]
+
+
+def advance_snapshots(db: Session, sync_run_id: str, user_id: int) -> None:
+    """
+    Move each staged source's snapshot to this run's payload
+
+    Runs in the reconcile transaction, so the snapshot only reflects changes
+    that reached the canonical table; if reconcile fails, the next sync
+    diffs against the old snapshot and stages the changes again.
+    """
+    columns = ", ".join(SNAPSHOT_COLUMNS)
+    # Snapshot accounts are NOT NULL (default ''); staging allows NULL
+    values = columns.replace("account", "COALESCE(account, '')", 1)
+    params = {"sync_run_id": sync_run_id, "user_id": user_id}
+    db.execute(
+        text(f"""
+            INSERT INTO source_position_snapshots ({columns})
+            SELECT {values} FROM positions_staging
+            WHERE sync_run_id = :sync_run_id AND user_id = :user_id AND change_type = 'upsert'
+            ON CONFLICT (source_id, account, symbol)
+            DO UPDATE SET
+                quantity = EXCLUDED.quantity,
+                avg_cost = EXCLUDED.avg_cost,
+                currency = EXCLUDED.currency,
+                as_of = EXCLUDED.as_of,
+                fingerprint = EXCLUDED.fingerprint
+        """),
+        params
+    )
+    db.execute(
+        text("""
+            DELETE FROM source_position_snapshots
+            WHERE EXISTS (
+                SELECT 1 FROM positions_staging ps
+                WHERE ps.sync_run_id = :sync_run_id AND ps.user_id = :user_id AND ps.change_type = 'delete'
+                  AND ps.source_id = source_position_snapshots.source_id
+                  AND COALESCE(ps.account, '') = source_position_snapshots.account
+                  AND ps.symbol = source_position_snapshots.symbol
+            )
+        """),
+        params
+    )
+
+
+def _rank(positions: List[Any]) -> List[Any]:
+    """Priority ascending, then newest as_of first (missing as_of last)"""
+    dated = sorted((p for p in positions if p.as_of is not None), key=lambda p: p.as_of, reverse=True)
+    undated = [p for p in positions if p.as_of is None]
+    return sorted(dated + undated, key=lambda p: p.priority)
+
+
 def reconcile_positions(db: Session, sync_run_id: str, user_id: int) -> Dict[str, Any]:
     """
     Reconcile positions from staging to canonical table
     
+    Only symbols staged in this run are touched. Their candidates are the
+    staged upserts plus other sources' snapshot rows; staged deletes drop a
+    source out, and a symbol with no candidates left is removed.
+    
     Rules (in order):
     1. Priority (lower number = higher priority)
     2. Freshness (newer as_of timestamp)
@@ -33,6 +118,7 @@ def reconcile_positions(db: Session, sync_run_id: str, user_id: int) -> Dict[str
     summary = {
         "inserted": 0,
         "updated": 0,
+        "removed": 0,
         "skipped": 0,
         "conflicts": []
     }
@@ -51,14 +137,34 @@ def reconcile_positions(db: Session, sync_run_id: str, user_id: int) -> Dict[str
     
     staging_positions = list(staging_result)
     
-    by_symbol = {}
+    by_symbol = {p.symbol: [] for p in staging_positions}
+    removed_by = {}
     for pos in staging_positions:
-        symbol = pos.symbol
-        if symbol not in by_symbol:
-            by_symbol[symbol] = []
-        by_symbol[symbol].append(pos)
+        if getattr(pos, "change_type", "upsert") == "delete":
+            removed_by.setdefault(pos.symbol, set()).add(pos.source_type)
+        else:
+            by_symbol[pos.symbol].append(pos)
+    others = _other_source_candidates(db, user_id, staging_positions)
+    for pos in others:
+        by_symbol[pos.symbol].append(pos)
+    if others:
+        by_symbol = {symbol: _rank(positions) for symbol, positions in by_symbol.items()}
     
     for symbol, positions in by_symbol.items():
+        if not positions:
+            # portfolio_positions has no account column; the source identifies the row
+            sources = sorted(removed_by.get(symbol, ()))
+            placeholders = ", ".join(f":src{i}" for i in range(len(sources)))
+            result = db.execute(
+                text(f"""
+                    DELETE FROM portfolio_positions
+                    WHERE userId = :user_id AND symbol = :symbol AND source IN ({placeholders})
+                """),
+                {"user_id": user_id, "symbol": symbol, **{f"src{i}": src for i, src in enumerate(sources)}}
+            )
+            summary["removed"] += result.rowcount
+            continue
+        
         if len(positions) == 1:
             pos = positions[0]
             _upsert_position(db, user_id, pos)
@@ -82,12 +188,13 @@ def reconcile_positions(db: Session, sync_run_id: str, user_id: int) -> Dict[str
                     "symbol": symbol,
                     "reason": "priority_tie_broken_by_confidence",
                     "selected_source": selected.source_type,
-                    "alternatives": [p.source_type for p in conflict_group if p.id != selected.id]
+                    "alternatives": [p.source_type for p in conflict_group if p is not selected]
                 })
         
         _upsert_position(db, user_id, selected)
         summary["updated"] += 1
     
+    advance_snapshots(db, sync_run_id, user_id)
     db.commit()
     return summary
 
@@ -137,6 +244,51 @@ def _upsert_position(db: Session, user_id: int, pos: Any):
         )
 
 
+def _cash_event_exists(db: Session, user_id: int, event: Any) -> bool:
+    """
+    Whether a staged cash event is already in the canonical table
+    
+    Events with a broker transaction ID match on it; same-day events with
+    equal amounts (e.g. dividends from two symbols) are distinct. Others
+    fall back to matching type, amount, date and source.
+    """
+    transaction_id = getattr(event, "transaction_id", None)
+    if transaction_id:
+        return db.execute(
+            text("""
+                SELECT id FROM cash_events
+                WHERE userId = :user_id
+                  AND source = :source
+                  AND accountId IS NOT DISTINCT FROM :account_id
+                  AND transactionId = :transaction_id
+            """),
+            {
+                "user_id": user_id,
+                "source": event.source_type,
+                "account_id": event.account_id,
+                "transaction_id": transaction_id
+            }
+        ).fetchone() is not None
+    
+    return db.execute(
+        text("""
+            SELECT id FROM cash_events
+            WHERE userId = :user_id
+              AND eventType = :event_type
+              AND amount = :amount
+              AND eventDate = :event_date
+              AND source = :source
+        """),
+        {
+            "user_id": user_id,
+            "event_type": event.event_type,
+            "amount": event.amount,
+            "event_date": event.event_date,
+            "source": event.source_type
+        }
+    ).fetchone() is not None
+
+
 def reconcile_cash_events(db: Session, sync_run_id: str, user_id: int) -> Dict[str, Any]:
     """
     Reconcile cash events from staging to canonical table
@@ -160,33 +312,16 @@ def reconcile_cash_events(db: Session, sync_run_id: str, user_id: int) -> Dict[s
     )
     
     for event in staging_result:
-        existing = db.execute(
-            text("""
-                SELECT id FROM cash_events
-                WHERE userId = :user_id
-                  AND eventType = :event_type
-                  AND amount = :amount
-                  AND eventDate = :event_date
-                  AND source = :source
-            """),
-            {
-                "user_id": user_id,
-                "event_type": event.event_type,
-                "amount": event.amount,
-                "event_date": event.event_date,
-                "source": event.source_type
-            }
-        ).fetchone()
-        
-        if existing:
+        if _cash_event_exists(db, user_id, event):
             summary["skipped"] += 1
             continue
         
         db.execute(
             text("""
                 INSERT INTO cash_events
-                (userId, eventType, amount, currency, eventDate, source, accountId, description)
-                VALUES (:user_id, :event_type, :amount, :currency, :event_date, :source, :account_id, :description)
+                (userId, eventType, amount, currency, eventDate, source, accountId, description, transactionId)
+                VALUES (:user_id, :event_type, :amount, :currency, :event_date, :source, :account_id, :description,
+                        :transaction_id)
             """),
             {
                 "user_id": user_id,
@@ -196,7 +331,8 @@ def reconcile_cash_events(db: Session, sync_run_id: str, user_id: int) -> Dict[s
                 "event_date": event.event_date,
                 "source": event.source_type,
                 "account_id": event.account_id,
-                "description": event.description
+                "description": event.description,
+                "transaction_id": getattr(event, "transaction_id", None)
             }
         )
         summary["inserted"] += 1
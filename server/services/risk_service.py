@@ -0,0 +1,212 @@
+"""
+Risk Service - portfolio risk analytics from positions and stored price history
+Builds the position price matrix from the signal engine's price store, with
+every asset and the benchmark aligned on the days they all have a bar, and
+runs the risk engine. Reports on history whose recorded provenance is the
+mock random-walk provider are refused unless RISK_ALLOW_SYNTHETIC is set,
+and are then marked synthetic.
+Results are cached per (user, portfolio version), where the
+version is the strategy_overlays data_version bumped on every positions or
+trades write, so a report is recomputed only when the portfolio changes.
+"""
+import os
+import logging
+from collections import OrderedDict
+from functools import reduce
+from datetime import date
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from server.db.qmark import qmark
+from server.logic.risk_engine import compute_risk, RiskError, RISK_MC_PATHS
+from server.services.cache import get_cache, set_cache
+
+logger = logging.getLogger(__name__)
+
+RISK_LOOKBACK_BARS = int(os.getenv("RISK_LOOKBACK_BARS", "252"))
+RISK_BENCHMARK_SYMBOL = os.getenv("RISK_BENCHMARK_SYMBOL", "SPY")
+RISK_CACHE_TTL_SEC = int(os.getenv("RISK_CACHE_TTL_SEC", "86400"))
+RISK_CACHE_MAX_ENTRIES = int(os.getenv("RISK_CACHE_MAX_ENTRIES", "1024"))
+RISK_ALLOW_SYNTHETIC = os.getenv("RISK_ALLOW_SYNTHETIC", "false").lower() == "true"
+
+SECONDS_PER_DAY = 86400
+
+_risk_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+
+def portfolio_version(db, user_id: int) -> int:
+    """Current positions/trades version for a user (0 before any tracked write)"""
+    stmt, params = qmark("SELECT data_version FROM strategy_overlays WHERE userId = ?", (user_id,))
+    row = db.execute(stmt, params).first()
+    return int(row[0]) if row else 0
+
+
+def load_position_values(db, user_id: int) -> Tuple[List[str], np.ndarray]:
+    """Market value per symbol, summed across accounts"""
+    stmt, params = qmark("""
+        SELECT symbol, SUM(quantity * COALESCE(NULLIF(currentPrice, 0), avgCost, 0)) AS value
+        FROM portfolio_positions
+        WHERE userId = ?
+        GROUP BY symbol
+    """, (user_id,))
+    rows = [(symbol, float(value or 0)) for symbol, value in db.execute(stmt, params).all()]
+    rows = [(symbol, value) for symbol, value in rows if value > 0]
+    return [r[0] for r in rows], np.array([r[1] for r in rows], dtype=np.float64)
+
+
+def _cache_key(user_id: int, version: int, mc_paths: int) -> str:
+    # Daily bars move once per day, so the as-of date is part of the version
+    return f"risk:{user_id}:{version}:{mc_paths}:{date.today().isoformat()}"
+
+
+def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    result = _risk_cache.get(key)
+    if result is not None:
+        _risk_cache.move_to_end(key)
+        return result
+    result = get_cache(key)
+    if result is not None:
+        _cache_put(key, result, publish=False)
+    return result
+
+
+def _cache_put(key: str, result: Dict[str, Any], publish: bool = True) -> None:
+    _risk_cache[key] = result
+    _risk_cache.move_to_end(key)
+    while len(_risk_cache) > RISK_CACHE_MAX_ENTRIES:
+        _risk_cache.popitem(last=False)
+    if publish:
+        set_cache(key, result, ttl=RISK_CACHE_TTL_SEC)
+
+
+def daily_closes(store, symbol: str) -> Tuple[np.ndarray, np.ndarray]:
+    """(UTC day numbers, last price of each day) for a symbol's stored bars"""
+    history = store.last_n(symbol)
+    days = history["timestamp"] // SECONDS_PER_DAY
+    last_of_day = np.append(days[1:] != days[:-1], True)
+    return days[last_of_day], np.asarray(history["price"][last_of_day], dtype=np.float64)
+
+
+def align_closes(
+    series: List[Tuple[np.ndarray, np.ndarray]],
+    bars: int,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Prices of every series on the trailing `bars` days they all share
+
+    Returns:
+        (shared day numbers, series x days price matrix)
+    """
+    shared = reduce(np.intersect1d, [days for days, _ in series])[-bars:]
+    prices = np.stack([closes[np.searchsorted(days, shared)] for days, closes in series])
+    return shared, prices
+
+
+def compute_portfolio_risk(
+    symbols: List[str],
+    values: np.ndarray,
+    engine=None,
+    mc_paths: int = RISK_MC_PATHS,
+    seed: Optional[int] = None,
+    allow_synthetic: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """
+    Risk report for position values, priced from the signal engine's store
+
+    Assets are aligned on shared days rather than bar counts; the benchmark
+    is used only if it has at least 3 of those days. Symbols without stored
+    history are excluded and reported.
+
+    Raises:
+        RiskError: no usable history, or only synthetic prices and
+            allow_synthetic (default RISK_ALLOW_SYNTHETIC) is off
+    """
+    if engine is None:
+        from server.logic.signal_engine import get_signal_engine
+        engine = get_signal_engine()
+
+    available = [engine.ensure_symbol(symbol) for symbol in symbols]
+    covered = [i for i, ok in enumerate(available) if ok]
+    excluded = [symbol for symbol, ok in zip(symbols, available) if not ok]
+    if not covered:
+        raise RiskError("No positions with price history")
+
+    has_benchmark = engine.ensure_symbol(RISK_BENCHMARK_SYMBOL)
+    priced = [symbols[i] for i in covered] + ([RISK_BENCHMARK_SYMBOL] if has_benchmark else [])
+    synthetic_symbols = [symbol for symbol in priced if engine.is_synthetic(symbol)]
+    synthetic = bool(synthetic_symbols)
+    if synthetic and not (RISK_ALLOW_SYNTHETIC if allow_synthetic is None else allow_synthetic):
+        raise RiskError(
+            f"Risk analytics need real price history; stored history for {', '.join(synthetic_symbols)} "
+            "comes from mock prices (set SIGNAL_PRICE_PROVIDER, or RISK_ALLOW_SYNTHETIC=true for demo data)"
+        )
+
+    store = engine.price_store
+    series = [daily_closes(store, symbols[i]) for i in covered]
+    bars = RISK_LOOKBACK_BARS + 1
+
+    warnings = []
+    benchmark = None
+    if has_benchmark:
+        days, prices = align_closes(series + [daily_closes(store, RISK_BENCHMARK_SYMBOL)], bars)
+        if len(days) >= 3:
+            prices, benchmark = prices[:-1], prices[-1]
+        else:
+            warnings.append(f"Benchmark {RISK_BENCHMARK_SYMBOL} shares too few days with the positions; beta omitted")
+    else:
+        warnings.append(f"No price history for benchmark {RISK_BENCHMARK_SYMBOL}; beta omitted")
+    if benchmark is None:
+        days, prices = align_closes(series, bars)
+    if len(days) < 3:
+        raise RiskError("Positions share fewer than 3 days of price history")
+    if synthetic:
+        warnings.append(
+            f"Prices for {', '.join(synthetic_symbols)} are synthetic (mock provider); figures are for demonstration only"
+        )
+
+    result = compute_risk(
+        values[covered],
+        prices,
+        benchmark_prices=benchmark,
+        mc_paths=mc_paths,
+        seed=seed,
+        symbols=[symbols[i] for i in covered],
+    )
+    result["excluded_symbols"] = excluded
+    result["benchmark"] = RISK_BENCHMARK_SYMBOL if benchmark is not None else None
+    result["synthetic"] = synthetic
+    result["warnings"] = warnings
+    return result
+
+
+def get_portfolio_risk(
+    db,
+    user_id: int,
+    mc_paths: int = RISK_MC_PATHS,
+    engine=None,
+    allow_synthetic: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """
+    Cached risk report for a user's current portfolio
+
+    Raises:
+        RiskError: no positions with usable (real, unless allowed) price history
+    """
+    version = portfolio_version(db, user_id)
+    key = _cache_key(user_id, version, mc_paths)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    symbols, values = load_position_values(db, user_id)
+    if not symbols:
+        raise RiskError("No positions to analyze")
+
+    result = compute_portfolio_risk(
+        symbols, values, engine=engine, mc_paths=mc_paths, seed=user_id, allow_synthetic=allow_synthetic
+    )
+    result["portfolio_version"] = version
+    _cache_put(key, result)
+    logger.info(f"Computed risk for user {user_id} (version {version}, {len(symbols)} positions)")
+    return result
@@ -1,17 +1,41 @@
 """
 Scheduler Service
-Provides helpers for ops cron jobs with concurrency guards
+Provides helpers for ops cron jobs with concurrency guards, and the fleet
+scheduler: one sync_jobs row per user, claimed with FOR UPDATE SKIP LOCKED by
+sharded worker processes under per-source rate budgets, with exponential
+backoff on failure.
 """
 
+import os
+import time
+import random
+import socket
+import asyncio
 import logging
-from typing import Dict, Any
+from datetime import datetime, timedelta
+from typing import Dict, Any, Callable, Iterable, List, Optional
 from sqlalchemy.orm import Session
 
+from server.db.qmark import qmark, qmark_many
+from server.services.http_client import close_http_clients
 from server.services.ingest_pipeline import run_full_sync
 from server.services.reconciliation_engine import run_reconciliation
 
 logger = logging.getLogger(__name__)
 
+SYNC_INTERVAL_SEC = float(os.getenv("SYNC_INTERVAL_SEC", "3600"))
+SYNC_SHARDS = max(1, int(os.getenv("SYNC_SHARDS", "1")))
+SYNC_CLAIM_BATCH = int(os.getenv("SYNC_CLAIM_BATCH", "20"))
+SYNC_WORKER_CONCURRENCY = max(1, int(os.getenv("SYNC_WORKER_CONCURRENCY", "8")))
+SYNC_POLL_INTERVAL_SEC = float(os.getenv("SYNC_POLL_INTERVAL_SEC", "5"))
+SYNC_LEASE_SEC = float(os.getenv("SYNC_LEASE_SEC", "900"))
+SYNC_BACKOFF_BASE_SEC = float(os.getenv("SYNC_BACKOFF_BASE_SEC", "60"))
+SYNC_BACKOFF_MAX_SEC = float(os.getenv("SYNC_BACKOFF_MAX_SEC", "21600"))
+# Fleet-wide syncs per minute per source type, split evenly across shards
+SYNC_RATE_BUDGETS = os.getenv("SYNC_RATE_BUDGETS", "ibkr_flex=60,kucoin=300")
+
+SCHEDULED_SOURCE_TYPES = ("ibkr_flex", "kucoin")
+
 
 async def run_full_sync_with_reconciliation(
     db: Session,
@@ -39,3 +63,343 @@ async def run_full_sync_with_reconciliation(
     except Exception as e:
         logger.error(f"Scheduled sync failed for user {user_id}: {e}")
         raise
+
+
+def parse_rate_budgets(spec: str) -> Dict[str, float]:
+    """Parse "source=per_minute,..." into a dict, ignoring malformed entries"""
+    budgets = {}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        try:
+            budgets[name.strip()] = float(value)
+        except ValueError:
+            continue
+    return {name: rate for name, rate in budgets.items() if name and rate > 0}
+
+
+class RateBudget:
+    """
+    Token buckets per source type
+
+    Each bucket refills at its per-minute rate and holds at most one
+    minute's worth of tokens; source types without a budget are unlimited.
+    """
+
+    def __init__(self, per_minute: Dict[str, float], share: float = 1.0, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.rates = {name: rate * share / 60.0 for name, rate in per_minute.items()}
+        self.capacity = {name: max(1.0, rate * share) for name, rate in per_minute.items()}
+        self.tokens = dict(self.capacity)
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        elapsed, self.updated = now - self.updated, now
+        for name, rate in self.rates.items():
+            self.tokens[name] = min(self.capacity[name], self.tokens[name] + elapsed * rate)
+
+    def try_acquire(self, source_types: Iterable[str]) -> float:
+        """
+        Take one token for every budgeted source type, or none at all
+
+        Returns:
+            0 when acquired, otherwise seconds until all tokens are available
+        """
+        self._refill()
+        needed = [name for name in set(source_types) if name in self.rates]
+        wait = max(
+            [(1.0 - self.tokens[name]) / self.rates[name] for name in needed if self.tokens[name] < 1.0],
+            default=0.0,
+        )
+        if wait > 0:
+            return wait
+        for name in needed:
+            self.tokens[name] -= 1.0
+        return 0.0
+
+
+def backoff_delay(
+    attempts: int,
+    base: float = SYNC_BACKOFF_BASE_SEC,
+    cap: float = SYNC_BACKOFF_MAX_SEC,
+    rng: Callable[[], float] = random.random,
+) -> float:
+    """Exponential backoff for the n-th consecutive failure, jittered to 50-100%"""
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return delay * (0.5 + rng() / 2)
+
+
+def _spread_offset(user_id: int, interval: float) -> float:
+    """Stable per-user offset within the interval so first runs do not all land at once"""
+    return (user_id * 2654435761 % 2 ** 32) / 2 ** 32 * interval
+
+
+def enqueue_users(db, now: Optional[datetime] = None, interval: float = SYNC_INTERVAL_SEC) -> int:
+    """
+    Create sync jobs for users with syncable sources that have none yet
+
+    Returns:
+        Number of jobs created
+    """
+    now = now or datetime.utcnow()
+    placeholders = ", ".join("?" for _ in SCHEDULED_SOURCE_TYPES)
+    stmt, params = qmark(f"""
+        SELECT DISTINCT ds.user_id FROM data_sources ds
+        WHERE ds.enabled = TRUE
+          AND ds.source_type IN ({placeholders})
+          AND NOT EXISTS (SELECT 1 FROM sync_jobs j WHERE j.user_id = ds.user_id)
+    """, SCHEDULED_SOURCE_TYPES)
+    user_ids = [int(row[0]) for row in db.execute(stmt, params).all()]
+    if not user_ids:
+        return 0
+
+    stmt, rows = qmark_many("""
+        INSERT INTO sync_jobs (user_id, status, next_run_at, attempts)
+        VALUES (?, 'queued', ?, 0)
+        ON CONFLICT (user_id) DO NOTHING
+    """, [(user_id, now + timedelta(seconds=_spread_offset(user_id, interval))) for user_id in user_ids])
+    db.execute(stmt, rows)
+    db.commit()
+    return len(user_ids)
+
+
+def claim_jobs(
+    db,
+    worker_id: str,
+    shard: int = 0,
+    shard_count: int = 1,
+    limit: int = SYNC_CLAIM_BATCH,
+    now: Optional[datetime] = None,
+    lease: float = SYNC_LEASE_SEC,
+) -> List[Dict[str, Any]]:
+    """
+    Claim due jobs for one shard, longest-waiting first
+
+    Each user has a single job row, so every tenant gets at most one slot
+    per round however many sources it has. Rows locked by other workers are
+    skipped rather than waited on; running jobs whose lease expired (a
+    crashed worker) become claimable again.
+    """
+    now = now or datetime.utcnow()
+    lock = " FOR UPDATE SKIP LOCKED" if db.get_bind().dialect.name == "postgresql" else ""
+    stmt, params = qmark(f"""
+        SELECT id, user_id, attempts FROM sync_jobs
+        WHERE next_run_at <= ?
+          AND (status = 'queued' OR (status = 'running' AND locked_at < ?))
+          AND user_id % ? = ?
+        ORDER BY next_run_at, id
+        LIMIT ?{lock}
+    """, (now, now - timedelta(seconds=lease), shard_count, shard, limit))
+    jobs = [
+        {"id": int(row[0]), "user_id": int(row[1]), "attempts": int(row[2])}
+        for row in db.execute(stmt, params).all()
+    ]
+    if jobs:
+        placeholders = ", ".join("?" for _ in jobs)
+        stmt, params = qmark(f"""
+            UPDATE sync_jobs SET status = 'running', locked_by = ?, locked_at = ?
+            WHERE id IN ({placeholders})
+        """, (worker_id, now, *[job["id"] for job in jobs]))
+        db.execute(stmt, params)
+    db.commit()
+    return jobs
+
+
+def job_source_types(db, user_ids: List[int]) -> Dict[int, List[str]]:
+    """Enabled syncable source types per user"""
+    if not user_ids:
+        return {}
+    users = ", ".join("?" for _ in user_ids)
+    types = ", ".join("?" for _ in SCHEDULED_SOURCE_TYPES)
+    stmt, params = qmark(f"""
+        SELECT user_id, source_type FROM data_sources
+        WHERE enabled = TRUE AND user_id IN ({users}) AND source_type IN ({types})
+    """, (*user_ids, *SCHEDULED_SOURCE_TYPES))
+    result: Dict[int, List[str]] = {user_id: [] for user_id in user_ids}
+    for user_id, source_type in db.execute(stmt, params).all():
+        result[int(user_id)].append(source_type)
+    return result
+
+
+def release_job(
+    db,
+    job_id: int,
+    next_run_at: datetime,
+    attempts: int = 0,
+    error: Optional[str] = None,
+    finished_at: Optional[datetime] = None,
+) -> None:
+    """Return a job to the queue for its next run"""
+    stmt, params = qmark("""
+        UPDATE sync_jobs
+        SET status = 'queued', next_run_at = ?, attempts = ?, last_error = ?,
+            last_finished_at = COALESCE(?, last_finished_at), locked_by = NULL, locked_at = NULL
+        WHERE id = ?
+    """, (next_run_at, attempts, error, finished_at, job_id))
+    db.execute(stmt, params)
+    db.commit()
+
+
+def remove_job(db, job_id: int) -> None:
+    stmt, params = qmark("DELETE FROM sync_jobs WHERE id = ?", (job_id,))
+    db.execute(stmt, params)
+    db.commit()
+
+
+async def run_job(
+    db,
+    job: Dict[str, Any],
+    interval: float = SYNC_INTERVAL_SEC,
+    sync: Optional[Callable] = None,
+) -> str:
+    """
+    Sync one claimed job's user and reschedule it
+
+    Success runs again one interval later; failures back off exponentially.
+
+    Returns:
+        "completed", "failed" or "deferred"
+    """
+    sync = sync or run_full_sync_with_reconciliation
+    try:
+        result = await sync(db, job["user_id"], "scheduled")
+        status = result["sync"]["status"]
+        error = "; ".join(result["sync"]["stats"].get("errors", [])) or None
+    except Exception as e:
+        db.rollback()
+        if isinstance(e, RuntimeError) and "already running" in str(e):
+            # A manual or API sync holds the user; retry without counting a failure
+            retry_at = datetime.utcnow() + timedelta(seconds=SYNC_BACKOFF_BASE_SEC)
+            release_job(db, job["id"], retry_at, job["attempts"], str(e))
+            return "deferred"
+        status, error = "failed", str(e)
+
+    now = datetime.utcnow()
+    if status == "completed":
+        release_job(db, job["id"], now + timedelta(seconds=interval), 0, None, finished_at=now)
+        return "completed"
+    attempts = job["attempts"] + 1
+    release_job(db, job["id"], now + timedelta(seconds=backoff_delay(attempts)), attempts, error, finished_at=now)
+    logger.warning(f"Sync for user {job['user_id']} failed (attempt {attempts}): {error}")
+    return "failed"
+
+
+async def run_scheduler_pass(
+    session_factory: Callable,
+    budget: RateBudget,
+    worker_id: str,
+    shard: int = 0,
+    shard_count: int = 1,
+    batch_size: int = SYNC_CLAIM_BATCH,
+    concurrency: int = SYNC_WORKER_CONCURRENCY,
+    sync: Optional[Callable] = None,
+) -> int:
+    """
+    Claim one batch for this shard and sync it
+
+    Jobs over their sources' rate budget go back to the queue until tokens
+    refill. Each job runs in its own session.
+
+    Returns:
+        Number of jobs claimed
+    """
+    with session_factory() as db:
+        if shard == 0:
+            enqueue_users(db)
+        jobs = claim_jobs(db, worker_id, shard, shard_count, batch_size)
+        sources = job_source_types(db, [job["user_id"] for job in jobs])
+
+        runnable = []
+        for job in jobs:
+            if not sources[job["user_id"]]:
+                remove_job(db, job["id"])
+                continue
+            wait = budget.try_acquire(sources[job["user_id"]])
+            if wait > 0:
+                release_job(db, job["id"], datetime.utcnow() + timedelta(seconds=wait), job["attempts"])
+            else:
+                runnable.append(job)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _run(job):
+        async with semaphore:
+            with session_factory() as job_db:
+                try:
+                    await run_job(job_db, job, sync=sync)
+                except Exception as e:
+                    logger.error(f"Sync job {job['id']} could not be rescheduled: {e}")
+
+    await asyncio.gather(*[_run(job) for job in runnable])
+    return len(jobs)
+
+
+async def run_sync_worker(
+    shard: int = 0,
+    shard_count: int = SYNC_SHARDS,
+    poll_interval: float = SYNC_POLL_INTERVAL_SEC,
+    stop_event: Optional[asyncio.Event] = None,
+    session_factory: Optional[Callable] = None,
+) -> None:
+    """Run scheduler passes for one shard until cancelled or stop_event is set"""
+    if session_factory is None:
+        from server.db.session import get_session
+        session_factory = get_session
+
+    stop_event = stop_event or asyncio.Event()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{shard}"
+    budget = RateBudget(parse_rate_budgets(SYNC_RATE_BUDGETS), share=1.0 / shard_count)
+    logger.info(f"Sync worker {worker_id} started (shard {shard}/{shard_count})")
+
+    while not stop_event.is_set():
+        try:
+            claimed = await run_scheduler_pass(session_factory, budget, worker_id, shard, shard_count)
+        except Exception as e:
+            logger.error(f"Sync worker pass failed: {e}")
+            claimed = 0
+        # Keep draining a full batch; otherwise idle until the next poll
+        if claimed < SYNC_CLAIM_BATCH:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def _run_shard(shard: int, shard_count: int) -> None:
+    try:
+        await run_sync_worker(shard, shard_count)
+    finally:
+        await close_http_clients()
+
+
+def _worker_process(shard: int, shard_count: int) -> None:
+    asyncio.run(_run_shard(shard, shard_count))
+
+
+def run_worker_processes(shard_count: int = SYNC_SHARDS) -> None:
+    """Run one worker process per shard and wait for them"""
+    import multiprocessing
+
+    processes = [
+        multiprocessing.Process(target=_worker_process, args=(shard, shard_count), name=f"sync-worker-{shard}")
+        for shard in range(shard_count)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Fleet sync workers")
+    parser.add_argument("--shards", type=int, default=SYNC_SHARDS)
+    parser.add_argument("--shard", type=int, help="Run only this shard in the current process")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.shard is not None:
+        _worker_process(args.shard, args.shards)
+    else:
+        run_worker_processes(args.shards)
@@ -1,51 +1,111 @@
 """
 Strategy Engine - Pure calculation functions for portfolio overlays
-No external calls, deterministic outputs from database data
+No external calls; outputs come from database data and, for realized
+volatility, the signal engine's price history.
+Overlays are computed over NumPy column arrays; the dict-based helpers
+convert their inputs and delegate to the same array kernels.
 """
-from typing import Dict, List, Any
-from datetime import datetime, timedelta
-import math
+from typing import Dict, List, Any, Optional, Sequence
+from datetime import datetime
 
+import numpy as np
 
-def calculate_momentum_buckets(positions: List[Dict]) -> Dict[str, Any]:
-    """
-    Calculate momentum classification for positions
-    Returns buckets: strong_up, moderate_up, neutral, moderate_down, strong_down
-    """
-    if not positions:
+MOMENTUM_BUCKETS = ("strong_up", "moderate_up", "neutral", "moderate_down", "strong_down")
+
+DRAWDOWN_STARTING_EQUITY = 10000.0
+
+_EMPTY_DRAWDOWN = {"max_drawdown_pct": 0, "current_drawdown_pct": 0, "peak_value": 0}
+
+# Positions and the 100 most recent closed trades in one round trip. Placeholder
+# NULLs are cast so PostgreSQL does not resolve them as text in the UNION.
+_OVERLAY_QUERY = """
+    WITH positions AS (
+        SELECT 'P' AS kind, symbol, quantity, avgCost AS avg_cost, currentPrice AS current_price,
+               CAST(NULL AS NUMERIC) AS entry_price, CAST(NULL AS NUMERIC) AS exit_price,
+               CAST(NULL AS NUMERIC) AS profit_loss, CAST(NULL AS TIMESTAMP) AS exit_time
+        FROM portfolio_positions
+        WHERE userId = ?
+    ),
+    recent_trades AS (
+        SELECT 'T' AS kind, symbol, quantity, CAST(NULL AS NUMERIC) AS avg_cost,
+               CAST(NULL AS NUMERIC) AS current_price,
+               entry_price, exit_price, profit_loss, exit_time
+        FROM trades
+        WHERE userId = ? AND status = 'closed'
+        ORDER BY exit_time DESC
+        LIMIT 100
+    )
+    SELECT * FROM positions
+    UNION ALL
+    SELECT * FROM recent_trades
+    ORDER BY kind, exit_time DESC
+"""
+
+
+def _floats(values: Sequence[Any], default: float = np.nan) -> np.ndarray:
+    """Column of floats with None mapped to `default`"""
+    return np.fromiter(
+        (default if v is None else float(v) for v in values),
+        dtype=np.float64,
+        count=len(values),
+    )
+
+
+def _mark_prices(avg_cost: np.ndarray, current_price: np.ndarray) -> np.ndarray:
+    """Current price, falling back to average cost when missing or zero"""
+    return np.where(np.isnan(current_price) | (current_price == 0), avg_cost, current_price)
+
+
+def _position_columns(positions: List[Dict], default_cost: float = 0.0) -> Dict[str, Any]:
+    return {
+        "symbols": [pos['symbol'] for pos in positions],
+        "quantity": _floats([pos.get('quantity', 0) for pos in positions], 0.0),
+        "avg_cost": _floats([pos.get('avgCost', default_cost) for pos in positions], default_cost),
+        "current_price": _floats([pos.get('currentPrice') for pos in positions]),
+    }
+
+
+def _trade_columns(trades: List[Dict]) -> Dict[str, Any]:
+    entry = _floats([t.get('entry_price', 0) for t in trades], 0.0)
+    exit_ = _floats([t.get('exit_price') for t in trades])
+    return {
+        "symbols": [t.get('symbol') for t in trades],
+        "entry_price": entry,
+        "exit_price": np.where(np.isnan(exit_), entry, exit_),
+        "profit_loss": _floats([t.get('profit_loss', 0) for t in trades], 0.0),
+        "exit_time": [t.get('exit_time') for t in trades],
+    }
+
+
+def momentum_from_arrays(symbols: List[str], avg_cost: np.ndarray, current_price: np.ndarray) -> Dict[str, Any]:
+    """Momentum buckets from position columns"""
+    if not symbols:
         return {"buckets": {}, "summary": "No positions"}
-    
+
+    price = _mark_prices(avg_cost, current_price)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        momentum = np.where(avg_cost > 0, (price / avg_cost - 1) * 100, 0.0)
+    bucket_index = np.select(
+        [momentum > 20, momentum > 5, momentum < -20, momentum < -5],
+        [0, 1, 4, 3],
+        default=2,
+    )
+
     momentum_scores = {}
-    for pos in positions:
-        current_price = float(pos.get('currentPrice', 0) or pos.get('avgCost', 0))
-        avg_cost = float(pos.get('avgCost', 1))
-        momentum = (current_price / avg_cost - 1) * 100 if avg_cost > 0 else 0
-        
-        if momentum > 20:
-            bucket = "strong_up"
-        elif momentum > 5:
-            bucket = "moderate_up"
-        elif momentum < -20:
-            bucket = "strong_down"
-        elif momentum < -5:
-            bucket = "moderate_down"
-        else:
-            bucket = "neutral"
-        
-        momentum_scores[pos['symbol']] = {
-            "bucket": bucket,
-            "momentum_pct": momentum,
-            "current_price": current_price,
-            "avg_cost": avg_cost
+    for symbol, idx, mom, cp, ac in zip(
+        symbols, bucket_index.tolist(), momentum.tolist(), price.tolist(), avg_cost.tolist()
+    ):
+        momentum_scores[symbol] = {
+            "bucket": MOMENTUM_BUCKETS[idx],
+            "momentum_pct": mom,
+            "current_price": cp,
+            "avg_cost": ac
         }
-    
-    buckets = {}
+
+    buckets: Dict[str, List[str]] = {}
     for symbol, data in momentum_scores.items():
-        bucket = data['bucket']
-        if bucket not in buckets:
-            buckets[bucket] = []
-        buckets[bucket].append(symbol)
-    
+        buckets.setdefault(data['bucket'], []).append(symbol)
+
     return {
         "buckets": buckets,
         "details": momentum_scores,
@@ -53,90 +113,112 @@ def calculate_momentum_buckets(positions: List[Dict]) -> Dict[str, Any]:
     }
 
 
-def calculate_volatility_class(trades: List[Dict], positions: List[Dict]) -> Dict[str, Any]:
+def volatility_from_arrays(symbols: List[Optional[str]], entry_price: np.ndarray, exit_price: np.ndarray) -> Dict[str, Any]:
     """
-    Calculate volatility classification per symbol
-    Uses standard deviation of returns from trade history
+    Per-symbol volatility class from trade columns
+
+    Matches the original pairing: each symbol's returns come from all but its
+    last trade, in input order.
     """
-    volatility_by_symbol = {}
-    
-    trades_by_symbol = {}
-    for trade in trades:
-        symbol = trade.get('symbol')
-        if symbol:
-            if symbol not in trades_by_symbol:
-                trades_by_symbol[symbol] = []
-            trades_by_symbol[symbol].append(trade)
-    
-    for symbol, symbol_trades in trades_by_symbol.items():
-        if len(symbol_trades) < 2:
+    volatility_by_symbol: Dict[str, Dict[str, Any]] = {}
+    keep = np.array([s is not None and s != "" for s in symbols], dtype=bool)
+    if not keep.any():
+        return {"volatility_by_symbol": volatility_by_symbol, "summary": "Analyzed 0 symbols"}
+
+    kept_symbols = [s for s, k in zip(symbols, keep) if k]
+    names, first_seen, groups = np.unique(np.array(kept_symbols, dtype=object), return_index=True, return_inverse=True)
+    entry = entry_price[keep]
+    exit_ = exit_price[keep]
+    counts = np.bincount(groups, minlength=len(names))
+
+    # Drop each symbol's last trade, then keep returns with a positive entry
+    order = np.argsort(groups, kind="stable")
+    ends = np.cumsum(counts) - 1
+    is_last = np.zeros(len(groups), dtype=bool)
+    is_last[order[ends]] = True
+    valid = ~is_last & (entry > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = np.where(valid, (exit_ - entry) / entry, 0.0)
+
+    n = np.bincount(groups, weights=valid, minlength=len(names))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = np.bincount(groups, weights=returns, minlength=len(names)) / n
+        deviation = np.where(valid, returns - mean[groups], 0.0)
+        volatility = np.sqrt(np.bincount(groups, weights=deviation ** 2, minlength=len(names)) / n) * 100
+
+    for g in np.argsort(first_seen, kind="stable"):
+        symbol = names[g]
+        if counts[g] < 2:
             volatility_by_symbol[symbol] = {"class": "unknown", "value": 0}
             continue
-        
-        returns = []
-        for i in range(len(symbol_trades) - 1):
-            entry = float(symbol_trades[i].get('entry_price', 0))
-            exit = float(symbol_trades[i].get('exit_price', entry))
-            if entry > 0:
-                ret = (exit - entry) / entry
-                returns.append(ret)
-        
-        if returns:
-            mean_return = sum(returns) / len(returns)
-            variance = sum((r - mean_return) ** 2 for r in returns) / len(returns)
-            volatility = math.sqrt(variance) * 100
-            
-            if volatility > 15:
-                vol_class = "high"
-            elif volatility > 8:
-                vol_class = "medium"
-            else:
-                vol_class = "low"
-            
-            volatility_by_symbol[symbol] = {
-                "class": vol_class,
-                "value": volatility,
-                "trade_count": len(symbol_trades)
-            }
-    
+        if n[g] == 0:
+            continue
+        value = float(volatility[g])
+        if value > 15:
+            vol_class = "high"
+        elif value > 8:
+            vol_class = "medium"
+        else:
+            vol_class = "low"
+        volatility_by_symbol[symbol] = {
+            "class": vol_class,
+            "value": value,
+            "trade_count": int(counts[g])
+        }
+
     return {
         "volatility_by_symbol": volatility_by_symbol,
         "summary": f"Analyzed {len(volatility_by_symbol)} symbols"
     }
 
 
-def calculate_concentration(positions: List[Dict]) -> Dict[str, Any]:
+def volatility_from_tracker(symbols: List[str], values: np.ndarray, engine) -> Dict[str, Any]:
     """
-    Calculate portfolio concentration metrics
-    Returns top-N weights and HHI (Herfindahl-Hirschman Index)
+    Per-symbol and portfolio volatility class from the engine's realized-volatility tracker
+
+    Symbols without price history are classed "unknown".
     """
-    if not positions:
+    volatility_by_symbol: Dict[str, Dict[str, Any]] = {}
+    weights: Dict[str, float] = {}
+    for symbol, value in zip(symbols, values.tolist()):
+        weights[symbol] = weights.get(symbol, 0.0) + max(value, 0.0)
+        if symbol in volatility_by_symbol:
+            continue
+        try:
+            vol = engine.get_volatility(symbol)
+        except ValueError:
+            volatility_by_symbol[symbol] = {"class": "unknown", "value": 0}
+            continue
+        volatility_by_symbol[symbol] = {
+            "class": vol["class"],
+            "value": vol["realized_vol_pct"] or 0,
+            "ewma_value": vol["ewma_vol_pct"] or 0,
+            "observations": vol["observations"]
+        }
+
+    portfolio = engine.get_portfolio_volatility(weights) if weights else None
+    return {
+        "volatility_by_symbol": volatility_by_symbol,
+        "portfolio": portfolio,
+        "summary": f"Analyzed {len(volatility_by_symbol)} symbols"
+    }
+
+
+def concentration_from_arrays(symbols: List[str], quantity: np.ndarray, avg_cost: np.ndarray, current_price: np.ndarray) -> Dict[str, Any]:
+    """Top-N weights and HHI from position columns"""
+    if not symbols:
         return {"concentration": "N/A", "hhi": 0, "top_holdings": []}
-    
-    total_value = sum(
-        float(pos.get('quantity', 0)) * float(pos.get('currentPrice', 0) or pos.get('avgCost', 0))
-        for pos in positions
-    )
-    
+
+    values = quantity * _mark_prices(avg_cost, current_price)
+    total_value = float(values.sum())
     if total_value <= 0:
         return {"concentration": "N/A", "hhi": 0, "top_holdings": []}
-    
-    holdings = []
-    for pos in positions:
-        value = float(pos.get('quantity', 0)) * float(pos.get('currentPrice', 0) or pos.get('avgCost', 0))
-        weight = (value / total_value) * 100
-        holdings.append({
-            "symbol": pos['symbol'],
-            "value": value,
-            "weight_pct": weight
-        })
-    
-    holdings.sort(key=lambda x: x['weight_pct'], reverse=True)
-    
-    hhi = sum(h['weight_pct'] ** 2 for h in holdings)
-    
-    top_5_pct = sum(h['weight_pct'] for h in holdings[:5])
-    
+
+    weights = values / total_value * 100
+    order = np.argsort(-weights, kind="stable")
+    hhi = float(np.dot(weights, weights))
+    top_5_pct = float(weights[order[:5]].sum())
+
     if hhi > 2500:
         concentration = "Very High"
     elif hhi > 1500:
@@ -145,103 +227,175 @@ def calculate_concentration(positions: List[Dict]) -> Dict[str, Any]:
         concentration = "Moderate"
     else:
         concentration = "Low"
-    
+
+    top_holdings = [
+        {"symbol": symbols[i], "value": float(values[i]), "weight_pct": float(weights[i])}
+        for i in order[:10].tolist()
+    ]
+
     return {
         "concentration": concentration,
         "hhi": round(hhi, 2),
         "top_5_pct": round(top_5_pct, 2),
-        "top_holdings": holdings[:10],
+        "top_holdings": top_holdings,
         "summary": f"{concentration} concentration (HHI: {round(hhi, 2)})"
     }
 
 
-def calculate_drawdown_lite(trades: List[Dict], positions: List[Dict]) -> Dict[str, Any]:
+def drawdown_from_arrays(
+    realized_pnl: np.ndarray,
+    quantity: np.ndarray,
+    avg_cost: np.ndarray,
+    current_price: np.ndarray,
+) -> Dict[str, Any]:
     """
-    Calculate maximum drawdown from simplified equity curve
-    Built from realized P&L + current mark-to-market
+    Max and current drawdown of starting equity + realized P&L + unrealized P&L
+
+    Args:
+        realized_pnl: closed-trade P&L in exit-time order
     """
-    if not trades and not positions:
-        return {"max_drawdown_pct": 0, "current_drawdown_pct": 0, "peak_value": 0}
-    
-    equity_curve = [10000.0]
-    
-    sorted_trades = sorted(
-        [t for t in trades if t.get('exit_time')],
-        key=lambda x: x.get('exit_time', '')
-    )
-    
-    for trade in sorted_trades:
-        pnl = float(trade.get('profit_loss', 0))
-        equity_curve.append(equity_curve[-1] + pnl)
-    
-    current_unrealized = sum(
-        (float(pos.get('currentPrice', 0) or pos.get('avgCost', 0)) - float(pos.get('avgCost', 0))) * 
-        float(pos.get('quantity', 0))
-        for pos in positions
-    )
-    equity_curve.append(equity_curve[-1] + current_unrealized)
-    
-    peak = equity_curve[0]
-    max_drawdown = 0
-    current_drawdown = 0
-    
-    for value in equity_curve:
-        if value > peak:
-            peak = value
-        drawdown = (peak - value) / peak if peak > 0 else 0
-        max_drawdown = max(max_drawdown, drawdown)
-        if value == equity_curve[-1]:
-            current_drawdown = drawdown
-    
+    unrealized = float(np.dot(_mark_prices(avg_cost, current_price) - avg_cost, quantity))
+    steps = np.concatenate(([DRAWDOWN_STARTING_EQUITY], realized_pnl, [unrealized]))
+    equity_curve = np.cumsum(steps)
+
+    peaks = np.maximum.accumulate(equity_curve)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdowns = np.where(peaks > 0, (peaks - equity_curve) / peaks, 0.0)
+    max_drawdown = max(0, float(drawdowns.max()))
+    current_drawdown = float(drawdowns[-1])
+    peak = float(peaks[-1])
+
     return {
         "max_drawdown_pct": round(max_drawdown * 100, 2),
         "current_drawdown_pct": round(current_drawdown * 100, 2),
         "peak_value": round(peak, 2),
-        "current_value": round(equity_curve[-1], 2),
+        "current_value": round(float(equity_curve[-1]), 2),
         "summary": f"Max DD: {round(max_drawdown * 100, 2)}%"
     }
 
 
-def get_strategy_overlays(user_id: int, db) -> Dict[str, Any]:
+def _realized_in_exit_order(profit_loss: np.ndarray, exit_time: List[Any]) -> np.ndarray:
+    closed = [i for i, t in enumerate(exit_time) if t]
+    closed.sort(key=lambda i: exit_time[i])
+    return profit_loss[np.array(closed, dtype=np.int64)]
+
+
+def calculate_momentum_buckets(positions: List[Dict]) -> Dict[str, Any]:
     """
-    Main function to generate all strategy overlays from database
+    Calculate momentum classification for positions
+    Returns buckets: strong_up, moderate_up, neutral, moderate_down, strong_down
     """
-    from server.db.qmark import qmark
-    
-    stmt, params = qmark("""
-        SELECT symbol, quantity, avgCost, currentPrice, lastUpdated
-        FROM portfolio_positions
-        WHERE userId = ?
-    """, (user_id,))
-    positions = [dict(row) for row in db.execute(stmt, params).mappings().all()]
-    
-    stmt, params = qmark("""
-        SELECT symbol, trade_type, entry_price, exit_price, quantity, 
-               profit_loss, entry_time, exit_time, status
-        FROM trades
-        WHERE userId = ? AND status = 'closed'
-        ORDER BY exit_time DESC
-        LIMIT 100
-    """, (user_id,))
-    trades = [dict(row) for row in db.execute(stmt, params).mappings().all()]
-    
-    momentum = calculate_momentum_buckets(positions)
-    volatility = calculate_volatility_class(trades, positions)
-    concentration = calculate_concentration(positions)
-    drawdown = calculate_drawdown_lite(trades, positions)
-    
+    cols = _position_columns(positions, default_cost=1.0)
+    return momentum_from_arrays(cols["symbols"], cols["avg_cost"], cols["current_price"])
+
+
+def calculate_volatility_class(trades: List[Dict], positions: List[Dict]) -> Dict[str, Any]:
+    """
+    Calculate volatility classification per symbol
+    Uses standard deviation of returns from trade history
+    """
+    cols = _trade_columns(trades)
+    return volatility_from_arrays(cols["symbols"], cols["entry_price"], cols["exit_price"])
+
+
+def calculate_concentration(positions: List[Dict]) -> Dict[str, Any]:
+    """
+    Calculate portfolio concentration metrics
+    Returns top-N weights and HHI (Herfindahl-Hirschman Index)
+    """
+    cols = _position_columns(positions)
+    return concentration_from_arrays(cols["symbols"], cols["quantity"], cols["avg_cost"], cols["current_price"])
+
+
+def calculate_drawdown_lite(trades: List[Dict], positions: List[Dict]) -> Dict[str, Any]:
+    """
+    Calculate maximum drawdown from simplified equity curve
+    Built from realized P&L + current mark-to-market
+    """
+    if not trades and not positions:
+        return dict(_EMPTY_DRAWDOWN)
+
+    trade_cols = _trade_columns(trades)
+    pos_cols = _position_columns(positions)
+    realized = _realized_in_exit_order(trade_cols["profit_loss"], trade_cols["exit_time"])
+    return drawdown_from_arrays(realized, pos_cols["quantity"], pos_cols["avg_cost"], pos_cols["current_price"])
+
+
+def compute_overlays_from_rows(rows: List[Sequence[Any]], drawdown_state=None, volatility_engine=None) -> Dict[str, Any]:
+    """
+    Build all overlays from _OVERLAY_QUERY rows
+
+    Rows are split by kind into column arrays once; every overlay then runs
+    over the shared arrays without per-position dicts. With a DrawdownState
+    the drawdown covers the full trade history instead of the fetched window.
+    With a SignalEngine whose history for the held symbols is real,
+    volatility comes from realized price volatility; otherwise it is classed
+    from closed-trade returns.
+    """
+    position_rows = [r for r in rows if r[0] == 'P']
+    trade_rows = [r for r in rows if r[0] == 'T']
+
+    pos_symbols = [r[1] for r in position_rows]
+    quantity = _floats([r[2] for r in position_rows], 0.0)
+    avg_cost = _floats([r[3] for r in position_rows], 0.0)
+    current_price = _floats([r[4] for r in position_rows])
+
+    trade_symbols = [r[1] for r in trade_rows]
+    entry_price = _floats([r[5] for r in trade_rows], 0.0)
+    exit_price = _floats([r[6] for r in trade_rows])
+    exit_price = np.where(np.isnan(exit_price), entry_price, exit_price)
+    profit_loss = _floats([r[7] for r in trade_rows], 0.0)
+    exit_time = [r[8] for r in trade_rows]
+
+    concentration = concentration_from_arrays(pos_symbols, quantity, avg_cost, current_price)
+    if volatility_engine is not None and not any(volatility_engine.is_synthetic(s) for s in set(pos_symbols)):
+        values = quantity * _mark_prices(avg_cost, current_price)
+        volatility = volatility_from_tracker(pos_symbols, values, volatility_engine)
+    else:
+        volatility = volatility_from_arrays(trade_symbols, entry_price, exit_price)
+    if drawdown_state is not None:
+        unrealized = float(np.dot(_mark_prices(avg_cost, current_price) - avg_cost, quantity))
+        drawdown = drawdown_state.overlay(unrealized)
+    elif rows:
+        drawdown = drawdown_from_arrays(
+            _realized_in_exit_order(profit_loss, exit_time), quantity, avg_cost, current_price
+        )
+    else:
+        drawdown = dict(_EMPTY_DRAWDOWN)
+
     return {
-        "userId": user_id,
-        "timestamp": datetime.now().isoformat(),
         "overlays": {
-            "momentum": momentum,
+            "momentum": momentum_from_arrays(pos_symbols, avg_cost, current_price),
             "volatility": volatility,
             "concentration": concentration,
-            "drawdown": drawdown
+            "drawdown": drawdown,
         },
         "summary": {
-            "total_positions": len(positions),
-            "total_trades_analyzed": len(trades),
+            "total_positions": len(position_rows),
+            "total_trades_analyzed": len(trade_rows),
             "risk_level": concentration["concentration"]
         }
     }
+
+
+def get_strategy_overlays(user_id: int, db) -> Dict[str, Any]:
+    """
+    Main function to generate all strategy overlays from database
+    Positions and recent closed trades are fetched in a single CTE query;
+    drawdown comes from the user's running drawdown state and volatility from
+    the signal engine's realized-volatility tracker when its prices are real
+    """
+    from server.db.qmark import qmark
+    from server.logic.signal_engine import get_signal_engine
+    from server.services.drawdown_state import get_drawdown_state
+
+    stmt, params = qmark(_OVERLAY_QUERY, (user_id, user_id))
+    rows = [tuple(row) for row in db.execute(stmt, params).all()]
+    computed = compute_overlays_from_rows(rows, get_drawdown_state(db, user_id), get_signal_engine())
+
+    return {
+        "userId": user_id,
+        "timestamp": datetime.now().isoformat(),
+        "overlays": computed["overlays"],
+        "summary": computed["summary"]
+    }
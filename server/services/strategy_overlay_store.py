@@ -0,0 +1,211 @@
+"""
+Strategy Overlay Store - materialized per-user strategy overlays
+Each strategy_overlays row carries a data_version, bumped whenever the user's
+positions or trades change, and the computed_version its stored overlays were
+built from. Reads are a single primary-key lookup; background workers claim
+dirty users (data_version > computed_version) in batches with FOR UPDATE SKIP
+LOCKED and a lease, so several API workers never recompute the same user.
+"""
+import os
+import json
+import socket
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from server.db.qmark import qmark
+
+logger = logging.getLogger(__name__)
+
+OVERLAY_REFRESH_INTERVAL_SEC = float(os.getenv("OVERLAY_REFRESH_INTERVAL_SEC", "5"))
+OVERLAY_REFRESH_BATCH_SIZE = int(os.getenv("OVERLAY_REFRESH_BATCH_SIZE", "50"))
+OVERLAY_CLAIM_LEASE_SEC = float(os.getenv("OVERLAY_CLAIM_LEASE_SEC", "300"))
+
+
+def refresh_user(db, user_id: int) -> Dict[str, Any]:
+    """
+    Recompute and store one user's overlays
+
+    The version is read before computing; a write that lands mid-computation
+    bumps data_version past it and leaves the row dirty for the next pass.
+    """
+    from server.services.strategy_engine import get_strategy_overlays
+
+    stmt, params = qmark("SELECT data_version FROM strategy_overlays WHERE userId = ?", (user_id,))
+    row = db.execute(stmt, params).first()
+    version = int(row[0]) if row else 0
+
+    overlays = get_strategy_overlays(user_id, db)
+
+    stmt, params = qmark("""
+        INSERT INTO strategy_overlays (userId, data_version, computed_version, overlays, computed_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (userId)
+        DO UPDATE SET
+            computed_version = EXCLUDED.computed_version,
+            overlays = EXCLUDED.overlays,
+            computed_at = EXCLUDED.computed_at,
+            locked_by = NULL,
+            locked_at = NULL
+        WHERE strategy_overlays.computed_version <= EXCLUDED.computed_version
+    """, (user_id, version, version, json.dumps(overlays, default=str)))
+    db.execute(stmt, params)
+    db.commit()
+    return overlays
+
+
+def bump_symbol_holders(db, symbol: str) -> int:
+    """
+    Bump data_version for every user holding a symbol
+
+    Price bars do not write portfolio_positions, so the version triggers miss
+    them; this marks the holders' overlays (and risk reports) for recompute.
+
+    Returns:
+        Number of users bumped
+    """
+    stmt, params = qmark("""
+        INSERT INTO strategy_overlays (userId, data_version)
+        SELECT DISTINCT userId, 1 FROM portfolio_positions
+        WHERE symbol = ? AND quantity <> 0 AND userId IS NOT NULL
+        ON CONFLICT (userId)
+        DO UPDATE SET data_version = strategy_overlays.data_version + 1
+    """, (symbol,))
+    result = db.execute(stmt, params)
+    db.commit()
+    return result.rowcount
+
+
+def bump_symbol_holders_with_session(symbol: str) -> int:
+    from server.db.session import get_session
+
+    with get_session() as db:
+        return bump_symbol_holders(db, symbol)
+
+
+def get_overlays(db, user_id: int) -> Dict[str, Any]:
+    """
+    Stored overlays for a user (primary-key lookup)
+
+    Users never computed before are computed inline once; after that reads
+    return the last materialized overlays, with "stale" set while a recompute
+    is pending.
+    """
+    stmt, params = qmark("""
+        SELECT overlays, data_version, computed_version
+        FROM strategy_overlays
+        WHERE userId = ?
+    """, (user_id,))
+    row = db.execute(stmt, params).first()
+
+    if row is None or row[0] is None:
+        overlays = refresh_user(db, user_id)
+        overlays["stale"] = False
+        return overlays
+
+    overlays = json.loads(row[0]) if isinstance(row[0], str) else row[0]
+    overlays["stale"] = int(row[1]) > int(row[2])
+    return overlays
+
+
+def dirty_users(db, limit: int) -> List[int]:
+    """Users whose stored overlays are behind their data version, oldest first"""
+    stmt, params = qmark("""
+        SELECT userId FROM strategy_overlays
+        WHERE data_version > computed_version
+        ORDER BY computed_at NULLS FIRST
+        LIMIT ?
+    """, (limit,))
+    return [int(row[0]) for row in db.execute(stmt, params).all()]
+
+
+def claim_dirty(
+    db,
+    worker_id: str,
+    limit: int,
+    now: Optional[datetime] = None,
+    lease: float = OVERLAY_CLAIM_LEASE_SEC,
+) -> List[int]:
+    """
+    Claim up to limit dirty users for this worker, oldest first
+
+    Rows locked or claimed by other workers are skipped; a claim whose
+    lease expired (a crashed worker) becomes claimable again.
+    """
+    now = now or datetime.utcnow()
+    lock = " FOR UPDATE SKIP LOCKED" if db.get_bind().dialect.name == "postgresql" else ""
+    stmt, params = qmark(f"""
+        SELECT userId FROM strategy_overlays
+        WHERE data_version > computed_version
+          AND (locked_at IS NULL OR locked_at < ?)
+        ORDER BY computed_at NULLS FIRST
+        LIMIT ?{lock}
+    """, (now - timedelta(seconds=lease), limit))
+    user_ids = [int(row[0]) for row in db.execute(stmt, params).all()]
+    if user_ids:
+        placeholders = ", ".join("?" for _ in user_ids)
+        stmt, params = qmark(f"""
+            UPDATE strategy_overlays SET locked_by = ?, locked_at = ?
+            WHERE userId IN ({placeholders})
+        """, (worker_id, now, *user_ids))
+        db.execute(stmt, params)
+    db.commit()
+    return user_ids
+
+
+def release_claim(db, user_id: int) -> None:
+    """Return a user whose refresh failed to the dirty pool"""
+    stmt, params = qmark(
+        "UPDATE strategy_overlays SET locked_by = NULL, locked_at = NULL WHERE userId = ?", (user_id,)
+    )
+    db.execute(stmt, params)
+    db.commit()
+
+
+def refresh_dirty(db, worker_id: str, batch_size: int = OVERLAY_REFRESH_BATCH_SIZE) -> int:
+    """
+    Claim and recompute one batch of dirty users
+
+    Returns:
+        Number of users refreshed
+    """
+    refreshed = 0
+    for user_id in claim_dirty(db, worker_id, batch_size):
+        try:
+            refresh_user(db, user_id)
+            refreshed += 1
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Overlay refresh failed for user {user_id}: {e}")
+            release_claim(db, user_id)
+    return refreshed
+
+
+def _refresh_dirty_with_session(worker_id: str, batch_size: int) -> int:
+    from server.db.session import get_session
+
+    with get_session() as db:
+        return refresh_dirty(db, worker_id, batch_size)
+
+
+async def run_overlay_worker(
+    interval: float = OVERLAY_REFRESH_INTERVAL_SEC,
+    batch_size: int = OVERLAY_REFRESH_BATCH_SIZE,
+    stop_event: Optional[asyncio.Event] = None,
+) -> None:
+    """Refresh dirty users in batches until cancelled or stop_event is set"""
+    stop_event = stop_event or asyncio.Event()
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    while not stop_event.is_set():
+        try:
+            refreshed = await asyncio.to_thread(_refresh_dirty_with_session, worker_id, batch_size)
+        except Exception as e:
+            logger.error(f"Overlay worker pass failed: {e}")
+            refreshed = 0
+        # Drain backlogs without waiting; idle at the configured interval
+        if refreshed < batch_size:
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
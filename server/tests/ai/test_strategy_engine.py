@@ -106,3 +106,116 @@ def test_drawdown_lite_calculation():
     assert result["max_drawdown_pct"] > 0
     assert result["current_drawdown_pct"] >= 0
     assert result["peak_value"] > result["current_value"]
+
+
+@pytest.fixture
+def mock_signal_engine(tmp_path, monkeypatch):
+    """Process-wide signal engine on the synthetic mock provider and an empty store"""
+    from server.logic import signal_engine as signal_engine_module
+    from server.logic.price_providers import MockPriceProvider
+    from server.logic.price_store import PriceStore
+    from server.logic.signal_cache import SignalCache
+
+    engine = signal_engine_module.SignalEngine(
+        price_store=PriceStore(str(tmp_path)), signal_cache=SignalCache(), provider=MockPriceProvider()
+    )
+    monkeypatch.setattr(signal_engine_module, "_engine", engine)
+    return engine
+
+
+def test_strategy_overlays_single_query_matches_calculators(mock_signal_engine):
+    """Overlays from the CTE query match the per-list calculators"""
+    import statistics
+    from sqlalchemy import create_engine, text
+    from server.services.strategy_engine import get_strategy_overlays
+
+    engine = create_engine("sqlite://")
+    positions = [
+        {"symbol": "AAPL", "quantity": 100, "avgCost": 150, "currentPrice": 160},
+        {"symbol": "MSFT", "quantity": 50, "avgCost": 300, "currentPrice": 240},
+    ]
+    trades = [
+        {"symbol": "AAPL", "entry_price": 100, "exit_price": 104, "profit_loss": 400, "exit_time": "2024-01-03"},
+        {"symbol": "AAPL", "entry_price": 104, "exit_price": 99, "profit_loss": -500, "exit_time": "2024-01-02"},
+        {"symbol": "AAPL", "entry_price": 99, "exit_price": 120, "profit_loss": 2100, "exit_time": "2024-01-01"},
+    ]
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE portfolio_positions (userId INT, symbol TEXT, quantity REAL, avgCost REAL, currentPrice REAL)"))
+        conn.execute(text(
+            "CREATE TABLE trades (userId INT, symbol TEXT, trade_type TEXT, entry_price REAL, exit_price REAL, "
+            "quantity REAL, profit_loss REAL, entry_time TEXT, exit_time TEXT, status TEXT)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE drawdown_state (userId INTEGER PRIMARY KEY, equity REAL, peak REAL, "
+            "max_drawdown REAL, trade_count INTEGER, last_exit_time TIMESTAMP, updated_at TIMESTAMP)"
+        ))
+        for user_id in (1, 2):
+            conn.execute(
+                text("INSERT INTO portfolio_positions VALUES (:u, :symbol, :quantity, :avgCost, :currentPrice)"),
+                [{"u": user_id, **p} for p in positions],
+            )
+            conn.execute(
+                text("INSERT INTO trades (userId, symbol, entry_price, exit_price, profit_loss, exit_time, status) "
+                     "VALUES (:u, :symbol, :entry_price, :exit_price, :profit_loss, :exit_time, 'closed')"),
+                [{"u": user_id, **t} for t in trades],
+            )
+
+    with engine.connect() as conn:
+        result = get_strategy_overlays(1, conn)
+
+    assert result["summary"]["total_positions"] == 2
+    assert result["summary"]["total_trades_analyzed"] == 3
+    assert result["overlays"]["concentration"] == calculate_concentration(positions)
+    assert result["overlays"]["momentum"] == calculate_momentum_buckets(positions)
+    assert result["overlays"]["volatility"] == calculate_volatility_class(trades, positions)
+    # Population std of AAPL trade returns in percent; trades arrive newest
+    # first and, as in calculate_volatility_class, the last one is not paired
+    returns = [104 / 100 - 1, 99 / 104 - 1]
+    aapl = result["overlays"]["volatility"]["volatility_by_symbol"]["AAPL"]
+    assert aapl["value"] == pytest.approx(statistics.pstdev(returns) * 100)
+    assert (aapl["class"], aapl["trade_count"]) == ("low", 3)
+    assert "MSFT" not in result["overlays"]["volatility"]["volatility_by_symbol"]
+    expected_drawdown = calculate_drawdown_lite(trades, positions)
+    for key in ("max_drawdown_pct", "current_drawdown_pct", "peak_value", "current_value"):
+        assert result["overlays"]["drawdown"][key] == pytest.approx(expected_drawdown[key])
+
+
+def test_overlay_volatility_uses_tracker_for_real_prices(tmp_path):
+    """Observed price history drives overlay volatility; synthetic history falls back to trades"""
+    import numpy as np
+    from server.logic.price_providers import MockPriceProvider, StoreOnlyProvider
+    from server.logic.price_store import PriceStore
+    from server.logic.signal_cache import SignalCache
+    from server.logic.signal_engine import SignalEngine
+    from server.services.strategy_engine import compute_overlays_from_rows, volatility_from_tracker
+
+    store = PriceStore(str(tmp_path))
+    rng = np.random.default_rng(7)
+    prices = 100 * np.cumprod(1 + rng.normal(0, 0.02, 120))
+    store.extend("AAPL", np.arange(120) * 86400, prices, np.ones(120))
+    rows = [
+        ("P", "AAPL", 10, 90.0, 100.0, None, None, None, None),
+        ("P", "XYZ", 5, 20.0, 25.0, None, None, None, None),
+        ("T", "AAPL", 1, None, None, 100.0, 104.0, 4.0, "2024-01-02"),
+        ("T", "AAPL", 1, None, None, 104.0, 99.0, -5.0, "2024-01-01"),
+    ]
+
+    real = SignalEngine(price_store=store, signal_cache=SignalCache(), provider=StoreOnlyProvider())
+    volatility = compute_overlays_from_rows(rows, volatility_engine=real)["overlays"]["volatility"]
+    assert volatility == volatility_from_tracker(["AAPL", "XYZ"], np.array([1000.0, 125.0]), real)
+    assert volatility["volatility_by_symbol"]["AAPL"]["observations"] > 0
+    assert volatility["volatility_by_symbol"]["XYZ"] == {"class": "unknown", "value": 0}
+
+    synthetic = SignalEngine(price_store=store, signal_cache=SignalCache(), provider=MockPriceProvider())
+    fallback = compute_overlays_from_rows(rows, volatility_engine=synthetic)["overlays"]["volatility"]
+    assert fallback == compute_overlays_from_rows(rows)["overlays"]["volatility"]
+    assert fallback["volatility_by_symbol"]["AAPL"]["trade_count"] == 2
+
+
+def test_overlay_query_placeholders_are_typed():
+    """Every NULL placeholder in the UNION is cast, or PostgreSQL resolves it as text"""
+    import re
+    from server.services.strategy_engine import _OVERLAY_QUERY
+
+    assert re.findall(r"(?<!CAST\()NULL\s+AS", _OVERLAY_QUERY) == []
+    assert len(re.findall(r"CAST\(NULL AS (?:NUMERIC|TIMESTAMP)\)", _OVERLAY_QUERY)) == 6
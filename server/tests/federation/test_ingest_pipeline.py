@@ -11,12 +11,17 @@ os.environ.setdefault("STACKMOTIVE_DEV_MODE", "true")
 repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 sys.path.insert(0, repo_root)
 
+import asyncio
+import time
+
 import pytest
 from sqlalchemy import text
 
 from server.database import get_db
+from server.services import ingest_pipeline
 from server.services.ingest_pipeline import (
     start_sync,
+    run_full_sync,
     compute_content_hash,
     check_duplicate_digest
 )
@@ -78,3 +83,51 @@ def test_compute_content_hash():
     
     assert hash1 == hash2
     assert len(hash1) == 64
+
+
+@pytest.mark.asyncio
+async def test_run_full_sync_runs_sources_concurrently(monkeypatch):
+    """Sources overlap up to SYNC_MAX_CONCURRENCY and fail independently"""
+    sources = [
+        {"id": 1, "source_type": "ibkr_flex", "enabled": True, "config": {}},
+        {"id": 2, "source_type": "kucoin", "enabled": True, "config": {}},
+        {"id": 3, "source_type": "ibkr_flex", "enabled": True, "config": {"fail": True}},
+        {"id": 4, "source_type": "csv", "enabled": True, "config": {}},
+    ]
+    sessions = []
+    in_flight = 0
+    peak = 0
+
+    async def fake_ingest(db, sync_run_id, user_id, source_id, config):
+        nonlocal in_flight, peak
+        sessions.append(db)
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.2)
+        in_flight -= 1
+        if config.get("fail"):
+            raise RuntimeError("boom")
+        return {"imported": source_id}
+
+    monkeypatch.setattr(ingest_pipeline, "list_sources", lambda db, user_id: sources)
+    monkeypatch.setattr(ingest_pipeline, "ingest_ibkr_source", fake_ingest)
+    monkeypatch.setattr(ingest_pipeline, "ingest_kucoin_source", fake_ingest)
+    monkeypatch.setattr(ingest_pipeline, "SYNC_MAX_CONCURRENCY", 3)
+
+    db = next(get_db())
+    try:
+        started = time.monotonic()
+        result = await run_full_sync(db, user_id=1)
+        elapsed = time.monotonic() - started
+    finally:
+        db.close()
+
+    assert peak == 3
+    assert elapsed < 0.5
+    assert len({id(s) for s in sessions}) == 3
+    assert db not in sessions
+    assert result["status"] == "partial"
+    assert result["stats"]["sources_processed"] == 2
+    assert result["stats"]["sources_failed"] == 1
+    assert result["stats"]["positions_imported"] == 3
+    assert result["stats"]["errors"] == ["ibkr_flex: boom"]
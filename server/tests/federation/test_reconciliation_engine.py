@@ -29,12 +29,31 @@ def test_db():
                 sync_run_id TEXT NOT NULL,
                 user_id INTEGER NOT NULL,
                 source_id INTEGER NOT NULL,
+                account TEXT,
                 symbol TEXT NOT NULL,
                 quantity REAL NOT NULL,
                 avg_cost REAL,
+                currency TEXT,
                 as_of TIMESTAMP,
+                fingerprint TEXT,
                 source_type TEXT,
-                priority INTEGER
+                priority INTEGER,
+                change_type TEXT NOT NULL DEFAULT 'upsert'
+            )
+        """))
+        
+        conn.execute(text("""
+            CREATE TABLE source_position_snapshots (
+                source_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                account TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                quantity REAL,
+                avg_cost REAL,
+                currency TEXT,
+                as_of TIMESTAMP,
+                fingerprint TEXT,
+                PRIMARY KEY (source_id, account, symbol)
             )
         """))
         
@@ -139,3 +158,96 @@ def test_reconcile_priority_wins(test_db):
     
     assert result.quantity == 100
     assert result.source == "ibkr_flex"
+
+
+def _seed_sources(db):
+    db.execute(text("INSERT INTO data_sources (id, user_id, source_type, priority) VALUES (1, 1, 'ibkr_flex', 50)"))
+    db.execute(text("INSERT INTO data_sources (id, user_id, source_type, priority) VALUES (2, 1, 'csv', 100)"))
+
+
+def _snapshot(db, source_id, account, symbol, quantity):
+    db.execute(
+        text("""
+            INSERT INTO source_position_snapshots (source_id, user_id, account, symbol, quantity, avg_cost, as_of)
+            VALUES (:source_id, 1, :account, :symbol, :quantity, 10.0, '2025-10-06')
+        """),
+        {"source_id": source_id, "account": account, "symbol": symbol, "quantity": quantity}
+    )
+
+
+def _canonical(db, symbol, quantity, source):
+    db.execute(
+        text("INSERT INTO portfolio_positions (userId, symbol, quantity, avgCost, source) VALUES (1, :s, :q, 10.0, :src)"),
+        {"s": symbol, "q": quantity, "src": source}
+    )
+
+
+def _stage_delete(db, source_id, account, symbol):
+    db.execute(
+        text("""
+            INSERT INTO positions_staging (sync_run_id, user_id, source_id, account, symbol, quantity, change_type)
+            VALUES ('delta-sync', 1, :source_id, :account, :symbol, 0, 'delete')
+        """),
+        {"source_id": source_id, "account": account, "symbol": symbol}
+    )
+
+
+def test_reconcile_delta_unchanged_source_competes(test_db):
+    """A source that staged nothing still competes through its snapshot row"""
+    _seed_sources(test_db)
+    _snapshot(test_db, 2, "csv", "AAPL", 200)
+    test_db.execute(
+        text("""
+            INSERT INTO positions_staging (sync_run_id, user_id, source_id, account, symbol, quantity, avg_cost, as_of)
+            VALUES ('delta-sync', 1, 1, 'U1', 'AAPL', 100, 150.0, '2025-10-07')
+        """)
+    )
+    test_db.commit()
+    
+    reconcile_positions(test_db, "delta-sync", user_id=1)
+    
+    result = test_db.execute(text("SELECT quantity, source FROM portfolio_positions WHERE symbol = 'AAPL'")).fetchone()
+    assert (result.quantity, result.source) == (100, "ibkr_flex")
+
+
+def test_reconcile_delta_removal_falls_back_to_other_source(test_db):
+    """A symbol dropped by one source is taken from another source still reporting it"""
+    _seed_sources(test_db)
+    _snapshot(test_db, 2, "csv", "AAPL", 200)
+    _canonical(test_db, "AAPL", 100, "ibkr_flex")
+    _stage_delete(test_db, 1, "U1", "AAPL")
+    test_db.commit()
+    
+    summary = reconcile_positions(test_db, "delta-sync", user_id=1)
+    
+    assert summary["removed"] == 0
+    result = test_db.execute(text("SELECT quantity, source FROM portfolio_positions WHERE symbol = 'AAPL'")).fetchone()
+    assert (result.quantity, result.source) == (200, "csv")
+
+
+def test_reconcile_delta_removal_is_scoped_to_account_and_source(test_db):
+    """Removing one account's row keeps the symbol if another account still holds it"""
+    _seed_sources(test_db)
+    _snapshot(test_db, 1, "U2", "AAPL", 30)
+    _canonical(test_db, "AAPL", 100, "ibkr_flex")
+    _canonical(test_db, "MSFT", 5, "manual")
+    _stage_delete(test_db, 1, "U1", "AAPL")
+    _stage_delete(test_db, 1, "U1", "MSFT")
+    test_db.commit()
+    
+    summary = reconcile_positions(test_db, "delta-sync", user_id=1)
+    
+    assert summary["removed"] == 0
+    rows = test_db.execute(text("SELECT symbol, quantity, source FROM portfolio_positions ORDER BY symbol")).fetchall()
+    assert [tuple(r) for r in rows] == [("AAPL", 30, "ibkr_flex"), ("MSFT", 5, "manual")]
+    
+    test_db.execute(text("DELETE FROM source_position_snapshots"))
+    test_db.execute(text("DELETE FROM positions_staging"))
+    _stage_delete(test_db, 1, "U2", "AAPL")
+    test_db.commit()
+    
+    summary = reconcile_positions(test_db, "delta-sync", user_id=1)
+    
+    assert summary["removed"] == 1
+    rows = test_db.execute(text("SELECT symbol FROM portfolio_positions ORDER BY symbol")).fetchall()
+    assert [r[0] for r in rows] == ["MSFT"]
@@ -11,6 +11,7 @@ import pytest
 from unittest.mock import patch, MagicMock, AsyncMock
 from server.services import ingest_orchestrator
 from server.db.qmark import qmark
+from sqlalchemy import text
 
 
 @pytest.fixture
@@ -61,33 +62,45 @@ def mock_kucoin_payload():
 
 @pytest.fixture
 def test_db():
-    """Mock database session for testing"""
-    class MockResult:
-        def __init__(self, data):
-            self.data = data
-        
-        def mappings(self):
-            return self
-        
-        def first(self):
-            return self.data[0] if self.data else None
-        
-        def all(self):
-            return self.data
-    
-    class MockDB:
-        def __init__(self):
-            self.committed = False
-            self.executed_statements = []
-        
-        def execute(self, stmt, params):
-            self.executed_statements.append((stmt, params))
-            return MockResult([])
-        
-        def commit(self):
-            self.committed = True
+    """In-memory SQLite session with the tables the orchestrator writes"""
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import sessionmaker
     
-    return MockDB()
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE portfolio_positions (
+                id INTEGER PRIMARY KEY, userId INTEGER, symbol TEXT, name TEXT,
+                quantity REAL, avgCost REAL, currentPrice REAL, assetClass TEXT,
+                account TEXT, currency TEXT, source TEXT, asOf TEXT,
+                lastUpdated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (userId, symbol, account)
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE cash_events (
+                id INTEGER PRIMARY KEY, userId INTEGER, eventType TEXT, amount REAL,
+                currency TEXT, eventDate TEXT, source TEXT, accountId TEXT
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE data_sources (
+                id INTEGER PRIMARY KEY, user_id INTEGER, source_type TEXT, priority INTEGER,
+                enabled BOOLEAN, config TEXT, created_at TIMESTAMP
+            )
+        """))
+        conn.execute(text("""
+            INSERT INTO data_sources (user_id, source_type, priority, enabled, config)
+            VALUES (1, 'ibkr_flex', 50, 1, '{"flex_token": "tok-1", "flex_query_id": "q-1"}')
+        """))
+        conn.execute(text("""
+            CREATE TABLE import_digests (
+                importId INTEGER PRIMARY KEY, userId INTEGER, source TEXT, digest TEXT, metadata TEXT
+            )
+        """))
+    db = sessionmaker(bind=engine)()
+    yield db
+    db.close()
 
 
 @pytest.mark.asyncio
@@ -98,12 +111,35 @@ async def test_ibkr_ingest_to_positions(mock_ibkr_payload, test_db):
         
         result = await ingest_orchestrator.ingest_ibkr(user_id=1, db=test_db)
         
+        credentials = mock_fetch.call_args.args[0]
+        assert (credentials.token, credentials.query_id) == ("tok-1", "q-1")
         assert result["positions"] == 1
         assert result["cashEvents"] == 2
-        assert test_db.committed is True
         
-        executed_inserts = [stmt for stmt, _ in test_db.executed_statements if "INSERT INTO portfolio_positions" in str(stmt)]
-        assert len(executed_inserts) >= 1
+        rows = test_db.execute(text("SELECT symbol, quantity, currentPrice, assetClass FROM portfolio_positions")).all()
+        assert [tuple(r) for r in rows] == [("AAPL", 10.0, 180.0, "equity")]
+        cash = test_db.execute(text("SELECT currency, amount FROM cash_events ORDER BY currency")).all()
+        assert [tuple(r) for r in cash] == [("NZD", 2000.0), ("USD", 5000.0)]
+
+
+@pytest.mark.asyncio
+async def test_ibkr_ingest_upserts_in_bulk(mock_ibkr_payload, test_db):
+    """Re-importing updates existing positions through the staged merge"""
+    with patch('server.services.ibkr_flex_service.get_ibkr_portfolio_payload', new_callable=AsyncMock) as mock_fetch:
+        mock_fetch.return_value = mock_ibkr_payload
+        await ingest_orchestrator.ingest_ibkr(user_id=1, db=test_db)
+        
+        positions = mock_ibkr_payload["portfolio"]["positions"]
+        positions[0] = {**positions[0], "quantity": 12.0, "markPrice": 190.0}
+        positions.append({"symbol": "MSFT", "description": "Microsoft", "quantity": 5.0, "markPrice": 400.0})
+        mock_ibkr_payload["asOf"] = "2025-10-08T12:00:00"
+        result = await ingest_orchestrator.ingest_ibkr(user_id=1, db=test_db)
+    
+    assert result["positions"] == 2
+    rows = test_db.execute(text("SELECT symbol, quantity, currentPrice FROM portfolio_positions ORDER BY symbol")).all()
+    assert [tuple(r) for r in rows] == [("AAPL", 12.0, 190.0), ("MSFT", 5.0, 400.0)]
+    tables = test_db.execute(text("SELECT name FROM sqlite_temp_master WHERE type = 'table'")).all()
+    assert tables == []
 
 
 @pytest.mark.asyncio
@@ -117,7 +153,9 @@ async def test_kucoin_ingest_to_positions(mock_kucoin_payload, test_db):
         
         assert result["positions"] == 1
         assert result["cashEvents"] == 1
-        assert test_db.committed is True
+        
+        rows = test_db.execute(text("SELECT symbol, quantity, account, assetClass FROM portfolio_positions")).all()
+        assert [tuple(r) for r in rows] == [("BTC", 0.5, "trade", "crypto")]
 
 
 @pytest.mark.asyncio
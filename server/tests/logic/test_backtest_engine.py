@@ -0,0 +1,103 @@
+"""
+Tests for backtest_engine.py
+Vectorized fills and P&L checked against a simple bar-by-bar reference
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import time
+
+import numpy as np
+import pytest
+
+from server.logic import indicator_kernel
+from server.logic.backtest_engine import (
+    run_backtest,
+    positions_from_masks,
+    BacktestError,
+)
+
+
+def _prices(n=2520, seed=3):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.cumprod(1 + rng.normal(0.0003, 0.015, n))
+    volumes = rng.uniform(1e5, 5e5, n)
+    return closes, volumes
+
+
+def _reference_equity(closes, entry, exit, capital=10000.0):
+    """Bar-by-bar loop: decide on the close, hold from the next bar"""
+    equity = [capital]
+    holding = False
+    for i in range(1, len(closes)):
+        value = equity[-1] * (closes[i] / closes[i - 1]) if holding else equity[-1]
+        equity.append(value)
+        if exit[i]:
+            holding = False
+        elif entry[i]:
+            holding = True
+    return np.array(equity)
+
+
+def test_positions_from_masks_carries_state_forward():
+    entry = np.array([False, True, False, False, False, True])
+    exit = np.array([False, False, False, True, False, False])
+    assert positions_from_masks(entry, exit).tolist() == [0, 0, 1, 1, 0, 0]
+
+
+def test_rolling_indicators_match_prefix_evaluation():
+    closes, _ = _prices(120)
+    rsi = indicator_kernel.rsi_series(closes)[0]
+    ma = indicator_kernel.rolling_mean(closes, 20)[0]
+    for t in (10, 15, 60, 119):
+        assert rsi[t] == pytest.approx(indicator_kernel.rsi(closes[:t + 1])[0])
+        assert ma[t] == pytest.approx(indicator_kernel.moving_average(closes[:t + 1], 20)[0])
+
+
+@pytest.mark.parametrize("strategy", ["RSI Rebound", "Momentum Buy", "Trend Exit"])
+def test_equity_matches_reference_loop(strategy):
+    closes, volumes = _prices(500)
+    if strategy == "RSI Rebound":
+        rsi = indicator_kernel.rsi_series(closes)[0]
+        entry, exit = rsi < 30, rsi > 70
+    else:
+        period = 50 if strategy == "Momentum Buy" else 20
+        ma = indicator_kernel.rolling_mean(closes, period)[0]
+        entry, exit = closes > ma, closes < ma
+
+    result = run_backtest(strategy, closes, volumes)
+    np.testing.assert_allclose(result["equity_curve"], _reference_equity(closes, entry, exit))
+
+    for trade in result["trades"]:
+        assert trade["exit_index"] > trade["entry_index"]
+    assert result["stats"]["trade_count"] == len(result["trades"])
+
+
+def test_fees_reduce_returns():
+    closes, volumes = _prices(500)
+    free = run_backtest("Trend Exit", closes, volumes)
+    costly = run_backtest("Trend Exit", closes, volumes, fee_bps=10)
+    assert costly["equity_curve"][-1] < free["equity_curve"][-1]
+
+
+def test_dca_accumulates_fixed_amounts():
+    closes = np.full(21, 10.0)
+    result = run_backtest("DCA Weekly", closes, params={"interval_bars": 7, "amount": 100.0})
+    assert result["stats"]["invested"] == 300.0
+    assert result["stats"]["final_value"] == 300.0
+    assert len(result["trades"]) == 3
+
+
+def test_unknown_strategy_raises():
+    with pytest.raises(BacktestError, match="Unknown strategy"):
+        run_backtest("Moon Shot", np.array([1.0, 2.0]))
+
+
+def test_decade_of_daily_bars_is_fast():
+    closes, volumes = _prices(2520)
+    start = time.perf_counter()
+    for strategy in ["RSI Rebound", "Momentum Buy", "Trend Exit", "DCA Weekly"]:
+        run_backtest(strategy, closes, volumes)
+    assert time.perf_counter() - start < 1.0
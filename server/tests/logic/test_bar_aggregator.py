@@ -0,0 +1,120 @@
+"""
+Tests for bar_aggregator.py
+Cascaded bars must equal bars built directly from the raw ticks
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import random
+
+import pytest
+
+from server.logic.bar_aggregator import BarAggregator
+from server.logic.price_store import PriceStore
+from server.logic.signal_engine import SignalEngine
+
+DAY = 86400
+
+
+def _ticks(start, seconds, step=7, seed=1):
+    rng = random.Random(seed)
+    price = 100.0
+    ticks = []
+    for ts in range(start, start + seconds, step):
+        price *= 1 + rng.uniform(-0.001, 0.001)
+        ticks.append((ts, price, rng.uniform(1, 10)))
+    return ticks
+
+
+def _direct_bars(ticks, seconds):
+    bars = {}
+    for ts, price, size in ticks:
+        start = ts - ts % seconds
+        bar = bars.get(start)
+        if bar is None:
+            bars[start] = {"start": start, "open": price, "high": price, "low": price, "close": price, "volume": size}
+        else:
+            bar["high"] = max(bar["high"], price)
+            bar["low"] = min(bar["low"], price)
+            bar["close"] = price
+            bar["volume"] += size
+    return [bars[k] for k in sorted(bars)]
+
+
+@pytest.mark.parametrize("timeframe,seconds", [("1m", 60), ("5m", 300), ("1h", 3600)])
+def test_cascade_matches_direct_aggregation(timeframe, seconds):
+    ticks = _ticks(10 * DAY, 3 * 3600)
+    aggregator = BarAggregator("TEST")
+    for ts, price, size in ticks:
+        aggregator.ingest(ts, price, size)
+    aggregator.advance(10 * DAY + 4 * 3600)
+
+    expected = _direct_bars(ticks, seconds)
+    actual = aggregator.bars(timeframe)
+    assert len(actual) == len(expected)
+    for got, want in zip(actual, expected):
+        assert got["start"] == want["start"]
+        assert got["open"] == want["open"]
+        assert got["high"] == want["high"]
+        assert got["low"] == want["low"]
+        assert got["close"] == want["close"]
+        assert got["volume"] == pytest.approx(want["volume"])
+
+
+def test_partial_bar_and_timeframe_indicators():
+    aggregator = BarAggregator("TEST")
+    for ts, price, size in _ticks(0, 30 * 60):
+        aggregator.ingest(ts, price, size)
+
+    assert len(aggregator.bars("5m")) == 5
+    assert len(aggregator.bars("5m", include_partial=True)) == 6
+    data = aggregator.signal_data("1m")
+    assert data["timeframe"] == "1m"
+    with pytest.raises(ValueError, match="No completed 1h bars"):
+        aggregator.signal_data("1h")
+    with pytest.raises(ValueError, match="Unsupported timeframe"):
+        aggregator.bars("4h")
+
+
+def test_late_ticks_are_dropped_without_closing_bars():
+    ticks = _ticks(10 * DAY, 3600)
+    aggregator = BarAggregator("TEST")
+    late = []
+    for i, (ts, price, size) in enumerate(ticks):
+        aggregator.ingest(ts, price, size)
+        if i % 20 == 19:
+            # A straggler from two minutes ago, after its 1m bar was closed
+            late_tick = (ts - 120, price * 1.5, 1000.0)
+            late.append(late_tick)
+            aggregator.ingest(*late_tick)
+    aggregator.advance(10 * DAY + 2 * 3600)
+
+    assert aggregator.series[0].late_dropped == len(late)
+    assert aggregator.bars("1m") == _direct_bars(ticks, 60)
+    assert len(aggregator.bars("5m")) == len(_direct_bars(ticks, 300))
+    for got, want in zip(aggregator.bars("5m"), _direct_bars(ticks, 300)):
+        assert (got["start"], got["high"], got["close"]) == (want["start"], want["high"], want["close"])
+        assert got["volume"] == pytest.approx(want["volume"])
+
+    # Once a bar is complete (no partial open), a tick for it is still dropped
+    completed = len(aggregator.bars("1m"))
+    aggregator.ingest(10 * DAY + 30, 1.0, 1.0)
+    assert len(aggregator.bars("1m")) == completed
+    assert aggregator.bars("1m", include_partial=True) == aggregator.bars("1m")
+
+
+def test_engine_daily_close_appends_to_store(tmp_path):
+    engine = SignalEngine(price_store=PriceStore(str(tmp_path)))
+    engine.ensure_symbol("BTC")
+    before = engine.price_store.length("BTC")
+
+    engine.ingest_tick("BTC", 20 * DAY + 10, 96000.0, 2.0)
+    engine.ingest_tick("BTC", 20 * DAY + 4000, 97000.0, 1.0)
+    engine.ingest_tick("BTC", 21 * DAY + 5, 98000.0, 1.0)
+
+    assert engine.price_store.length("BTC") == before + 1
+    assert engine.price_store.last_n("BTC", 1)["price"][0] == 97000.0
+    assert engine.get_timeframe_signal_data("BTC", "1h")["current_price"] == 97000.0
+    assert engine.get_timeframe_signal_data("BTC", "1d")["current_price"] == 97000.0
@@ -0,0 +1,79 @@
+"""
+Tests for indicator_kernel.py
+Batched results must match the scalar SignalEngine calculations
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import numpy as np
+import pytest
+
+from server.logic import indicator_kernel
+from server.logic.price_store import PriceStore
+from server.logic.signal_engine import SignalEngine
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = SignalEngine(price_store=PriceStore(str(tmp_path)))
+    engine.prewarm()
+    return engine
+
+
+def _matrix(engine, field):
+    store = engine.price_store
+    return np.stack([store.last_n(symbol)[field] for symbol in store.symbols()])
+
+
+def test_kernel_matches_scalar_indicators(engine):
+    """Every row of the batched kernel equals the per-symbol scalar result"""
+    closes = _matrix(engine, "price")
+    volumes = _matrix(engine, "volume")
+    indicators = indicator_kernel.compute_indicators(closes, volumes)
+
+    for row, prices in enumerate(closes.tolist()):
+        assert indicators["rsi"][row] == pytest.approx(engine._calculate_rsi(prices))
+        assert indicators["macd"][row] == pytest.approx(engine._calculate_macd(prices), abs=1e-9)
+        assert indicators["ma20"][row] == pytest.approx(engine._calculate_moving_average(prices, 20))
+        assert indicators["ma50"][row] == pytest.approx(engine._calculate_moving_average(prices, 50))
+        assert indicators["volume_7d_avg"][row] == pytest.approx(sum(volumes[row][-7:]) / 7)
+
+
+def test_kernel_short_history_defaults():
+    """Insufficient history falls back to neutral RSI and zero MACD"""
+    closes = np.array([[1.0, 2.0, 3.0], [3.0, 2.0, 1.0]])
+    indicators = indicator_kernel.compute_indicators(closes)
+
+    assert indicators["rsi"].tolist() == [50.0, 50.0]
+    assert indicators["macd"].tolist() == [0.0, 0.0]
+    assert indicators["ma20"].tolist() == [2.0, 2.0]
+
+
+def test_rsi_no_losses_is_100():
+    closes = np.arange(1, 31, dtype=np.float64)
+    assert indicator_kernel.rsi(closes)[0] == 100.0
+
+
+def test_signal_data_batch_covers_universe(engine):
+    """Batch evaluation returns the same payload as single-symbol lookups"""
+    batch = engine.get_signal_data_batch()
+
+    assert set(batch) == set(engine.price_store.symbols())
+    single = engine.get_signal_data("ETH")
+    assert single["rsi"] == batch["ETH"]["rsi"]
+    assert single["ma50"] == batch["ETH"]["ma50"]
+
+
+def test_check_strategy_signals_batch(engine):
+    results = engine.check_strategy_signals_batch(["BTC", "SOL"])
+
+    assert set(results) == {"BTC", "SOL"}
+    assert set(results["SOL"]["triggers"]) == {"rsi_rebound", "momentum_buy", "trend_exit", "volume_spike"}
+    assert results["SOL"]["triggers"]["momentum_buy"]["target_asset"] == "SOL"
+
+
+def test_unsupported_symbol_raises(engine):
+    with pytest.raises(ValueError, match="not supported"):
+        engine.get_signal_data("NOPE")
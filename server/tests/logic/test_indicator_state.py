@@ -0,0 +1,107 @@
+"""
+Tests for indicator_state.py
+Streaming updates must agree with full recomputation
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import json
+import random
+
+import numpy as np
+import pytest
+
+from server.logic import indicator_kernel
+from server.logic.indicator_state import IndicatorState, RollingWindow
+from server.logic.price_store import PriceStore
+from server.logic.signal_engine import SignalEngine, SIGNAL_LOOKBACK_BARS
+
+
+def _series(n=120, seed=7):
+    rng = random.Random(seed)
+    price = 100.0
+    prices, volumes = [], []
+    for _ in range(n):
+        price *= 1 + rng.uniform(-0.02, 0.02)
+        prices.append(price)
+        volumes.append(rng.uniform(1000, 5000))
+    return prices, volumes
+
+
+def test_streaming_matches_batch_recompute():
+    prices, volumes = _series()
+    state = IndicatorState("TEST")
+    for p, v in zip(prices, volumes):
+        state.append(p, v)
+
+    closes = np.array(prices)
+    assert state.macd == pytest.approx(indicator_kernel.macd(closes)[0])
+    assert state.ma20.mean() == pytest.approx(indicator_kernel.moving_average(closes, 20)[0])
+    assert state.ma50.mean() == pytest.approx(indicator_kernel.moving_average(closes, 50)[0])
+    assert state.rsi == pytest.approx(indicator_kernel.rsi(closes)[0])
+
+
+def test_flat_prices_match_kernel_rsi():
+    state = IndicatorState("FLAT")
+    for price in [100.0, 101.0, 102.0] + [102.0] * 14:
+        state.append(price)
+    assert state.rsi == indicator_kernel.rsi(np.array([100.0, 101.0, 102.0] + [102.0] * 14))[0] == 100.0
+
+
+def test_streamed_payload_matches_batch_payload(tmp_path):
+    engine = SignalEngine(price_store=PriceStore(str(tmp_path)))
+    batch = engine.get_signal_data("BTC")
+    history = engine.price_store.last_n("BTC", SIGNAL_LOOKBACK_BARS)
+    state = IndicatorState.from_columns("BTC", history["price"], history["volume"])
+    streamed = state.signal_data()
+
+    assert streamed.keys() == batch.keys()
+    for key in batch:
+        if key != "timestamp":
+            assert type(streamed[key]) is type(batch[key]), key
+            assert streamed[key] == pytest.approx(batch[key], abs=0.011), key
+
+
+def test_rolling_window_wraps():
+    window = RollingWindow(3)
+    for value in [1, 2, 3, 4, 5]:
+        window.push(value)
+    assert window.mean() == pytest.approx(4.0)
+    assert window.count == 3
+
+
+def test_snapshot_roundtrip_continues_identically():
+    prices, volumes = _series()
+    original = IndicatorState("TEST")
+    for p, v in zip(prices[:80], volumes[:80]):
+        original.append(p, v)
+
+    restored = IndicatorState.from_dict(json.loads(json.dumps(original.to_dict())))
+    for p, v in zip(prices[80:], volumes[80:]):
+        original.append(p, v)
+        restored.append(p, v)
+
+    assert restored.signal_data() == original.signal_data()
+
+
+def test_engine_append_bar_updates_signal_data(tmp_path):
+    engine = SignalEngine(price_store=PriceStore(str(tmp_path)))
+    before = engine.get_signal_data("BTC")
+
+    updated = engine.append_bar("BTC", before["current_price"] * 1.5, before["volume"] * 3)
+
+    assert updated["current_price"] == pytest.approx(before["current_price"] * 1.5)
+    assert engine.get_signal_data("BTC")["current_price"] == updated["current_price"]
+    assert "BTC" in engine.snapshot_stream_states()
+
+
+def test_engine_restore_stream_states(tmp_path):
+    engine = SignalEngine(price_store=PriceStore(str(tmp_path / "a")))
+    engine.append_bar("ETH", 3600.0, 1_500_000)
+    snapshot = engine.snapshot_stream_states()
+
+    fresh = SignalEngine(price_store=PriceStore(str(tmp_path / "b")))
+    fresh.restore_stream_states(snapshot)
+    assert fresh.get_signal_data("ETH")["current_price"] == 3600.0
@@ -0,0 +1,120 @@
+"""
+Tests for parameter_sweep.py
+Process-pool grid search over shared-memory price arrays
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import numpy as np
+import pytest
+
+from server.logic.backtest_engine import run_backtest, BacktestError
+from server.logic.parameter_sweep import expand_grid, sweep, optimize, SharedArrays
+from server.logic.price_store import PriceStore
+from server.logic.signal_engine import SignalEngine
+
+
+def _prices(n=750, seed=11):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.cumprod(1 + rng.normal(0.0002, 0.02, n))
+    volumes = rng.uniform(1e5, 5e5, n)
+    return closes, volumes
+
+
+def test_expand_grid():
+    grid = expand_grid({"rsi_entry": [20, 30], "rsi_exit": [60, 70, 80]})
+    assert len(grid) == 6
+    assert {"rsi_entry": 20, "rsi_exit": 80} in grid
+
+
+def test_shared_arrays_roundtrip():
+    closes, _ = _prices(10)
+    with SharedArrays({"closes": closes}) as descriptors:
+        name, shape, dtype = descriptors["closes"]
+        assert shape == (10,)
+        assert np.dtype(dtype) == np.float64
+
+
+def test_worker_segments_close_on_exit():
+    from server.logic import parameter_sweep
+
+    closes, _ = _prices(10)
+    with SharedArrays({"closes": closes}) as descriptors:
+        parameter_sweep._init_worker(descriptors)
+        assert parameter_sweep._worker_arrays["closes"].tolist() == closes.tolist()
+        segment = parameter_sweep._worker_segments[0]
+
+        parameter_sweep._close_worker_segments()
+        assert parameter_sweep._worker_segments == [] and parameter_sweep._worker_arrays == {}
+        assert segment.buf is None
+
+
+def test_sweep_streams_progress_and_ranks_top_k():
+    closes, volumes = _prices()
+    grid = {"rsi_entry": [20, 25, 30, 35], "rsi_exit": [60, 70, 80]}
+
+    updates = list(sweep("RSI Rebound", closes, grid, volumes, top_k=3, max_workers=2, chunk_size=4))
+
+    assert updates[-1]["completed"] == 12
+    assert [u["completed"] for u in updates] == sorted(u["completed"] for u in updates)
+    top = updates[-1]["top"]
+    assert len(top) == 3
+    assert top[0]["score"] >= top[1]["score"] >= top[2]["score"]
+
+    expected = max(
+        run_backtest("RSI Rebound", closes, volumes, params=params)["stats"]["sharpe"]
+        for params in expand_grid(grid)
+    )
+    assert top[0]["score"] == pytest.approx(expected)
+
+
+def test_optimize_returns_final_top():
+    closes, volumes = _prices()
+    top = optimize("Trend Exit", closes, {"ma_period": [10, 20, 50]}, volumes,
+                   metric="total_return_pct", top_k=2, max_workers=2)
+    assert len(top) == 2
+
+
+def test_lower_is_better_metric_keeps_smallest():
+    closes, volumes = _prices()
+    grid = {"rsi_entry": [20, 25, 30, 35], "rsi_exit": [60, 70, 80]}
+    drawdowns = sorted(
+        run_backtest("RSI Rebound", closes, volumes, params=params)["stats"]["max_drawdown_pct"]
+        for params in expand_grid(grid)
+    )
+
+    top = optimize("RSI Rebound", closes, grid, volumes, metric="max_drawdown_pct", top_k=3, max_workers=2)
+    assert [r["score"] for r in top] == pytest.approx(drawdowns[:3])
+
+    worst = optimize("RSI Rebound", closes, grid, volumes, metric="max_drawdown_pct", top_k=1,
+                     max_workers=2, maximize=True)
+    assert worst[0]["score"] == pytest.approx(drawdowns[-1])
+
+
+def test_sweep_rejects_unknown_params():
+    closes, _ = _prices(50)
+    with pytest.raises(BacktestError, match="Unknown parameters"):
+        list(sweep("RSI Rebound", closes, {"ma_period": [10]}))
+
+
+def test_recommendation_accepts_sweep_params(tmp_path):
+    engine = SignalEngine(price_store=PriceStore(str(tmp_path)))
+    result = engine.get_strategy_recommendation("RSI Rebound", params={"rsi_entry": 101})
+    assert result["triggered"] is True
+
+
+def test_recommendation_rejects_params_it_cannot_apply(tmp_path):
+    engine = SignalEngine(price_store=PriceStore(str(tmp_path)))
+    assert "rsi_exit=70.0" in engine.get_strategy_recommendation("RSI Rebound", params={"rsi_exit": 60})["error"]
+    assert "ma_period" in engine.get_strategy_recommendation("Trend Exit", params={"ma_period": 10})["error"]
+    assert "error" not in engine.get_strategy_recommendation("RSI Rebound", params={"rsi_exit": 70.0})
+
+
+def test_recommendation_threads_ma_period(tmp_path):
+    engine = SignalEngine(price_store=PriceStore(str(tmp_path)))
+    signals = engine.get_signal_data("SOL")
+    result = engine.get_strategy_recommendation("Trend Exit", {"SOL": 4}, params={"ma_period": 50})
+    assert result["triggered"] is (signals["current_price"] < signals["ma50"])
+    assert "MA50" in result["reason"]
@@ -0,0 +1,112 @@
+"""
+Tests for price_providers.py
+Pluggable history sources and lazy SignalEngine warming
+"""
+import os
+import sys
+import json
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import pytest
+
+from server.logic.price_providers import (
+    FixtureFileProvider,
+    MockPriceProvider,
+    PriceHistoryProvider,
+    StoreOnlyProvider,
+)
+from server.logic.price_store import PriceStore
+from server.logic.signal_cache import SignalCache
+from server.logic.signal_engine import SignalEngine
+
+
+def _bars(n, start=100.0):
+    return [{"timestamp": 1700000000 + i * 86400, "price": start + i, "volume": 1000 + i} for i in range(n)]
+
+
+def _engine(tmp_path, provider):
+    return SignalEngine(
+        price_store=PriceStore(str(tmp_path / "store")),
+        signal_cache=SignalCache(),
+        provider=provider,
+    )
+
+
+def test_fixture_json_provider(tmp_path):
+    path = tmp_path / "prices.json"
+    path.write_text(json.dumps({"AAA": _bars(60), "BBB": _bars(60, 50.0)}))
+    provider = FixtureFileProvider(str(path))
+
+    assert sorted(provider.symbols()) == ["AAA", "BBB"]
+    timestamps, prices, volumes = provider.load("AAA")
+    assert prices[:2] == [100.0, 101.0]
+    assert provider.load("ZZZ") is None
+
+
+def test_fixture_csv_provider(tmp_path):
+    path = tmp_path / "prices.csv"
+    rows = ["symbol,timestamp,price,volume"] + [f"AAA,{b['timestamp']},{b['price']},{b['volume']}" for b in _bars(3)]
+    path.write_text("\n".join(rows))
+
+    assert FixtureFileProvider(str(path)).load("AAA")[1] == [100.0, 101.0, 102.0]
+
+
+def test_engine_construction_writes_nothing(tmp_path):
+    engine = _engine(tmp_path, MockPriceProvider())
+    assert engine.price_store.symbols() == []
+    assert "BTC" in engine.supported_symbols()
+
+
+def test_engine_warms_only_requested_symbols(tmp_path):
+    engine = _engine(tmp_path, MockPriceProvider())
+    engine.get_signal_data("ETH")
+
+    assert engine.price_store.symbols() == ["ETH"]
+    with pytest.raises(ValueError):
+        engine.get_signal_data("UNKNOWN")
+
+
+def test_prewarm_from_fixture(tmp_path):
+    path = tmp_path / "prices.json"
+    path.write_text(json.dumps({"AAA": _bars(60), "BBB": _bars(60, 50.0)}))
+    engine = _engine(tmp_path, FixtureFileProvider(str(path)))
+
+    assert engine.prewarm() == 2
+    assert engine.price_store.length("AAA") == 60
+    assert engine.get_signal_data("BBB")["current_price"] == 109.0
+
+
+def test_store_only_provider_serves_existing_history(tmp_path):
+    engine = _engine(tmp_path, StoreOnlyProvider())
+    engine.price_store.extend("AAA", [1, 2, 3], [1.0, 2.0, 3.0], [10, 10, 10])
+
+    assert engine.supported_symbols() == ["AAA"]
+    assert engine.get_signal_data("AAA")["current_price"] == 3.0
+
+
+def test_base_provider_supplies_nothing():
+    provider = PriceHistoryProvider()
+    assert (provider.symbols(), provider.load("AAA"), provider.synthetic) == ([], None, False)
+
+
+def test_switching_provider_reseeds_mock_history(tmp_path):
+    mock_engine = _engine(tmp_path, MockPriceProvider())
+    mock_engine.get_signal_data("BTC")
+    assert mock_engine.price_store.provenance("BTC") == "mock"
+
+    path = tmp_path / "prices.json"
+    path.write_text(json.dumps({"BTC": _bars(60)}))
+    engine = _engine(tmp_path, FixtureFileProvider(str(path)))
+
+    assert engine.get_signal_data("BTC")["current_price"] == 159.0
+    assert engine.price_store.length("BTC") == 60
+    assert engine.price_store.provenance("BTC") == "fixture"
+
+
+def test_store_only_provider_keeps_recorded_provenance(tmp_path):
+    _engine(tmp_path, MockPriceProvider()).get_signal_data("ETH")
+    engine = _engine(tmp_path, StoreOnlyProvider())
+
+    assert engine.get_signal_data("ETH")["symbol"] == "ETH"
+    assert engine.price_store.provenance("ETH") == "mock"
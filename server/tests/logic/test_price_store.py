@@ -0,0 +1,93 @@
+"""
+Tests for price_store.py
+Columnar memory-mapped history with in-place appends
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import numpy as np
+import pytest
+
+from server.logic.price_store import PriceStore
+from server.logic.signal_engine import SignalEngine
+
+
+def test_extend_and_last_n(tmp_path):
+    store = PriceStore(str(tmp_path))
+    store.extend("AAPL", [1, 2, 3], [10.0, 11.0, 12.0], [100, 200, 300])
+
+    window = store.last_n("AAPL", 2)
+    assert window["price"].tolist() == [11.0, 12.0]
+    assert window["timestamp"].tolist() == [2, 3]
+    assert store.length("AAPL") == 3
+    assert "AAPL" in store
+    assert "MSFT" not in store
+
+
+def test_last_n_is_read_only_view(tmp_path):
+    store = PriceStore(str(tmp_path))
+    store.extend("AAPL", [1, 2], [10.0, 11.0], [100, 200])
+
+    window = store.last_n("AAPL")
+    with pytest.raises(ValueError):
+        window["price"][0] = 0.0
+
+
+def test_append_grows_past_initial_capacity(tmp_path):
+    store = PriceStore(str(tmp_path), initial_capacity=4)
+    for i in range(10):
+        store.append("BTC", i, float(i), 1.0)
+
+    assert store.length("BTC") == 10
+    assert store.last_n("BTC")["price"].tolist() == [float(i) for i in range(10)]
+
+
+def test_second_instance_sees_appends(tmp_path):
+    """Separate handles on the same directory share the mapped files"""
+    writer = PriceStore(str(tmp_path), initial_capacity=4)
+    reader = PriceStore(str(tmp_path))
+    writer.extend("ETH", [1, 2], [1.0, 2.0], [1, 1])
+    assert reader.last_n("ETH")["price"].tolist() == [1.0, 2.0]
+
+    for i in range(3, 9):
+        writer.append("ETH", i, float(i), 1.0)
+    assert reader.length("ETH") == 8
+    assert reader.last_n("ETH", 1)["price"].tolist() == [8.0]
+
+
+def test_invalid_symbol_rejected(tmp_path):
+    store = PriceStore(str(tmp_path))
+    with pytest.raises(ValueError, match="Invalid symbol"):
+        store.append("../etc", 1, 1.0, 1.0)
+
+
+def test_engine_reuses_persisted_history(tmp_path):
+    first = SignalEngine(price_store=PriceStore(str(tmp_path)))
+    first.get_signal_data("BTC")
+    prices = np.array(first.price_store.last_n("BTC")["price"])
+
+    second = SignalEngine(price_store=PriceStore(str(tmp_path)))
+    second.get_signal_data("BTC")
+    assert np.array_equal(second.price_store.last_n("BTC")["price"], prices)
+    assert second.price_store.length("BTC") == 100
+
+
+def test_extend_only_if_empty_seeds_once(tmp_path):
+    store = PriceStore(str(tmp_path))
+    store.extend("AAPL", [1, 2], [10.0, 11.0], [100, 200], only_if_empty=True)
+    assert store.extend("AAPL", [3], [12.0], [300], only_if_empty=True) == 2
+    assert store.last_n("AAPL")["price"].tolist() == [10.0, 11.0]
+
+
+def test_seed_records_provenance_and_replaces_other_sources(tmp_path):
+    store = PriceStore(str(tmp_path))
+    assert store.seed("AAPL", [1, 2, 3], [10.0, 11.0, 12.0], [1, 1, 1], source="mock") == 3
+    assert store.provenance("AAPL") == "mock"
+    assert store.seed("AAPL", [4], [99.0], [1], source="mock") == 3
+
+    assert store.seed("AAPL", [1, 2], [20.0, 21.0], [5, 5], source="fixture") == 2
+    assert store.provenance("AAPL") == "fixture"
+    assert store.last_n("AAPL")["price"].tolist() == [20.0, 21.0]
+    assert PriceStore(str(tmp_path)).provenance("AAPL") == "fixture"
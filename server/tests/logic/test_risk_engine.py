@@ -0,0 +1,101 @@
+"""
+Tests for risk_engine.py
+Shrinkage covariance, VaR/CVaR methods, beta and pooled Monte Carlo
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import numpy as np
+import pytest
+
+from server.logic.risk_engine import (
+    RiskError,
+    beta,
+    compute_risk,
+    historical_var_cvar,
+    monte_carlo_var_cvar,
+    parametric_var_cvar,
+    returns_matrix,
+    shrunk_covariance,
+)
+
+
+def _prices(n_assets=4, bars=300, seed=7):
+    rng = np.random.default_rng(seed)
+    returns = rng.normal(0.0005, 0.02, (n_assets, bars - 1))
+    return 100 * np.cumprod(np.hstack([np.ones((n_assets, 1)), 1 + returns]), axis=1)
+
+
+def test_returns_matrix_shape_and_values():
+    returns = returns_matrix([[100.0, 110.0, 99.0], [10.0, 10.0, 12.0]])
+    assert returns.shape == (2, 2)
+    assert returns[:, 0] == pytest.approx([0.1, -0.1])
+    with pytest.raises(RiskError):
+        returns_matrix([[1.0, 2.0]])
+
+
+def test_shrunk_covariance_is_symmetric_positive_definite():
+    returns = returns_matrix(_prices(n_assets=20, bars=40))
+    cov, shrinkage = shrunk_covariance(returns)
+    assert 0.0 <= shrinkage <= 1.0
+    assert np.allclose(cov, cov.T)
+    assert np.linalg.eigvalsh(cov).min() > 0
+
+
+def test_historical_var_cvar():
+    returns = np.linspace(-0.10, 0.09, 20)
+    var, cvar = historical_var_cvar(returns, 0.90)
+    assert var == pytest.approx(np.quantile(returns, 0.10))
+    assert cvar == pytest.approx(returns[returns <= var].mean())
+    assert cvar <= var
+
+
+def test_monte_carlo_matches_parametric_and_pool():
+    mean = np.array([0.0005, 0.0002])
+    cov = np.array([[0.0004, 0.0001], [0.0001, 0.0002]])
+    weights = np.array([0.6, 0.4])
+    sigma = float(np.sqrt(weights @ cov @ weights))
+
+    inline = monte_carlo_var_cvar(mean, cov, weights, paths=40000, seed=1, chunk_paths=40000)
+    expected_var, expected_cvar = parametric_var_cvar(float(weights @ mean), sigma, 0.95)
+    assert inline[0.95][0] == pytest.approx(expected_var, rel=0.05)
+    assert inline[0.95][1] == pytest.approx(expected_cvar, rel=0.05)
+
+    pooled_one = monte_carlo_var_cvar(mean, cov, weights, paths=40000, seed=1, chunk_paths=10000, max_workers=1)
+    pooled_two = monte_carlo_var_cvar(mean, cov, weights, paths=40000, seed=1, chunk_paths=10000, max_workers=2)
+    assert pooled_one == pooled_two
+
+
+def test_beta_against_scaled_benchmark():
+    benchmark = np.random.default_rng(2).normal(0, 0.01, 200)
+    assert beta(2 * benchmark, benchmark) == pytest.approx(2.0)
+    assert beta(benchmark, np.zeros(200)) is None
+
+
+def test_compute_risk_report():
+    prices = _prices()
+    report = compute_risk([4, 3, 2, 1], prices, benchmark_prices=prices[0], mc_paths=2000, seed=3)
+
+    assert report["largest_position_pct"] == pytest.approx(40.0)
+    assert report["top_5_positions_pct"] == pytest.approx(100.0)
+    assert report["var_1day_99"] <= report["var_1day_95"] < 0
+    assert report["cvar_1day_95"] <= report["var_1day_95"]
+    assert report["portfolio_volatility"] > 0
+    assert 0 < report["portfolio_beta"] < 1.5
+    assert set(report["methods"]) == {"parametric", "historical", "monte_carlo"}
+    assert report["observations"] == prices.shape[1] - 1
+
+
+def test_compute_risk_rejects_mismatched_inputs():
+    with pytest.raises(RiskError):
+        compute_risk([1, 1], _prices(n_assets=3), mc_paths=0)
+    with pytest.raises(RiskError):
+        compute_risk([], _prices(), mc_paths=0)
+
+
+def test_default_paths_split_across_workers():
+    from server.logic.risk_engine import RISK_MC_CHUNK_PATHS, RISK_MC_PATHS
+
+    assert RISK_MC_PATHS // RISK_MC_CHUNK_PATHS > 1
@@ -0,0 +1,110 @@
+"""
+Tests for signal_cache.py
+Bounded LRU + TTL behaviour and the optional Redis second level
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+from unittest.mock import patch
+
+from server.logic.price_store import PriceStore
+from server.logic.signal_cache import SignalCache
+from server.logic.signal_engine import SignalEngine
+
+
+class FakeRedis:
+    """Minimal in-memory stand-in for the redis client calls used by SignalCache"""
+
+    def __init__(self):
+        self.store = {}
+
+    def mget(self, keys):
+        return [self.store.get(k) for k in keys]
+
+    def setex(self, key, ttl, value):
+        self.store[key] = value
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+    def incr(self, key):
+        self.store[key] = str(int(self.store.get(key) or 0) + 1)
+        return int(self.store[key])
+
+    def pipeline(self):
+        return self
+
+    def execute(self):
+        return []
+
+
+def test_get_set_roundtrip():
+    cache = SignalCache()
+    cache.set("BTC", {"rsi": 40})
+    assert cache.get("BTC") == {"rsi": 40}
+    assert cache.get("ETH") is None
+
+
+def test_lru_eviction_is_bounded():
+    cache = SignalCache(max_entries=2)
+    cache.set("A", {"v": 1})
+    cache.set("B", {"v": 2})
+    cache.get("A")
+    cache.set("C", {"v": 3})
+
+    assert len(cache) == 2
+    assert cache.get("B") is None
+    assert cache.get("A") == {"v": 1}
+
+
+def test_entries_expire_with_bucket():
+    cache = SignalCache(window_seconds=300)
+    with patch("server.logic.signal_cache.time.time", return_value=1000.0):
+        cache.set("BTC", {"rsi": 40})
+    with patch("server.logic.signal_cache.time.time", return_value=1300.0):
+        assert cache.get("BTC") is None
+        cache.set("ETH", {"rsi": 50})
+    assert len(cache) == 1
+
+
+def test_redis_second_level_shared_between_workers():
+    redis = FakeRedis()
+    worker_a = SignalCache(redis_client=redis)
+    worker_b = SignalCache(redis_client=redis)
+
+    worker_a.set("SOL", {"rsi": 25})
+    assert worker_b.get("SOL") == {"rsi": 25}
+
+    worker_a.invalidate("SOL")
+    worker_b.clear()
+    assert worker_b.get("SOL") is None
+
+
+def test_invalidate_reaches_other_workers_l1():
+    redis = FakeRedis()
+    worker_a = SignalCache(redis_client=redis)
+    worker_b = SignalCache(redis_client=redis)
+
+    worker_a.set("SOL", {"rsi": 25})
+    assert worker_b.get("SOL") == {"rsi": 25}
+
+    worker_a.invalidate("SOL")
+    assert worker_a.get("SOL") is None
+    assert worker_b.get("SOL") is None
+
+    worker_b.set("SOL", {"rsi": 31})
+    assert worker_a.get("SOL") == {"rsi": 31}
+
+
+def test_engine_computes_once_per_bucket_across_engines(tmp_path):
+    redis = FakeRedis()
+    store = PriceStore(str(tmp_path))
+    first = SignalEngine(price_store=store, signal_cache=SignalCache(redis_client=redis))
+    second = SignalEngine(price_store=store, signal_cache=SignalCache(redis_client=redis))
+
+    computed = first.get_signal_data("BTC")
+    with patch("server.logic.signal_engine.indicator_kernel.compute_indicators") as kernel:
+        assert second.get_signal_data("BTC") == computed
+        kernel.assert_not_called()
@@ -0,0 +1,94 @@
+"""
+Tests for signal_screener.py
+Index-intersection results must equal a brute-force scan
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import random
+
+import pytest
+
+from server.logic.price_store import PriceStore
+from server.logic.signal_engine import SignalEngine
+from server.logic.signal_screener import SignalScreener, parse_query, ScreenerQueryError
+
+
+def _universe(n=2000, seed=5):
+    rng = random.Random(seed)
+    data = {}
+    for i in range(n):
+        price = rng.uniform(10, 200)
+        data[f"S{i}"] = {
+            "current_price": price,
+            "rsi": rng.uniform(0, 100),
+            "macd": rng.uniform(-2, 2),
+            "ma20": price * rng.uniform(0.9, 1.1),
+            "ma50": price * rng.uniform(0.8, 1.2),
+            "volume_ratio": rng.uniform(0, 4),
+        }
+    return data
+
+
+def test_parse_query_rewrites_price_vs_ma():
+    assert parse_query("rsi < 30 AND price > ma50") == [("rsi", "<", 30.0), ("price_ma50_ratio", ">", 1.0)]
+
+
+@pytest.mark.parametrize("query", ["rsi <", "foo > 1", "rsi < abc"])
+def test_parse_query_rejects_bad_clauses(query):
+    with pytest.raises(ScreenerQueryError):
+        parse_query(query)
+
+
+def test_screen_matches_brute_force():
+    data = _universe()
+    screener = SignalScreener()
+    screener.load(data)
+
+    result = screener.screen("rsi < 30 AND price > ma50 AND volume_ratio >= 1.5")
+    expected = sorted(
+        s for s, r in data.items()
+        if r["rsi"] < 30 and r["current_price"] / r["ma50"] > 1 and r["volume_ratio"] >= 1.5
+    )
+    assert sorted(r["symbol"] for r in result) == expected
+
+
+def test_screen_sort_and_limit():
+    screener = SignalScreener()
+    screener.load(_universe(200))
+
+    result = screener.screen("rsi > 50", sort_by="rsi", limit=5)
+    assert len(result) == 5
+    assert [r["rsi"] for r in result] == sorted(r["rsi"] for r in result)
+    assert all(r["rsi"] > 50 for r in result)
+
+
+def test_screen_returns_none_for_undefined_ratios():
+    """A zero moving average leaves the ratio undefined; rows must stay JSON-safe"""
+    import json
+
+    data = _universe(10)
+    data["S3"]["ma50"] = 0.0
+    data["S4"]["ma20"] = 0.0
+    screener = SignalScreener()
+    screener.load(data)
+
+    result = screener.screen("rsi >= 0", sort_by="price_ma50_ratio")
+    assert len(result) == 10
+    rows = {r["symbol"]: r for r in result}
+    assert rows["S3"]["price_ma50_ratio"] is None
+    assert rows["S4"]["price_ma20_ratio"] is None
+    assert result[-1]["symbol"] == "S3"
+    json.dumps(result, allow_nan=False)
+
+
+def test_refresh_from_engine(tmp_path):
+    engine = SignalEngine(price_store=PriceStore(str(tmp_path)))
+    screener = SignalScreener()
+
+    assert screener.refresh_if_stale(engine, 300) is True
+    assert len(screener) == 16
+    assert screener.refresh_if_stale(engine, 300) is False
+    assert len(screener.screen("rsi >= 0")) == 16
@@ -0,0 +1,149 @@
+"""
+Tests for signal_state_tracker.py
+Only flipped triggers are emitted; rising edges are stored before the bitmap advances
+"""
+import os
+import sys
+
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import pytest
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from server.logic.price_providers import MockPriceProvider
+from server.logic.price_store import PriceStore
+from server.logic.signal_cache import SignalCache
+from server.logic.signal_engine import SignalEngine
+from server.logic.signal_state_tracker import SignalStateTracker, TRIGGERS, persist_signal_edges
+
+
+def _result(**triggered):
+    return {
+        "signals": {"rsi": 25.0},
+        "triggers": {name: {"triggered": triggered.get(name, False)} for name in TRIGGERS},
+    }
+
+
+def test_first_update_emits_only_active_triggers():
+    tracker = SignalStateTracker()
+    changes = tracker.update({"ETH": _result(rsi_rebound=True), "BTC": _result()})
+
+    assert changes == [{"symbol": "ETH", "trigger": "rsi_rebound", "triggered": True, "signals": {"rsi": 25.0}}]
+
+
+def test_unchanged_state_emits_nothing():
+    tracker = SignalStateTracker()
+    tracker.update({"ETH": _result(rsi_rebound=True)})
+    assert tracker.update({"ETH": _result(rsi_rebound=True)}) == []
+
+
+def test_falling_and_rising_edges():
+    tracker = SignalStateTracker()
+    tracker.update({"SOL": _result(momentum_buy=True)})
+    changes = tracker.update({"SOL": _result(trend_exit=True)})
+
+    assert {(c["trigger"], c["triggered"]) for c in changes} == {("momentum_buy", False), ("trend_exit", True)}
+    assert tracker.state("SOL")["trend_exit"] is True
+
+
+def test_snapshot_restore():
+    tracker = SignalStateTracker()
+    tracker.update({"ETH": _result(rsi_rebound=True, volume_spike=True)})
+
+    restored = SignalStateTracker()
+    restored.restore(tracker.snapshot())
+    assert restored.update({"ETH": _result(rsi_rebound=True, volume_spike=True)}) == []
+
+
+def test_diff_leaves_state_until_commit():
+    """A failed side effect between diff() and commit() does not lose the edge"""
+    tracker = SignalStateTracker()
+    results = {"ETH": _result(rsi_rebound=True)}
+
+    changes, masks = tracker.diff(results)
+    assert [c["trigger"] for c in changes] == ["rsi_rebound"]
+    assert tracker.state("ETH")["rsi_rebound"] is False
+    assert tracker.diff(results)[0] == changes
+
+    tracker.commit(masks)
+    assert tracker.state("ETH")["rsi_rebound"] is True
+    assert tracker.diff(results) == ([], {"ETH": 1})
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE strategies (id INTEGER PRIMARY KEY, userId INT, name TEXT, symbol TEXT, status TEXT)"))
+        conn.execute(text(
+            "CREATE TABLE trading_signals (id INTEGER PRIMARY KEY, strategyId INT NOT NULL, userId INT NOT NULL, "
+            "symbol TEXT, action TEXT, technicalIndicators TEXT, status TEXT, generatedAt TIMESTAMP)"
+        ))
+        conn.execute(text(
+            "INSERT INTO strategies VALUES (1, 7, 'RSI Rebound', 'ETH', 'active'), "
+            "(2, 8, 'RSI Rebound', 'ETH', 'active'), (3, 9, 'RSI Rebound', 'ETH', 'inactive'), "
+            "(4, 7, 'Trend Exit', 'BTC', 'active')"
+        ))
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _signals(db):
+    return [tuple(r) for r in db.execute(text("SELECT strategyId, userId, symbol, action FROM trading_signals ORDER BY id")).all()]
+
+
+def test_persist_rising_edges_for_active_strategies(db):
+    tracker = SignalStateTracker()
+    changes = tracker.update({
+        "ETH": _result(rsi_rebound=True, volume_spike=True),
+        "SOL": _result(rsi_rebound=True),
+    })
+
+    assert persist_signal_edges(db, changes) == 2
+    db.commit()
+    # No strategy for SOL or volume_spike; the inactive strategy is skipped
+    assert _signals(db) == [(1, 7, "ETH", "BUY"), (2, 8, "ETH", "BUY")]
+
+    falling = tracker.update({"ETH": _result(), "SOL": _result()})
+    assert persist_signal_edges(db, falling) == 0
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = SignalEngine(price_store=PriceStore(str(tmp_path)), signal_cache=SignalCache(), provider=MockPriceProvider())
+    state = {"trend_exit": False}
+    monkeypatch.setattr(engine, "_evaluate_triggers", lambda symbol, signals: {
+        name: {"triggered": state.get(name, False)} for name in TRIGGERS
+    })
+    engine.trigger_state = state
+    return engine
+
+
+def test_engine_stores_signal_once_per_edge(engine, db):
+    engine.trigger_state["trend_exit"] = True
+    result = engine.check_strategy_signals("BTC", db)
+    assert result["changed"] == ["trend_exit"]
+    assert engine.check_strategy_signals("BTC", db)["changed"] == []
+    assert _signals(db) == [(4, 7, "BTC", "SELL")]
+
+
+def test_engine_keeps_edge_when_insert_fails(engine, db):
+    engine.trigger_state["trend_exit"] = True
+    db.execute(text("DROP TABLE trading_signals"))
+    db.commit()
+    with pytest.raises(Exception):
+        engine.check_strategy_signals("BTC", db)
+    assert engine.signal_state.state("BTC")["trend_exit"] is False
+
+    db.execute(text(
+        "CREATE TABLE trading_signals (id INTEGER PRIMARY KEY, strategyId INT NOT NULL, userId INT NOT NULL, "
+        "symbol TEXT, action TEXT, technicalIndicators TEXT, status TEXT, generatedAt TIMESTAMP)"
+    ))
+    db.commit()
+    assert engine.check_strategy_signals("BTC", db)["changed"] == ["trend_exit"]
+    assert _signals(db) == [(4, 7, "BTC", "SELL")]
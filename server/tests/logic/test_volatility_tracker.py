@@ -0,0 +1,101 @@
+"""
+Tests for volatility_tracker.py
+Welford/EWMA per-symbol volatility and portfolio volatility from tracked state
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import numpy as np
+import pytest
+
+from server.logic.price_store import PriceStore
+from server.logic.signal_cache import SignalCache
+from server.logic.signal_engine import SignalEngine
+from server.logic.volatility_tracker import RunningMoments, SymbolVolatility, VolatilityTracker, volatility_class
+
+DAY = 86400
+
+
+def _prices(seed, n=300, scale=0.02):
+    rng = np.random.default_rng(seed)
+    return 100 * np.cumprod(1 + rng.normal(0, scale, n))
+
+
+def test_running_moments_match_numpy_and_merge():
+    values = np.random.default_rng(1).normal(0, 1, 500)
+    online = RunningMoments()
+    for v in values:
+        online.update(v)
+    assert online.variance() == pytest.approx(np.var(values, ddof=1))
+
+    merged = RunningMoments.from_values(values[:123])
+    merged.merge(RunningMoments.from_values(values[123:]))
+    assert merged.mean == pytest.approx(values.mean())
+    assert merged.variance() == pytest.approx(np.var(values, ddof=1))
+
+
+def test_seed_then_update_equals_streaming():
+    prices = _prices(2)
+    seeded = SymbolVolatility()
+    seeded.seed(prices[:200])
+    for price in prices[200:]:
+        seeded.update(price)
+
+    streamed = SymbolVolatility()
+    for price in prices:
+        streamed.update(price)
+
+    assert seeded.moments.variance() == pytest.approx(streamed.moments.variance())
+    returns = prices[1:] / prices[:-1] - 1
+    assert streamed.moments.variance() == pytest.approx(np.var(returns, ddof=1))
+
+
+def test_portfolio_volatility_uses_correlation():
+    base = _prices(3)
+    tracker = VolatilityTracker()
+    tracker.add_symbol("A", base)
+    tracker.add_symbol("B", base * 2)
+    tracker.add_symbol("C", _prices(4))
+
+    single = tracker.symbol_volatility("A")["realized_vol_pct"]
+    # Perfectly correlated holdings have the same volatility as either one
+    assert tracker.portfolio_volatility({"A": 1, "B": 1})["realized_vol_pct"] == pytest.approx(single, rel=1e-6)
+    # An independent holding diversifies
+    assert tracker.portfolio_volatility({"A": 1, "C": 1})["realized_vol_pct"] < single
+    assert tracker.portfolio_volatility({"A": 1, "Z": 1})["uncovered"] == ["Z"]
+
+
+def test_daily_fold_updates_covariance():
+    tracker = VolatilityTracker()
+    tracker.add_symbol("A", [100.0, 101.0, 100.0])
+    tracker.add_symbol("B", [50.0, 49.0, 50.0])
+    before = tracker.cov[0, 1]
+
+    tracker.update("A", 105.0, 10 * DAY)
+    tracker.update("B", 52.0, 10 * DAY + 60)
+    assert tracker.pending
+    tracker.update("A", 104.0, 11 * DAY)
+
+    assert tracker.cov[0, 1] != before
+    assert tracker.pending == {0: pytest.approx(104.0 / 105.0 - 1)}
+
+
+def test_volatility_class_thresholds():
+    assert volatility_class(None) == "unknown"
+    assert volatility_class(80) == "high"
+    assert volatility_class(45) == "medium"
+    assert volatility_class(10) == "low"
+
+
+def test_engine_tracks_appended_bars(tmp_path):
+    engine = SignalEngine(price_store=PriceStore(str(tmp_path)), signal_cache=SignalCache())
+    before = engine.get_volatility("BTC")
+    engine.append_bar("BTC", 150000.0, 1e6)
+    after = engine.get_volatility("BTC")
+
+    assert after["observations"] == before["observations"] + 1
+    assert after["realized_vol_pct"] > before["realized_vol_pct"]
+    with pytest.raises(ValueError):
+        engine.get_volatility("UNKNOWN")
@@ -0,0 +1,87 @@
+"""
+Tests for drawdown_state.py
+Incremental running drawdown matches a full equity-curve rebuild
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from server.services.drawdown_state import DrawdownState, get_drawdown_state
+from server.services.strategy_engine import drawdown_from_arrays
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE trades (userId INT, profit_loss REAL, exit_time TEXT, status TEXT)"))
+        conn.execute(text(
+            "CREATE TABLE drawdown_state (userId INTEGER PRIMARY KEY, equity REAL, peak REAL, "
+            "max_drawdown REAL, trade_count INTEGER, last_exit_time TIMESTAMP, updated_at TIMESTAMP)"
+        ))
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def test_apply_matches_apply_many():
+    pnls = np.random.default_rng(3).normal(0, 400, 500)
+    one_by_one = DrawdownState()
+    for pnl in pnls:
+        one_by_one.apply(pnl)
+
+    batched = DrawdownState()
+    batched.apply_many(pnls[:200])
+    batched.apply_many(pnls[200:])
+
+    assert batched.to_dict() == pytest.approx(one_by_one.to_dict())
+
+
+def test_overlay_matches_full_curve():
+    pnls = np.random.default_rng(5).normal(0, 400, 300)
+    state = DrawdownState()
+    state.apply_many(pnls)
+
+    empty = np.zeros(0)
+    expected = drawdown_from_arrays(pnls, np.array([10.0]), np.array([100.0]), np.array([80.0]))
+    overlay = state.overlay(unrealized_pnl=-200.0)
+    for key in ("max_drawdown_pct", "current_drawdown_pct", "peak_value", "current_value"):
+        assert overlay[key] == pytest.approx(expected[key])
+    assert drawdown_from_arrays(pnls, empty, empty, empty)["max_drawdown_pct"] == state.overlay()["max_drawdown_pct"]
+
+
+def test_rebuild_covers_full_history(db):
+    # Early losses fall outside a 100-trade window but still set the max drawdown
+    rows = [{"pnl": -3000.0 if i < 5 else 50.0, "t": f"2024-01-01T00:{i // 60:02d}:{i % 60:02d}"} for i in range(250)]
+    db.execute(text("INSERT INTO trades VALUES (1, :pnl, :t, 'closed')"), rows)
+    db.execute(text("INSERT INTO trades VALUES (1, 999.0, NULL, 'open')"))
+    db.commit()
+
+    state = get_drawdown_state(db, 1)
+    assert state.trade_count == 250
+    assert state.equity == pytest.approx(10000 - 15000 + 245 * 50)
+    assert state.max_drawdown == pytest.approx(1.5)
+
+    # Later reads are served from the stored row
+    db.execute(text("DELETE FROM trades"))
+    db.commit()
+    assert get_drawdown_state(db, 1).to_dict() == pytest.approx(state.to_dict())
+
+
+def test_rebuild_runs_in_callers_transaction(db):
+    db.execute(text("INSERT INTO trades VALUES (1, -500.0, '2024-01-02', 'closed'), (1, 200.0, '2024-01-01', 'closed')"))
+    db.commit()
+
+    state = get_drawdown_state(db, 1)
+    assert state.trade_count == 2
+    assert db.execute(text("SELECT last_exit_time FROM drawdown_state WHERE userId = 1")).scalar() == "2024-01-02"
+
+    db.rollback()
+    assert db.execute(text("SELECT COUNT(*) FROM drawdown_state")).scalar() == 0
+
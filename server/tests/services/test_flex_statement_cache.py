@@ -0,0 +1,120 @@
+"""
+Tests for the on-disk Flex statement cache
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import pytest
+
+from server.services.flex_statement_cache import FlexStatementCache
+
+
+def _statement(when, size=100):
+    return f'<FlexQueryResponse><FlexStatement whenGenerated="{when}"/>{"x" * size}</FlexQueryResponse>'
+
+
+def test_put_get_and_fresh(tmp_path):
+    cache = FlexStatementCache(str(tmp_path), max_bytes=10_000, ttl_sec=60)
+    assert cache.fresh("q1") is None
+
+    entry = cache.put("q1", _statement("20241007;120000"), "20241007;120000", {"positions": 2})
+
+    assert cache.get("q1", "20241007;120000") == entry
+    assert cache.get("q1", "20241008;120000") is None
+    assert cache.fresh("q1") == entry
+    assert cache.fresh("q1", "2024-10-07") is None
+    assert cache.fresh("q2") is None
+    assert cache.read(entry) == _statement("20241007;120000")
+    assert cache.source(entry) == os.path.join(str(tmp_path), entry.sha256 + ".xml")
+
+    cache.ttl_sec = 0
+    assert cache.fresh("q1") is None
+
+
+def test_identical_statements_share_one_blob(tmp_path):
+    cache = FlexStatementCache(str(tmp_path), max_bytes=10_000)
+    text = _statement("20241007;120000")
+
+    first = cache.put("q1", text, "20241007;120000", {})
+    second = cache.put("q2", text, "20241007;120000", {})
+
+    assert first.sha256 == second.sha256
+    assert sorted(os.listdir(tmp_path)) == sorted([".lock", "index.json", first.sha256 + ".xml"])
+
+
+def test_size_cap_evicts_least_recently_fetched(tmp_path):
+    cache = FlexStatementCache(str(tmp_path), max_bytes=450, grace_sec=0)
+
+    old = cache.put("q1", _statement("1", 150), "1", {})
+    cache.put("q2", _statement("2", 150), "2", {})
+    new = cache.put("q3", _statement("3", 150), "3", {})
+
+    assert cache.get("q1", "1") is None
+    assert not os.path.exists(cache.path(old))
+    assert cache.get("q2", "2") is not None
+    assert cache.get("q3", "3") == new
+
+
+def test_oversized_or_disabled_statements_stay_in_memory(tmp_path):
+    cache = FlexStatementCache(str(tmp_path / "cache"), max_bytes=50)
+    text = _statement("1", 100)
+
+    entry = cache.put("q1", text, "1", {})
+
+    assert cache.source(entry) == text
+    assert cache.read(entry) == text
+    assert cache.get("q1", "1") is None
+    assert not os.path.exists(tmp_path / "cache")
+
+    disabled = FlexStatementCache(str(tmp_path / "off"), max_bytes=0)
+    assert disabled.read(disabled.put("q1", text, "1", {})) == text
+    assert disabled.fresh("q1") is None
+
+
+def test_recent_blobs_survive_eviction_by_other_processes(tmp_path):
+    """A blob another process just wrote (not yet in this index) or just served is not evicted"""
+    writer = FlexStatementCache(str(tmp_path), max_bytes=300, grace_sec=600)
+    served = writer.put("q1", _statement("1", 150), "1", {})
+    assert writer.fresh("q1") == served
+
+    # An unindexed blob, as left between another process's write and its index update
+    orphan = os.path.join(str(tmp_path), "f" * 64 + ".xml")
+    with open(orphan, "w") as f:
+        f.write("x" * 150)
+    writer.put("q2", _statement("2", 150), "2", {})
+
+    assert os.path.exists(orphan)
+    assert os.path.exists(writer.path(served))
+    assert writer.get("q1", "1") is not None
+
+    aged = FlexStatementCache(str(tmp_path), max_bytes=300, grace_sec=0)
+    aged.put("q3", _statement("3", 150), "3", {})
+    assert not os.path.exists(orphan)
+    assert aged.get("q1", "1") is None
+
+
+def _put_many(root, worker, count):
+    cache = FlexStatementCache(root, max_bytes=10_000_000)
+    for i in range(count):
+        cache.put(f"w{worker}", _statement(f"{worker}-{i}"), f"{worker}-{i}", {"i": i})
+
+
+def test_concurrent_processes_do_not_drop_index_entries(tmp_path):
+    """Index read-modify-write is serialized across processes"""
+    import multiprocessing
+
+    processes = [
+        multiprocessing.Process(target=_put_many, args=(str(tmp_path), worker, 25)) for worker in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    cache = FlexStatementCache(str(tmp_path), max_bytes=10_000_000)
+    missing = [
+        (worker, i) for worker in range(4) for i in range(25) if cache.get(f"w{worker}", f"{worker}-{i}") is None
+    ]
+    assert missing == []
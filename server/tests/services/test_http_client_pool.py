@@ -0,0 +1,143 @@
+"""
+Tests for the app-scoped pooled HTTP clients
+A local stand-in server counts TCP connections to measure keep-alive reuse
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from server.services import http_client
+from server.services.http_client import ClientRegistry, request_with_retry
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = ClientRegistry(http2=False)
+    monkeypatch.setattr(http_client, "_registry", registry)
+    return registry
+
+
+@pytest.mark.asyncio
+async def test_pooled_client_reuses_connections(stand_in, registry):
+    """Sequential requests share one keep-alive connection; per-call clients open one each"""
+    server, base = stand_in
+
+    for i in range(20):
+        resp = await request_with_retry("GET", f"{base}/SendRequest", params={"i": i})
+        assert resp.json() == {"ok": True}
+    assert server.connections == 1
+
+    server.connections = 0
+    for i in range(5):
+        async with httpx.AsyncClient() as client:
+            await request_with_retry("GET", f"{base}/SendRequest", client=client)
+    assert server.connections == 5
+
+    await http_client.close_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded_per_host(stand_in, monkeypatch):
+    """Concurrent requests open at most max_connections to a host"""
+    server, base = stand_in
+    registry = ClientRegistry(max_connections=3, max_keepalive=3, http2=False)
+    monkeypatch.setattr(http_client, "_registry", registry)
+
+    await asyncio.gather(*(request_with_retry("GET", f"{base}/x") for _ in range(30)))
+
+    assert 1 <= server.connections <= 3
+    await http_client.close_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_registry_keys_clients_by_origin_and_closes(registry):
+    first = registry.get("https://api.kucoin.com/api/v1/accounts")
+    assert registry.get("https://api.kucoin.com/api/v1/fills") is first
+    other = registry.get("https://ndcdyn.interactivebrokers.com/AccountManagement/FlexWebService/SendRequest")
+    assert other is not first
+
+    await http_client.close_http_clients()
+
+    assert first.is_closed and other.is_closed
+    assert registry.get("https://api.kucoin.com/api/v1/accounts") is not first
+    await registry.aclose()
+
+
+def test_clients_from_previous_loop_are_closed(stand_in):
+    """A new event loop gets fresh clients and the old loop's clients are closed"""
+    _, base_url = stand_in
+    registry = ClientRegistry(http2=False)
+
+    async def fetch():
+        client = registry.get(base_url)
+        assert (await client.get(f"{base_url}/ping")).status_code == 200
+        return client
+
+    # Old loop still running in another thread: closed on that loop
+    background = asyncio.new_event_loop()
+    thread = threading.Thread(target=background.run_forever, daemon=True)
+    thread.start()
+    try:
+        old = asyncio.run_coroutine_threadsafe(fetch(), background).result(timeout=10)
+
+        async def switch():
+            new = await fetch()
+            await asyncio.gather(*registry._retiring)
+            return new
+
+        new = asyncio.run(switch())
+        assert old.is_closed and new is not old
+    finally:
+        background.call_soon_threadsafe(background.stop)
+        thread.join(timeout=10)
+        background.close()
+
+    # Old loop already closed: closed on the new loop, and awaited at shutdown
+    async def reopen():
+        latest = await fetch()
+        await registry.aclose()
+        return latest
+
+    latest = asyncio.run(reopen())
+    assert new.is_closed and latest.is_closed and not registry._retiring
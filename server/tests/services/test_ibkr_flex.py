@@ -6,7 +6,15 @@ sys.path.insert(0, repo_root)
 import pytest
 from unittest.mock import patch, AsyncMock
 import xml.etree.ElementTree as ET
-from server.services import ibkr_flex_service
+from server.services import flex_statement_cache, ibkr_flex_service
+
+
+@pytest.fixture(autouse=True)
+def statement_cache(tmp_path, monkeypatch):
+    """Each test gets an empty on-disk statement cache"""
+    cache = flex_statement_cache.FlexStatementCache(str(tmp_path / "flex-cache"))
+    monkeypatch.setattr(flex_statement_cache, "_cache", cache)
+    return cache
 
 
 MOCK_XML_RESPONSE = """<?xml version="1.0" encoding="UTF-8"?>
@@ -104,3 +112,240 @@ def test_compute_statement_digest():
     
     assert digest1 == digest2
     assert digest1 != digest3
+
+
+@pytest.mark.asyncio
+async def test_fetch_uses_explicit_credentials_without_env():
+    """Per-call credentials are sent as-is and never written to the environment"""
+    send_response = AsyncMock()
+    send_response.text = '<FlexQueryResponse><Status>Success</Status><ReferenceCode>ref-1</ReferenceCode></FlexQueryResponse>'
+    get_response = AsyncMock()
+    get_response.text = MOCK_XML_RESPONSE
+    creds = ibkr_flex_service.FlexCredentials("tok-a", "query-a", "https://flex.test")
+
+    with patch.dict('os.environ', {}, clear=True):
+        with patch('server.services.ibkr_flex_service.request_with_retry', side_effect=[send_response, get_response]) as mock_request:
+            payload = await ibkr_flex_service.get_ibkr_portfolio_payload(creds)
+        assert "IBKR_FLEX_TOKEN" not in os.environ
+
+    assert payload["accountId"] == "U0000000"
+    first, second = mock_request.call_args_list
+    assert first.args == ("GET", "https://flex.test/SendRequest")
+    assert first.kwargs["params"] == {"t": "tok-a", "q": "query-a", "v": "3"}
+    assert second.kwargs["params"] == {"t": "tok-a", "q": "ref-1", "v": "3"}
+    assert "tok-a" not in repr(creds)
+
+
+def test_user_credentials_come_from_the_users_source(monkeypatch):
+    """Each user's Flex token comes from their own enabled source; others fall back to the environment"""
+    from sqlalchemy import create_engine, text
+
+    monkeypatch.setenv("IBKR_FLEX_TOKEN", "env-token")
+    monkeypatch.setenv("IBKR_FLEX_QUERY_ID", "env-query")
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE data_sources (id INTEGER PRIMARY KEY, user_id INTEGER, source_type TEXT, "
+            "priority INTEGER, enabled BOOLEAN, config TEXT, created_at TIMESTAMP)"
+        ))
+        conn.execute(text("""
+            INSERT INTO data_sources (user_id, source_type, priority, enabled, config) VALUES
+            (1, 'ibkr_flex', 50, 1, '{"flex_token": "tok-1", "flex_query_id": "q-1"}'),
+            (1, 'ibkr_flex', 10, 0, '{"flex_token": "disabled", "flex_query_id": "q-0"}'),
+            (2, 'kucoin', 10, 1, '{"api_key": "k"}')
+        """))
+
+    with engine.connect() as conn:
+        own = ibkr_flex_service.user_credentials(conn, 1)
+        fallback = ibkr_flex_service.user_credentials(conn, 2)
+
+    assert (own.token, own.query_id) == ("tok-1", "q-1")
+    assert (fallback.token, fallback.query_id) == ("env-token", "env-query")
+
+
+IN_PROGRESS = '<FlexStatementResponse><Status>Warn</Status><ErrorCode>1019</ErrorCode><ErrorMessage>Statement generation in progress</ErrorMessage></FlexStatementResponse>'
+SEND_OK = '<FlexQueryResponse><Status>Success</Status><ReferenceCode>ref-9</ReferenceCode></FlexQueryResponse>'
+
+
+def _response(body):
+    response = AsyncMock()
+    response.text = body
+    return response
+
+
+@pytest.fixture
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(ibkr_flex_service, "IBKR_FLEX_POLL_INITIAL_SEC", 0.01)
+    monkeypatch.setattr(ibkr_flex_service, "IBKR_FLEX_POLL_MAX_SEC", 0.04)
+    monkeypatch.setattr(ibkr_flex_service, "IBKR_FLEX_POLL_TIMEOUT_SEC", 0.5)
+
+
+@pytest.mark.asyncio
+async def test_polling_yields_to_event_loop_and_backs_off(fast_polling, monkeypatch):
+    """Pending statements are polled with asyncio sleeps that grow between attempts"""
+    import asyncio
+
+    delays = []
+    monkeypatch.setattr(ibkr_flex_service, "_poll_delay", lambda d: delays.append(d) or d)
+    responses = [_response(SEND_OK)] + [_response(IN_PROGRESS)] * 3 + [_response(MOCK_XML_RESPONSE)]
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.005)
+
+    ticking = asyncio.ensure_future(ticker())
+    with patch('server.services.ibkr_flex_service.request_with_retry', side_effect=responses):
+        root = await ibkr_flex_service.fetch_statement_xml(ibkr_flex_service.FlexCredentials("t", "q"))
+    ticking.cancel()
+
+    assert root.find('.//FlexStatement') is not None
+    assert ticks > 3
+    assert delays == pytest.approx([0.01, 0.016, 0.0256])
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fetches_of_same_query_are_coalesced(fast_polling):
+    """Callers importing the same query share one SendRequest and one poll"""
+    import asyncio
+
+    responses = [_response(SEND_OK), _response(IN_PROGRESS), _response(MOCK_XML_RESPONSE)]
+    creds = ibkr_flex_service.FlexCredentials("t", "q")
+    with patch('server.services.ibkr_flex_service.request_with_retry', side_effect=responses) as mock_request:
+        first, second = await asyncio.gather(
+            ibkr_flex_service.fetch_statement_text(creds),
+            ibkr_flex_service.fetch_statement_text(creds),
+        )
+
+    assert first == second
+    assert mock_request.call_count == 3
+    assert ibkr_flex_service._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_polling_errors(fast_polling):
+    """Non-retryable codes fail fast; statements that never arrive time out"""
+    denied = '<FlexStatementResponse><Status>Fail</Status><ErrorCode>1012</ErrorCode><ErrorMessage>Token has expired.</ErrorMessage></FlexStatementResponse>'
+    creds = ibkr_flex_service.FlexCredentials("t", "q")
+
+    with patch('server.services.ibkr_flex_service.request_with_retry', side_effect=[_response(SEND_OK), _response(denied)]):
+        with pytest.raises(ibkr_flex_service.IbkrFlexError, match="Token has expired"):
+            await ibkr_flex_service.fetch_statement_xml(creds)
+
+    with patch('server.services.ibkr_flex_service.request_with_retry', side_effect=lambda *a, **k: _response(IN_PROGRESS) if k["params"]["q"] == "ref-9" else _response(SEND_OK)):
+        with pytest.raises(ibkr_flex_service.IbkrFlexError, match="not ready"):
+            await ibkr_flex_service.fetch_statement_xml(creds)
+
+
+MOCK_XML_ACTIVITY = """<?xml version="1.0" encoding="UTF-8"?>
+<FlexQueryResponse>
+  <FlexStatements count="1">
+    <FlexStatement accountId="U0000000" whenGenerated="20241007;120000" fromDate="20241001" toDate="20241007">
+      <CashReport>
+        <CashReportCurrency currency="USD" endingCash="10000.50"/>
+      </CashReport>
+      <OpenPositions>
+        <OpenPosition accountId="U0000000" symbol="TEST1" position="100" markPrice="150.25"
+                      currency="USD" positionValue="15025.00" fxRateToBase="1.0"/>
+      </OpenPositions>
+      <Trades>
+        <Trade accountId="U0000000" tradeID="111" symbol="TEST1" assetCategory="STK" currency="USD"
+               dateTime="20241002;093500" quantity="100" tradePrice="150" proceeds="-15000"
+               ibCommission="-1" buySell="BUY" fifoPnlRealized="0" levelOfDetail="EXECUTION"/>
+        <Trade accountId="U0000000" symbol="TEST1" quantity="100" levelOfDetail="ORDER"/>
+      </Trades>
+      <CashTransactions>
+        <CashTransaction accountId="U0000000" transactionID="900" type="Deposits/Withdrawals"
+                         currency="USD" amount="-250" dateTime="20241003" description="WITHDRAWAL"/>
+        <CashTransaction accountId="U0000000" transactionID="901" type="Dividends"
+                         currency="USD" amount="12.5" dateTime="20241004" description="TEST1 DIV"/>
+        <CashTransaction accountId="U0000000" transactionID="902" type="Other Fees"
+                         currency="USD" amount="-3" dateTime="20241004"/>
+      </CashTransactions>
+    </FlexStatement>
+  </FlexStatements>
+</FlexQueryResponse>"""
+
+
+def test_iter_statement_streams_sections():
+    """Positions, execution-level trades and cash transactions are emitted in document order"""
+    from datetime import datetime
+
+    kinds = [kind for kind, _ in ibkr_flex_service.iter_statement(MOCK_XML_ACTIVITY)]
+    assert kinds == ["statement", "cash_report", "position", "trade", "cash_transaction", "cash_transaction", "cash_transaction"]
+
+    (trade,) = ibkr_flex_service.iter_trades(MOCK_XML_ACTIVITY.encode())
+    assert trade["tradeId"] == "111"
+    assert trade["tradeTime"] == datetime(2024, 10, 2, 9, 35)
+    assert trade["commission"] == -1.0
+
+    cash = list(ibkr_flex_service.iter_cash_transactions(MOCK_XML_ACTIVITY))
+    assert [c["amount"] for c in cash] == [-250.0, 12.5, -3.0]
+    assert cash[0]["dateTime"] == datetime(2024, 10, 3)
+
+
+def test_parse_payload_matches_tree_parser():
+    """The streaming parser yields the same payload as the ElementTree one"""
+    root = ET.fromstring(MOCK_XML_RESPONSE)
+    assert ibkr_flex_service.parse_payload(MOCK_XML_RESPONSE) == ibkr_flex_service.parse_minimal_payload(root)
+
+    with pytest.raises(ibkr_flex_service.IbkrFlexError):
+        ibkr_flex_service.parse_payload(MOCK_XML_NO_STATEMENT)
+
+
+@pytest.mark.asyncio
+async def test_from_date_requests_only_newer_activity(fast_polling):
+    """A watermark date is sent as the fd/td period override"""
+    from datetime import date
+
+    creds = ibkr_flex_service.FlexCredentials("t", "q")
+    with patch('server.services.ibkr_flex_service.request_with_retry', side_effect=[_response(SEND_OK), _response(MOCK_XML_RESPONSE)]) as mock_request:
+        await ibkr_flex_service.fetch_statement_text(creds, from_date=date(2024, 10, 7))
+
+    params = mock_request.call_args_list[0].kwargs["params"]
+    assert params["fd"] == "20241007"
+    assert params["td"] >= "20241007"
+
+
+@pytest.mark.asyncio
+async def test_cached_statement_short_circuits_request_and_scan(fast_polling, statement_cache, monkeypatch):
+    """Within the TTL no request is made; a regenerated-identical statement is not rescanned"""
+    creds = ibkr_flex_service.FlexCredentials("t", "q")
+    scans = []
+    summary = ibkr_flex_service.statement_summary
+    monkeypatch.setattr(ibkr_flex_service, "statement_summary", lambda text: scans.append(1) or summary(text))
+
+    with patch('server.services.ibkr_flex_service.request_with_retry', side_effect=[_response(SEND_OK), _response(MOCK_XML_RESPONSE)]) as mock_request:
+        first = await ibkr_flex_service.fetch_statement(creds)
+        second = await ibkr_flex_service.fetch_statement(creds)
+
+    assert mock_request.call_count == 2
+    assert second == first
+    assert first.meta == {"accountId": "U0000000", "whenGenerated": "2024-10-07T00:00:00", "positions": 2}
+    assert ibkr_flex_service.statement_digest(first) == ibkr_flex_service.compute_statement_digest("U0000000", "2024-10-07T00:00:00", 2)
+
+    statement_cache.ttl_sec = 0
+    with patch('server.services.ibkr_flex_service.request_with_retry', side_effect=[_response(SEND_OK), _response(MOCK_XML_RESPONSE)]) as mock_request:
+        third = await ibkr_flex_service.fetch_statement(creds)
+
+    assert mock_request.call_count == 2
+    assert third.sha256 == first.sha256
+    assert scans == [1]
+    assert ibkr_flex_service.get_statement_cache().read(third) == MOCK_XML_RESPONSE
+
+
+@pytest.mark.asyncio
+async def test_cached_statement_is_scoped_to_credentials(fast_polling):
+    """Another token for the same query ID never gets the cached statement"""
+    owner = ibkr_flex_service.FlexCredentials("owner-token", "123")
+    with patch('server.services.ibkr_flex_service.request_with_retry', side_effect=[_response(SEND_OK), _response(MOCK_XML_RESPONSE)]):
+        await ibkr_flex_service.fetch_statement(owner)
+
+    other = ibkr_flex_service.FlexCredentials("other-token", "123")
+    denied = '<FlexStatementResponse><Status>Fail</Status><ErrorCode>1012</ErrorCode><ErrorMessage>Token is invalid.</ErrorMessage></FlexStatementResponse>'
+    with patch('server.services.ibkr_flex_service.request_with_retry', side_effect=[_response(denied)]) as mock_request:
+        with pytest.raises(ibkr_flex_service.IbkrFlexError, match="Token is invalid"):
+            await ibkr_flex_service.fetch_statement(other)
+    assert mock_request.call_count == 1
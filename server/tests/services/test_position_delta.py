@@ -0,0 +1,236 @@
+"""
+Tests for delta position ingest
+Per-row fingerprints in ingest_pipeline and delta-aware reconciliation on SQLite
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import json
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from server.services import ingest_pipeline
+from server.services.ingest_pipeline import (
+    load_watermark,
+    save_watermark,
+    stage_flex_statement,
+    stage_position_delta,
+    watermark_from_date,
+)
+from server.services.reconciliation_engine import reconcile_cash_events, reconcile_positions
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE data_sources (id INTEGER PRIMARY KEY, user_id INTEGER, source_type TEXT, priority INTEGER, "
+            "last_trade_id TEXT, last_trade_at TIMESTAMP, last_cash_at TIMESTAMP)"
+        ))
+        conn.execute(text("""
+            CREATE TABLE positions_staging (
+                id INTEGER PRIMARY KEY, sync_run_id TEXT, user_id INTEGER, source_id INTEGER, account TEXT,
+                symbol TEXT, quantity REAL, avg_cost REAL, currency TEXT, as_of TEXT, meta TEXT,
+                change_type TEXT NOT NULL DEFAULT 'upsert', fingerprint TEXT
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE source_position_snapshots (
+                source_id INTEGER, user_id INTEGER, account TEXT, symbol TEXT, quantity REAL, avg_cost REAL,
+                currency TEXT, as_of TEXT, fingerprint TEXT, PRIMARY KEY (source_id, account, symbol)
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE portfolio_positions (
+                id INTEGER PRIMARY KEY, userId INTEGER, symbol TEXT, quantity REAL, avgCost REAL,
+                currentPrice REAL, lastUpdated TIMESTAMP, source TEXT
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE trades_staging (
+                id INTEGER PRIMARY KEY, sync_run_id TEXT, user_id INTEGER, source_id INTEGER, account TEXT,
+                trade_id TEXT, symbol TEXT, asset_category TEXT, currency TEXT, trade_time TEXT, quantity REAL,
+                price REAL, proceeds REAL, commission REAL, buy_sell TEXT, realized_pnl REAL, meta TEXT
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE cash_events_staging (
+                id INTEGER PRIMARY KEY, sync_run_id TEXT, user_id INTEGER, source_id INTEGER, event_type TEXT,
+                amount REAL, currency TEXT, event_date TEXT, account_id TEXT, description TEXT,
+                transaction_id TEXT, meta TEXT
+            )
+        """))
+        conn.execute(text("""
+            CREATE TABLE cash_events (
+                id INTEGER PRIMARY KEY, userId INTEGER, eventType TEXT, amount REAL, currency TEXT,
+                eventDate TEXT, source TEXT, accountId TEXT, description TEXT, transactionId TEXT
+            )
+        """))
+        conn.execute(text(
+            "INSERT INTO data_sources (id, user_id, source_type, priority) VALUES (1, 1, 'ibkr_flex', 50), (2, 1, 'csv', 100)"
+        ))
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _row(symbol, quantity, price, as_of="2025-10-07T12:00:00", account="U1"):
+    return {
+        "account": account, "symbol": symbol, "quantity": quantity, "avg_cost": price,
+        "currency": "USD", "as_of": as_of, "meta": json.dumps({"description": symbol}),
+    }
+
+
+def _sync(db, run_id, source_id, rows):
+    counts = stage_position_delta(db, run_id, 1, source_id, rows)
+    db.commit()
+    return counts, reconcile_positions(db, run_id, 1)
+
+
+def _positions(db):
+    rows = db.execute(text("SELECT symbol, quantity, avgCost, source FROM portfolio_positions ORDER BY symbol"))
+    return [tuple(r) for r in rows]
+
+
+def _staged(db, run_id):
+    rows = db.execute(
+        text("SELECT symbol, change_type FROM positions_staging WHERE sync_run_id = :r ORDER BY symbol"), {"r": run_id}
+    )
+    return [tuple(r) for r in rows]
+
+
+def test_only_changed_rows_are_staged(db):
+    counts, _ = _sync(db, "r1", 1, [_row("AAPL", 10, 180.0), _row("MSFT", 5, 400.0)])
+    assert counts == {"inserted": 2, "changed": 0, "removed": 0, "unchanged": 0}
+
+    # New timestamp alone is not a change; one price moved
+    counts, summary = _sync(db, "r2", 1, [
+        _row("AAPL", 10, 181.0, as_of="2025-10-08T12:00:00"),
+        _row("MSFT", 5, 400.0, as_of="2025-10-08T12:00:00"),
+    ])
+    assert counts == {"inserted": 0, "changed": 1, "removed": 0, "unchanged": 1}
+    assert _staged(db, "r2") == [("AAPL", "upsert")]
+    assert summary["inserted"] + summary["updated"] == 1
+    assert _positions(db) == [("AAPL", 10, 181.0, "ibkr_flex"), ("MSFT", 5, 400.0, "ibkr_flex")]
+
+    counts, _ = _sync(db, "r3", 1, [_row("AAPL", 10, 181.0), _row("MSFT", 5, 400.0)])
+    assert counts["unchanged"] == 2 and _staged(db, "r3") == []
+
+
+def test_removed_rows_are_deleted(db):
+    _sync(db, "r1", 1, [_row("AAPL", 10, 180.0), _row("MSFT", 5, 400.0)])
+    counts, summary = _sync(db, "r2", 1, [_row("AAPL", 10, 180.0)])
+
+    assert counts["removed"] == 1
+    assert _staged(db, "r2") == [("MSFT", "delete")]
+    assert summary["removed"] == 1
+    assert _positions(db) == [("AAPL", 10, 180.0, "ibkr_flex")]
+
+
+def test_unchanged_higher_priority_source_still_wins(db):
+    _sync(db, "r1", 1, [_row("AAPL", 10, 180.0)])
+    _sync(db, "r2", 2, [_row("AAPL", 99, 1.0, account="csv")])
+    assert _positions(db) == [("AAPL", 10, 180.0, "ibkr_flex")]
+
+    # Removing the IBKR row falls back to the CSV snapshot
+    _sync(db, "r3", 1, [])
+    assert _positions(db) == [("AAPL", 99, 1.0, "csv")]
+
+
+def test_flex_statement_is_staged_in_batches(db, monkeypatch):
+    """Trades and mapped cash transactions stream into staging; positions come back for delta staging"""
+    from server.tests.services.test_ibkr_flex import MOCK_XML_ACTIVITY
+
+    body = MOCK_XML_ACTIVITY.replace("</Trades>", "".join(
+        f'<Trade accountId="U0000000" tradeID="t{i}" symbol="TEST1" quantity="1" levelOfDetail="EXECUTION"/>'
+        for i in range(5)
+    ) + "</Trades>")
+    monkeypatch.setattr(ingest_pipeline, "FLEX_STAGE_BATCH_ROWS", 2)
+
+    statement = stage_flex_statement(db, "r1", 1, 1, body)
+
+    assert statement["accountId"] == "U0000000"
+    assert statement["whenGenerated"] == "20241007;120000"
+    assert [p["symbol"] for p in statement["positions"]] == ["TEST1"]
+    assert statement["trades"] == 6
+    assert statement["cash_events"] == 2
+    trade_ids = [r[0] for r in db.execute(text("SELECT trade_id FROM trades_staging ORDER BY id"))]
+    assert trade_ids == ["111", "t0", "t1", "t2", "t3", "t4"]
+    events = [tuple(r) for r in db.execute(text("SELECT event_type, amount FROM cash_events_staging ORDER BY id"))]
+    assert events == [("withdrawal", -250.0), ("dividend", 12.5)]
+
+
+def test_flex_statement_watermark_stages_only_new_records(db):
+    """A second pull stages trades after the watermark and cash from its date on"""
+    from datetime import date, datetime
+    from server.tests.services.test_ibkr_flex import MOCK_XML_ACTIVITY
+
+    assert watermark_from_date(load_watermark(db, 1)) is None
+    first = stage_flex_statement(db, "r1", 1, 1, MOCK_XML_ACTIVITY, load_watermark(db, 1))
+    save_watermark(db, 1, first["watermark"])
+    db.commit()
+
+    watermark = load_watermark(db, 1)
+    assert watermark == {
+        "last_trade_id": "", "last_trade_at": datetime(2024, 10, 7), "last_cash_at": datetime(2024, 10, 7)
+    }
+    assert watermark_from_date(watermark) == date(2024, 10, 7)
+
+    later = (
+        MOCK_XML_ACTIVITY
+        .replace('fromDate="20241001" toDate="20241007"', 'fromDate="20241007" toDate="20241008"')
+        .replace("</Trades>", '<Trade accountId="U0000000" tradeID="112" symbol="TEST1" quantity="-10" '
+                 'dateTime="20241008;101500" levelOfDetail="EXECUTION"/></Trades>')
+        .replace("</CashTransactions>", '<CashTransaction accountId="U0000000" transactionID="903" '
+                 'type="Broker Interest Received" currency="USD" amount="4" dateTime="20241008"/></CashTransactions>')
+    )
+    second = stage_flex_statement(db, "r2", 1, 1, later, watermark)
+
+    assert second["trades"] == 1
+    assert second["cash_events"] == 1
+    assert second["watermark"] == {
+        "last_trade_id": "112", "last_trade_at": datetime(2024, 10, 8, 10, 15), "last_cash_at": datetime(2024, 10, 8)
+    }
+    staged = [r[0] for r in db.execute(text("SELECT trade_id FROM trades_staging WHERE sync_run_id = 'r2'"))]
+    assert staged == ["112"]
+
+
+def test_boundary_day_cash_is_deduplicated_by_transaction_id(db):
+    """Equal same-day dividends are distinct events; re-read ones are skipped"""
+    from server.tests.services.test_ibkr_flex import MOCK_XML_ACTIVITY
+
+    body = MOCK_XML_ACTIVITY.replace("</CashTransactions>", (
+        '<CashTransaction accountId="U0000000" transactionID="904" type="Dividends" '
+        'currency="USD" amount="12.5" dateTime="20241004" description="TEST2 DIV"/></CashTransactions>'
+    ))
+    stage_flex_statement(db, "r1", 1, 1, body)
+    db.commit()
+    assert reconcile_cash_events(db, "r1", 1) == {"inserted": 3, "skipped": 0}
+
+    stage_flex_statement(db, "r2", 1, 1, body)
+    db.commit()
+    assert reconcile_cash_events(db, "r2", 1) == {"inserted": 0, "skipped": 3}
+
+    rows = db.execute(text("SELECT transactionId, amount FROM cash_events WHERE eventType = 'dividend' ORDER BY transactionId"))
+    assert [tuple(r) for r in rows] == [("901", 12.5), ("904", 12.5)]
+
+
+def test_snapshot_advances_only_when_reconciled(db):
+    _sync(db, "r1", 1, [_row("AAPL", 10, 180.0), _row("MSFT", 5, 400.0)])
+
+    # Staged and committed, but reconcile never ran (e.g. it failed)
+    counts = stage_position_delta(db, "r2", 1, 1, [_row("AAPL", 12, 180.0)])
+    db.commit()
+    assert counts == {"inserted": 0, "changed": 1, "removed": 1, "unchanged": 0}
+
+    counts, summary = _sync(db, "r3", 1, [_row("AAPL", 12, 180.0)])
+    assert counts == {"inserted": 0, "changed": 1, "removed": 1, "unchanged": 0}
+    assert _positions(db) == [("AAPL", 12, 180.0, "ibkr_flex")]
+
+    counts, _ = _sync(db, "r4", 1, [_row("AAPL", 12, 180.0)])
+    assert counts == {"inserted": 0, "changed": 0, "removed": 0, "unchanged": 1}
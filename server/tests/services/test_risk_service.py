@@ -0,0 +1,142 @@
+"""
+Tests for risk_service.py
+Risk reports from stored price history, cached per portfolio version
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from server.logic.price_providers import MockPriceProvider, PriceHistoryProvider, StoreOnlyProvider
+from server.logic.price_store import PriceStore
+from server.logic.risk_engine import RiskError
+from server.logic.signal_cache import SignalCache
+from server.logic.signal_engine import SignalEngine
+from server.services import risk_service
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE portfolio_positions (userId INT, symbol TEXT, quantity REAL, avgCost REAL, currentPrice REAL)"))
+        conn.execute(text("CREATE TABLE strategy_overlays (userId INTEGER PRIMARY KEY, data_version BIGINT)"))
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return SignalEngine(
+        price_store=PriceStore(str(tmp_path)),
+        signal_cache=SignalCache(),
+        provider=MockPriceProvider(),
+    )
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    risk_service._risk_cache.clear()
+
+
+def _seed_positions(db):
+    db.execute(text("INSERT INTO portfolio_positions VALUES (1, 'BTC', 1, 90000, 95000)"))
+    db.execute(text("INSERT INTO portfolio_positions VALUES (1, 'AAPL', 100, 150, 0)"))
+    db.execute(text("INSERT INTO portfolio_positions VALUES (1, 'AAPL', 50, 150, 0)"))
+    db.execute(text("INSERT INTO portfolio_positions VALUES (1, 'NOTASYMBOL', 10, 5, 5)"))
+    db.execute(text("INSERT INTO strategy_overlays VALUES (1, 3)"))
+    db.commit()
+
+
+def test_report_from_store_history(db, engine):
+    _seed_positions(db)
+    report = risk_service.get_portfolio_risk(db, 1, mc_paths=1000, engine=engine, allow_synthetic=True)
+
+    assert sorted(report["symbols"]) == ["AAPL", "BTC"]
+    assert report["excluded_symbols"] == ["NOTASYMBOL"]
+    assert report["portfolio_version"] == 3
+    assert report["observations"] == 99
+    assert report["synthetic"] is True
+    assert report["benchmark"] is None
+    # AAPL value falls back to average cost and sums across rows
+    assert report["largest_position_pct"] == pytest.approx(95000 / (95000 + 150 * 150) * 100, rel=1e-6)
+
+
+def test_report_cached_until_version_changes(db, engine):
+    _seed_positions(db)
+    first = risk_service.get_portfolio_risk(db, 1, mc_paths=1000, engine=engine, allow_synthetic=True)
+    assert risk_service.get_portfolio_risk(db, 1, mc_paths=1000, engine=engine, allow_synthetic=True) is first
+
+    db.execute(text("UPDATE strategy_overlays SET data_version = 4 WHERE userId = 1"))
+    db.commit()
+    second = risk_service.get_portfolio_risk(db, 1, mc_paths=1000, engine=engine, allow_synthetic=True)
+    assert second is not first
+    assert second["portfolio_version"] == 4
+
+
+def test_no_positions_raises(db, engine):
+    with pytest.raises(RiskError):
+        risk_service.get_portfolio_risk(db, 2, engine=engine, allow_synthetic=True)
+
+
+class _DailyProvider(PriceHistoryProvider):
+    """Fixed daily closes keyed by day offset"""
+
+    def __init__(self, series):
+        self.series = series
+
+    def symbols(self):
+        return list(self.series)
+
+    def load(self, symbol):
+        if symbol not in self.series:
+            return None
+        days, prices = zip(*self.series[symbol])
+        return [1_700_000_000 + d * 86400 for d in days], list(prices), [0.0] * len(prices)
+
+
+def test_mock_prices_refused_by_default(db, engine):
+    _seed_positions(db)
+    with pytest.raises(RiskError, match="mock prices"):
+        risk_service.get_portfolio_risk(db, 1, mc_paths=0, engine=engine)
+
+
+def test_stored_mock_history_is_synthetic_under_another_provider(tmp_path, engine):
+    """Provenance, not the current provider, decides whether prices are synthetic"""
+    engine.ensure_symbol("BTC")
+    store_only = SignalEngine(price_store=engine.price_store, signal_cache=SignalCache(), provider=StoreOnlyProvider())
+
+    with pytest.raises(RiskError, match="BTC comes from mock prices"):
+        risk_service.compute_portfolio_risk(["BTC"], np.array([1000.0]), engine=store_only, mc_paths=0)
+    report = risk_service.compute_portfolio_risk(
+        ["BTC"], np.array([1000.0]), engine=store_only, mc_paths=0, allow_synthetic=True
+    )
+    assert report["synthetic"] is True
+
+
+def test_assets_and_benchmark_align_on_shared_days(tmp_path):
+    # ETH trades every day, AAPL and SPY skip day 2; on the shared days both
+    # assets move exactly twice the benchmark, so beta is 2 only if ETH's day 2
+    # close is dropped rather than shifting the series against each other
+    eth = [(0, 100.0), (1, 120.0), (2, 50.0), (3, 108.0), (4, 112.32)]
+    aapl = [(0, 10.0), (1, 12.0), (3, 10.8), (4, 11.232)]
+    spy = [(0, 100.0), (1, 110.0), (3, 104.5), (4, 106.59)]
+    engine = SignalEngine(
+        price_store=PriceStore(str(tmp_path)),
+        signal_cache=SignalCache(),
+        provider=_DailyProvider({"ETH": eth, "AAPL": aapl, "SPY": spy}),
+    )
+
+    report = risk_service.compute_portfolio_risk(["ETH", "AAPL"], np.array([1000.0, 1000.0]), engine=engine, mc_paths=0)
+
+    assert report["synthetic"] is False
+    assert report["benchmark"] == "SPY"
+    assert report["observations"] == 3
+    assert report["portfolio_beta"] == pytest.approx(2.0, abs=1e-3)
+    assert report["warnings"] == []
@@ -0,0 +1,172 @@
+"""
+Tests for strategy_overlay_store.py
+Version-keyed materialized overlays on an in-memory SQLite database
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from server.services import strategy_overlay_store
+from server.services.strategy_overlay_store import (
+    bump_symbol_holders,
+    claim_dirty,
+    dirty_users,
+    get_overlays,
+    refresh_dirty,
+)
+
+
+@pytest.fixture(autouse=True)
+def isolated_signal_engine(tmp_path, monkeypatch):
+    from server.logic import signal_engine as signal_engine_module
+    from server.logic.price_providers import MockPriceProvider
+    from server.logic.price_store import PriceStore
+    from server.logic.signal_cache import SignalCache
+
+    engine = signal_engine_module.SignalEngine(
+        price_store=PriceStore(str(tmp_path)), signal_cache=SignalCache(), provider=MockPriceProvider()
+    )
+    monkeypatch.setattr(signal_engine_module, "_engine", engine)
+    return engine
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE portfolio_positions (userId INT, symbol TEXT, quantity REAL, avgCost REAL, currentPrice REAL)"))
+        conn.execute(text(
+            "CREATE TABLE trades (userId INT, symbol TEXT, entry_price REAL, exit_price REAL, quantity REAL, "
+            "profit_loss REAL, exit_time TEXT, status TEXT)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE strategy_overlays (userId INTEGER PRIMARY KEY, data_version BIGINT NOT NULL DEFAULT 0, "
+            "computed_version BIGINT NOT NULL DEFAULT 0, overlays TEXT, computed_at TIMESTAMP, "
+            "locked_by TEXT, locked_at TIMESTAMP)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE drawdown_state (userId INTEGER PRIMARY KEY, equity REAL, peak REAL, "
+            "max_drawdown REAL, trade_count INTEGER, last_exit_time TIMESTAMP, updated_at TIMESTAMP)"
+        ))
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _add_position(db, user_id, symbol, quantity, price):
+    db.execute(
+        text("INSERT INTO portfolio_positions VALUES (:u, :s, :q, :p, :p)"),
+        {"u": user_id, "s": symbol, "q": quantity, "p": price},
+    )
+    # What the PostgreSQL version trigger does for portfolio_positions writes
+    db.execute(text(
+        "INSERT INTO strategy_overlays (userId, data_version) VALUES (:u, 1) "
+        "ON CONFLICT (userId) DO UPDATE SET data_version = strategy_overlays.data_version + 1"
+    ), {"u": user_id})
+    db.commit()
+
+
+def test_first_read_computes_inline(db):
+    _add_position(db, 1, "AAPL", 10, 100.0)
+    overlays = get_overlays(db, 1)
+
+    assert overlays["summary"]["total_positions"] == 1
+    assert overlays["stale"] is False
+    assert dirty_users(db, 10) == []
+
+
+def test_reads_serve_stored_until_refreshed(db):
+    _add_position(db, 1, "AAPL", 10, 100.0)
+    get_overlays(db, 1)
+
+    _add_position(db, 1, "MSFT", 5, 200.0)
+    stale = get_overlays(db, 1)
+    assert stale["summary"]["total_positions"] == 1
+    assert stale["stale"] is True
+    assert dirty_users(db, 10) == [1]
+
+    assert refresh_dirty(db, "w1") == 1
+    fresh = get_overlays(db, 1)
+    assert fresh["summary"]["total_positions"] == 2
+    assert fresh["stale"] is False
+
+
+def test_refresh_dirty_respects_batch_size(db):
+    for user_id in range(1, 6):
+        _add_position(db, user_id, "AAPL", 10, 100.0)
+
+    assert refresh_dirty(db, "w1", batch_size=3) == 3
+    assert len(dirty_users(db, 10)) == 2
+
+
+def test_worker_drains_dirty_users(db, monkeypatch):
+    for user_id in range(1, 4):
+        _add_position(db, user_id, "AAPL", 10, 100.0)
+    monkeypatch.setattr(strategy_overlay_store, "_refresh_dirty_with_session", lambda w, n: refresh_dirty(db, w, n))
+
+    async def run():
+        stop = asyncio.Event()
+        worker = asyncio.create_task(strategy_overlay_store.run_overlay_worker(0.01, 2, stop))
+        for _ in range(100):
+            if not dirty_users(db, 10):
+                break
+            await asyncio.sleep(0.01)
+        stop.set()
+        await worker
+
+    asyncio.run(run())
+    assert dirty_users(db, 10) == []
+
+
+def test_claimed_users_are_skipped_until_lease_expires(db):
+    for user_id in range(1, 4):
+        _add_position(db, user_id, "AAPL", 10, 100.0)
+    now = datetime(2025, 10, 27, 12, 0, 0)
+
+    assert claim_dirty(db, "w1", 2, now=now, lease=60) == [1, 2]
+    assert claim_dirty(db, "w2", 10, now=now, lease=60) == [3]
+    assert claim_dirty(db, "w2", 10, now=now + timedelta(seconds=30), lease=60) == []
+    assert claim_dirty(db, "w2", 10, now=now + timedelta(seconds=61), lease=60) == [1, 2, 3]
+
+
+def test_refresh_clears_claim_and_failed_refresh_releases_it(db, monkeypatch):
+    _add_position(db, 1, "AAPL", 10, 100.0)
+    _add_position(db, 2, "AAPL", 10, 100.0)
+
+    real_refresh = strategy_overlay_store.refresh_user
+
+    def flaky_refresh(session, user_id):
+        if user_id == 2:
+            raise RuntimeError("boom")
+        return real_refresh(session, user_id)
+
+    monkeypatch.setattr(strategy_overlay_store, "refresh_user", flaky_refresh)
+    assert refresh_dirty(db, "w1") == 1
+
+    rows = db.execute(text("SELECT userId, locked_by FROM strategy_overlays ORDER BY userId")).all()
+    assert [tuple(row) for row in rows] == [(1, None), (2, None)]
+    assert dirty_users(db, 10) == [2]
+
+
+def test_appended_bar_marks_holders_dirty(db, isolated_signal_engine):
+    _add_position(db, 1, "AAPL", 10, 100.0)
+    _add_position(db, 2, "MSFT", 5, 200.0)
+    _add_position(db, 3, "AAPL", 0, 100.0)
+    for user_id in (1, 2, 3):
+        get_overlays(db, user_id)
+    assert dirty_users(db, 10) == []
+
+    isolated_signal_engine.on_bar_appended = lambda symbol: bump_symbol_holders(db, symbol)
+    isolated_signal_engine.append_bar("AAPL", 101.0, 1000.0)
+
+    assert dirty_users(db, 10) == [1]
+    assert get_overlays(db, 1)["stale"] is True
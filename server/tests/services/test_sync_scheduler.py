@@ -0,0 +1,159 @@
+"""
+Tests for the fleet sync scheduler in scheduler.py
+Queue claiming, sharding, rate budgets and backoff on an in-memory SQLite database
+"""
+import os
+import sys
+repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+sys.path.insert(0, repo_root)
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from server.services import scheduler
+from server.services.scheduler import (
+    RateBudget,
+    backoff_delay,
+    claim_jobs,
+    enqueue_users,
+    parse_rate_budgets,
+    run_scheduler_pass,
+)
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE data_sources (id INTEGER PRIMARY KEY, user_id INTEGER, source_type TEXT, enabled BOOLEAN)"
+        ))
+        conn.execute(text("""
+            CREATE TABLE sync_jobs (
+                id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL UNIQUE, status TEXT NOT NULL DEFAULT 'queued',
+                next_run_at TIMESTAMP NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, locked_by TEXT,
+                locked_at TIMESTAMP, last_finished_at TIMESTAMP, last_error TEXT
+            )
+        """))
+    return sessionmaker(bind=engine)
+
+
+def _add_source(db, user_id, source_type="ibkr_flex", enabled=True):
+    db.execute(
+        text("INSERT INTO data_sources (user_id, source_type, enabled) VALUES (:u, :t, :e)"),
+        {"u": user_id, "t": source_type, "e": enabled},
+    )
+    db.commit()
+
+
+def _make_due(db):
+    db.execute(text("UPDATE sync_jobs SET next_run_at = :t"), {"t": datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+
+def test_enqueue_once_per_user_with_syncable_sources(session_factory):
+    with session_factory() as db:
+        _add_source(db, 1, "ibkr_flex")
+        _add_source(db, 1, "kucoin")
+        _add_source(db, 2, "csv")
+        _add_source(db, 3, "kucoin", enabled=False)
+
+        assert enqueue_users(db) == 1
+        assert enqueue_users(db) == 0
+        assert db.execute(text("SELECT user_id FROM sync_jobs")).scalars().all() == [1]
+
+
+def test_claim_respects_shards_order_and_lease(session_factory):
+    with session_factory() as db:
+        for user_id in range(1, 7):
+            _add_source(db, user_id)
+        enqueue_users(db)
+        _make_due(db)
+
+        even = claim_jobs(db, "w0", shard=0, shard_count=2)
+        assert sorted(job["user_id"] for job in even) == [2, 4, 6]
+        assert claim_jobs(db, "w0b", shard=0, shard_count=2) == []
+
+        # An expired lease makes the job claimable again
+        later = datetime.utcnow() + timedelta(seconds=scheduler.SYNC_LEASE_SEC + 1)
+        reclaimed = claim_jobs(db, "w0c", shard=0, shard_count=2, now=later)
+        assert sorted(job["user_id"] for job in reclaimed) == [2, 4, 6]
+
+
+def test_rate_budget_is_all_or_nothing():
+    now = [0.0]
+    budget = RateBudget({"ibkr_flex": 2, "kucoin": 60}, clock=lambda: now[0])
+
+    assert budget.try_acquire(["ibkr_flex", "kucoin"]) == 0
+    assert budget.try_acquire(["ibkr_flex"]) == 0
+    wait = budget.try_acquire(["ibkr_flex", "kucoin"])
+    assert wait == pytest.approx(30.0)
+    assert budget.tokens["kucoin"] == pytest.approx(59.0)
+
+    now[0] = 30.0
+    assert budget.try_acquire(["ibkr_flex"]) == 0
+    assert budget.try_acquire(["manual"]) == 0
+
+
+def test_parse_rate_budgets_and_backoff():
+    assert parse_rate_budgets("ibkr_flex=60, kucoin=300,bad,zero=0") == {"ibkr_flex": 60.0, "kucoin": 300.0}
+    assert backoff_delay(1, base=60, cap=1000, rng=lambda: 1.0) == 60
+    assert backoff_delay(3, base=60, cap=1000, rng=lambda: 1.0) == 240
+    assert backoff_delay(10, base=60, cap=1000, rng=lambda: 0.0) == 500
+
+
+def test_scheduler_pass_reschedules_success_and_backs_off_failures(session_factory):
+    with session_factory() as db:
+        for user_id in (1, 2):
+            _add_source(db, user_id)
+        enqueue_users(db)
+        _make_due(db)
+
+    synced = []
+
+    async def fake_sync(db, user_id, trigger):
+        synced.append((user_id, trigger))
+        if user_id == 2:
+            raise ValueError("flex down")
+        return {"sync": {"status": "completed", "stats": {"errors": []}}}
+
+    budget = RateBudget({"ibkr_flex": 60})
+    claimed = asyncio.run(run_scheduler_pass(session_factory, budget, "w", sync=fake_sync))
+
+    assert claimed == 2
+    assert sorted(synced) == [(1, "scheduled"), (2, "scheduled")]
+    with session_factory() as db:
+        rows = {
+            row.user_id: row
+            for row in db.execute(text("SELECT user_id, status, attempts, last_error, next_run_at FROM sync_jobs"))
+        }
+    assert rows[1].status == "queued" and rows[1].attempts == 0
+    assert rows[2].attempts == 1 and rows[2].last_error == "flex down"
+    assert str(rows[1].next_run_at) > str(rows[2].next_run_at)
+
+
+def test_scheduler_pass_defers_jobs_over_budget(session_factory):
+    with session_factory() as db:
+        for user_id in (1, 2, 3):
+            _add_source(db, user_id)
+        enqueue_users(db)
+        _make_due(db)
+
+    synced = []
+
+    async def fake_sync(db, user_id, trigger):
+        synced.append(user_id)
+        return {"sync": {"status": "completed", "stats": {}}}
+
+    budget = RateBudget({"ibkr_flex": 1})
+    asyncio.run(run_scheduler_pass(session_factory, budget, "w", sync=fake_sync))
+
+    assert len(synced) == 1
+    with session_factory() as db:
+        statuses = db.execute(text("SELECT status, attempts FROM sync_jobs")).all()
+    assert [tuple(s) for s in statuses] == [("queued", 0)] * 3